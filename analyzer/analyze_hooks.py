@@ -2,9 +2,207 @@
 C++ Profiling Hook Data Analyzer
 Analyzes detailed FAISS operation timings from Milvus hooks
 """
+import argparse
 import json
+import os
 import sys
+import time
 from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from latency_sketch import LatencySketch
+from offload_model import project, add_device_args, device_from_args
+
+
+STATE_VERSION = 4
+WINDOW_S = 300
+MAX_WINDOWS = 288
+# Filter-selectivity buckets (fraction of rows passing `expr`); records go to the nearest one
+SELECTIVITY_BUCKETS = [0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 0.9, 1.0]
+
+
+class IndexStats:
+    """
+    Running per-index-type totals plus latency sketches (microseconds).
+
+    Memory is constant regardless of log size; sketches from separate runs
+    or nodes merge without the raw records. `config` keeps the most recent
+    workload shape (dim, top_k, params, dataset size) for the offload model.
+    """
+
+    CONFIG_FIELDS = ('dim', 'top_k', 'index_params', 'search_params', 'num_vectors')
+
+    def __init__(self, count=0, total_us=0, scan_us=0, total_sketch=None, scan_sketch=None,
+                 nq_total=0, config=None):
+        self.count = count
+        self.total_us = total_us
+        self.scan_us = scan_us
+        self.total_sketch = total_sketch or LatencySketch()
+        self.scan_sketch = scan_sketch or LatencySketch()
+        self.nq_total = nq_total
+        self.config = config or {}
+
+    def add(self, record):
+        self.count += 1
+        self.total_us += record['total_time_us']
+        self.scan_us += record['scan_codes_time_us']
+        self.total_sketch.add(record['total_time_us'])
+        self.scan_sketch.add(record['scan_codes_time_us'])
+        self.nq_total += record.get('nq', 1)
+        self.config.update((k, record[k]) for k in self.CONFIG_FIELDS if record.get(k) is not None)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total_us += other.total_us
+        self.scan_us += other.scan_us
+        self.total_sketch.merge(other.total_sketch)
+        self.scan_sketch.merge(other.scan_sketch)
+        self.nq_total += other.nq_total
+        self.config.update(other.config)
+        return self
+
+    def to_dict(self):
+        return {'count': self.count, 'total_us': self.total_us, 'scan_us': self.scan_us,
+                'total_sketch': self.total_sketch.to_dict(), 'scan_sketch': self.scan_sketch.to_dict(),
+                'nq_total': self.nq_total, 'config': self.config}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['count'], d['total_us'], d['scan_us'],
+                   LatencySketch.from_dict(d['total_sketch']), LatencySketch.from_dict(d['scan_sketch']),
+                   d.get('nq_total', d['count']), d.get('config'))
+
+
+def selectivity_bucket(selectivity):
+    """Nearest SELECTIVITY_BUCKETS value in log space (scalar or array)"""
+    s = np.maximum(np.asarray(selectivity, dtype=float), 1e-6)
+    buckets = np.asarray(SELECTIVITY_BUCKETS)
+    nearest = buckets[np.abs(np.log(s[..., None] / buckets)).argmin(axis=-1)]
+    return float(nearest) if nearest.ndim == 0 else nearest
+
+
+def window_start(timestamp, window_s=WINDOW_S):
+    """ISO start of the fixed-size window containing an ISO-8601 timestamp"""
+    ts = datetime.fromisoformat(timestamp).timestamp()
+    return datetime.fromtimestamp(ts - ts % window_s, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class HookAggregator:
+    """
+    Single-pass aggregation over a hook log with a resumable byte offset.
+
+    Only complete lines are consumed, so a line the plugin is still writing
+    is picked up on the next pass. State (offset, file identity, the
+    per-index accumulators and the last MAX_WINDOWS time windows of
+    per-index total-latency sketches) is saved next to the log; if the file
+    was truncated or replaced the aggregation restarts from zero.
+    """
+
+    def __init__(self, log_file, state_file=None, window_s=WINDOW_S):
+        self.log_file = log_file
+        self.state_file = state_file or log_file + ".state.json"
+        self.window_s = window_s
+        self.offset = 0
+        self.inode = None
+        self.by_index = defaultdict(IndexStats)
+        self.by_selectivity = defaultdict(IndexStats)  # (index_type, bucket) for filtered searches
+        self.windows = {}
+        self.records = 0
+        self.bad_lines = 0
+
+    def load_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if state.get('version') != STATE_VERSION or state.get('window_s') != self.window_s:
+            return False  # older/different layout: re-aggregate from scratch
+        self.offset = state['offset']
+        self.inode = state['inode']
+        self.records = state['records']
+        self.bad_lines = state.get('bad_lines', 0)
+        self.by_index = defaultdict(IndexStats, {
+            idx: IndexStats.from_dict(d) for idx, d in state['by_index'].items()
+        })
+        self.by_selectivity = defaultdict(IndexStats, {
+            (key.rsplit('|', 1)[0], float(key.rsplit('|', 1)[1])): IndexStats.from_dict(d)
+            for key, d in state['by_selectivity'].items()
+        })
+        self.windows = {
+            w: {idx: LatencySketch.from_dict(d) for idx, d in per_index.items()}
+            for w, per_index in state['windows'].items()
+        }
+        return True
+
+    def save_state(self):
+        state = {
+            'version': STATE_VERSION,
+            'window_s': self.window_s,
+            'log_file': self.log_file,
+            'offset': self.offset,
+            'inode': self.inode,
+            'records': self.records,
+            'bad_lines': self.bad_lines,
+            'by_index': {idx: st.to_dict() for idx, st in self.by_index.items()},
+            'by_selectivity': {f"{idx}|{bucket}": st.to_dict()
+                               for (idx, bucket), st in self.by_selectivity.items()},
+            'windows': {w: {idx: sk.to_dict() for idx, sk in per_index.items()}
+                        for w, per_index in self.windows.items()},
+        }
+        tmp = self.state_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+
+    def reset(self):
+        self.offset = 0
+        self.by_index = defaultdict(IndexStats)
+        self.by_selectivity = defaultdict(IndexStats)
+        self.windows = {}
+        self.records = 0
+        self.bad_lines = 0
+
+    def _add_to_window(self, record):
+        try:
+            key = window_start(record['timestamp'], self.window_s)
+        except (KeyError, ValueError, TypeError):
+            return
+        per_index = self.windows.setdefault(key, {})
+        per_index.setdefault(record['index_type'], LatencySketch()).add(record['total_time_us'])
+
+    def consume(self):
+        """Process lines appended since the last offset; returns how many were read"""
+        st = os.stat(self.log_file)
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self.reset()
+            self.inode = st.st_ino
+
+        new = 0
+        with open(self.log_file, 'rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partial line still being written
+                self.offset += len(line)
+                try:
+                    record = json.loads(line)
+                    self.by_index[record['index_type']].add(record)
+                    if record.get('selectivity') is not None:
+                        key = (record['index_type'], selectivity_bucket(record['selectivity']))
+                        self.by_selectivity[key].add(record)
+                except (ValueError, KeyError, TypeError):
+                    self.bad_lines += 1
+                    continue
+                self._add_to_window(record)
+                new += 1
+        self.records += new
+        for key in sorted(self.windows)[:-MAX_WINDOWS]:
+            del self.windows[key]
+        return new
 
 def generate_mock_hook_data():
     """Generate realistic mock C++ hook data"""
@@ -19,11 +217,17 @@ def generate_mock_hook_data():
         ("FLAT", {}, 300000, 285000),  # FLAT has highest scan_codes ratio
     ]
     
+    # Batch shapes cycle so nq/top_k effects show up; scan_codes grows sub-linearly
+    # with nq (distance kernels batch well) while the rest is per-request overhead
+    batch_shapes = [(1, 10), (4, 10), (16, 10), (1, 100), (16, 100)]
+    
     for index_type, params, base_total, base_scan in scenarios:
         for i in range(10):  # 10 queries per index type
+            nq, top_k = batch_shapes[i % len(batch_shapes)]
+            batch_scale = nq ** 0.8 * (1 + 0.1 * (top_k > 10))
             # Add some variance
-            total_us = int(base_total * random.uniform(0.9, 1.1))
-            scan_codes_us = int(base_scan * random.uniform(0.85, 1.15))
+            scan_codes_us = int(base_scan * batch_scale * random.uniform(0.85, 1.15))
+            total_us = int((base_total - base_scan) * random.uniform(0.9, 1.1)) + scan_codes_us
             
             # Calculate breakdown
             other_us = total_us - scan_codes_us
@@ -38,53 +242,43 @@ def generate_mock_hook_data():
                 "scan_codes_time_us": scan_codes_us,
                 "other_time_us": other_us,
                 "scan_codes_percentage": round(scan_pct, 2),
-                "nq": 1,  # queries per batch
+                "nq": nq,  # queries per batch
                 "dim": 128,
-                "top_k": 10
+                "top_k": top_k
             })
     
     return mock_data
 
-def load_hook_data(log_file="/tmp/dbpu-knowhere-hooks.jsonl"):
-    """Load hook data from file, or generate mock if not exists"""
-    try:
-        with open(log_file, 'r') as f:
-            data = [json.loads(line) for line in f]
-        print(f"✅ Loaded {len(data)} real hook records from {log_file}")
-        return data
-    except FileNotFoundError:
-        print(f"⚠️  Hook data not found: {log_file}")
-        print("🎭 Generating mock C++ hook data...")
-        mock_data = generate_mock_hook_data()
-        
-        # Save mock data for inspection
-        with open(log_file, 'w') as f:
-            for record in mock_data:
-                f.write(json.dumps(record) + '\n')
-        
-        print(f"📝 Mock data saved to {log_file}")
-        return mock_data
+def ensure_hook_data(log_file="/tmp/dbpu-knowhere-hooks.jsonl"):
+    """Generate mock hook data if the log does not exist yet"""
+    if os.path.exists(log_file):
+        return
+    print(f"⚠️  Hook data not found: {log_file}")
+    print("🎭 Generating mock C++ hook data...")
+    mock_data = generate_mock_hook_data()
+    
+    # Save mock data for inspection
+    with open(log_file, 'w') as f:
+        for record in mock_data:
+            f.write(json.dumps(record) + '\n')
+    
+    print(f"📝 Mock data saved to {log_file}")
 
-def analyze_bottlenecks(data):
-    """Analyze scan_codes bottleneck by index type"""
+def analyze_bottlenecks(by_index):
+    """Analyze scan_codes bottleneck by index type (by_index: index_type -> IndexStats)"""
     print("\n" + "="*80)
     print("🔬 FAISS OPERATION BREAKDOWN (C++ Profiling)")
     print("="*80)
     
-    # Group by index type
-    by_index = defaultdict(list)
-    for record in data:
-        by_index[record['index_type']].append(record)
-    
     print(f"\n{'Index Type':<15} {'Avg Total (ms)':<18} {'Avg scan_codes (ms)':<22} {'% of Total':<12} {'Bottleneck?'}")
     print("-" * 80)
     
     bottleneck_summary = []
     
-    for index_type, records in sorted(by_index.items()):
-        avg_total = sum(r['total_time_us'] for r in records) / len(records) / 1000
-        avg_scan = sum(r['scan_codes_time_us'] for r in records) / len(records) / 1000
-        avg_pct = (avg_scan / avg_total) * 100
+    for index_type, stats in sorted(by_index.items()):
+        avg_total = stats.total_us / stats.count / 1000
+        avg_scan = stats.scan_us / stats.count / 1000
+        avg_pct = (avg_scan / avg_total) * 100 if avg_total else 0.0
         
         # Determine if it's a bottleneck (>70% of time)
         is_bottleneck = "🔥 YES" if avg_pct > 70 else "✅ No"
@@ -96,50 +290,190 @@ def analyze_bottlenecks(data):
             'avg_total_ms': avg_total,
             'avg_scan_ms': avg_scan,
             'scan_percentage': avg_pct,
-            'is_bottleneck': avg_pct > 70
+            'is_bottleneck': avg_pct > 70,
+            'avg_nq': stats.nq_total / stats.count,
+            'config': stats.config,
         })
     
     return bottleneck_summary
 
-def calculate_acceleration_potential(summary):
-    """Calculate potential speedup with DBPU acceleration"""
+def print_latency_distribution(by_index):
+    """p50/p95/p99/max of total and scan_codes time per index type (from sketches)"""
+    print("\n" + "="*80)
+    print("📊 LATENCY DISTRIBUTION (ms)")
+    print("="*80)
+    print(f"\n{'Index Type':<15} {'Metric':<12} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+    print("-" * 80)
+    for index_type, stats in sorted(by_index.items()):
+        for name, sketch in (("total", stats.total_sketch), ("scan_codes", stats.scan_sketch)):
+            s = sketch.summary()
+            print(f"{index_type:<15} {name:<12} {s['p50'] / 1000:>10.2f} {s['p95'] / 1000:>10.2f} "
+                  f"{s['p99'] / 1000:>10.2f} {s['max'] / 1000:>10.2f}")
+
+def print_selectivity_breakdown(by_selectivity):
+    """How the scan_codes share moves with filter selectivity, per index type"""
+    if not by_selectivity:
+        return
+    print("\n" + "="*80)
+    print("🧪 FILTERED SEARCH: scan_codes SHARE BY SELECTIVITY")
+    print("="*80)
+    print(f"\n{'Index Type':<15} {'Selectivity ≈':>14} {'Count':>8} {'Avg Total (ms)':>15} "
+          f"{'Avg scan (ms)':>14} {'% scan':>8}")
+    print("-" * 80)
+    for (index_type, bucket), stats in sorted(by_selectivity.items()):
+        avg_total = stats.total_us / stats.count / 1000
+        avg_scan = stats.scan_us / stats.count / 1000
+        pct = avg_scan / avg_total * 100 if avg_total else 0.0
+        print(f"{index_type:<15} {bucket:>13.1%} {stats.count:>8,} {avg_total:>15.2f} {avg_scan:>14.2f} {pct:>7.1f}%")
+
+def print_windows(windows, last_n=12):
+    """Per-window total-latency percentiles for the most recent windows"""
+    if not windows:
+        return
+    print(f"\n🕒 Per-window total latency (ms), last {min(last_n, len(windows))} windows")
+    print(f"{'Window start (UTC)':<22} {'Index Type':<12} {'Count':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    print("-" * 80)
+    for key in sorted(windows)[-last_n:]:
+        for index_type, sketch in sorted(windows[key].items()):
+            s = sketch.summary()
+            print(f"{key:<22} {index_type:<12} {s['count']:>8,} {s['p50'] / 1000:>9.2f} "
+                  f"{s['p95'] / 1000:>9.2f} {s['p99'] / 1000:>9.2f} {s['max'] / 1000:>9.2f}")
+
+def calculate_acceleration_potential(summary, device=None, workload=None):
+    """Projected DBPU speedup per index type from the offload cost model"""
     print("\n" + "="*80)
     print("🚀 DBPU ACCELERATION POTENTIAL")
     print("="*80)
     
-    for item in summary:
+    rows = pd.DataFrame([dict(item['config'], index_type=item['index_type'], nq=item['avg_nq'],
+                              total_time_us=item['avg_total_ms'] * 1000,
+                              scan_codes_time_us=item['avg_scan_ms'] * 1000) for item in summary])
+    projected = project(rows, device, workload) if len(rows) else rows
+    
+    for item, (_, proj) in zip(summary, projected.iterrows()):
         print(f"\n{item['index_type']} Analysis:")
         print("-" * 40)
-        print(f"Current Performance:  {item['avg_total_ms']:.2f}ms")
+        print(f"Current Performance:  {item['avg_total_ms']:.2f}ms (nq={item['avg_nq']:.0f})")
         print(f"scan_codes Time:      {item['avg_scan_ms']:.2f}ms ({item['scan_percentage']:.1f}%)")
         
         if item['is_bottleneck']:
             print(f"🎯 HIGH PRIORITY - scan_codes is the bottleneck!")
-            
-            # Calculate speedup scenarios
-            for accel in [5, 10, 20]:
-                new_scan_time = item['avg_scan_ms'] / accel
-                other_time = item['avg_total_ms'] - item['avg_scan_ms']
-                new_total = other_time + new_scan_time
-                speedup = item['avg_total_ms'] / new_total
-                
-                print(f"   {accel:2d}x DBPU → {new_total:6.2f}ms (overall {speedup:.2f}x speedup)")
         else:
             print(f"⚠️  scan_codes not the primary bottleneck")
             print(f"   Focus on other optimizations first")
+        
+        be = proj['break_even_nq']
+        print(f"   Offloaded scan_codes: {proj['offload_scan_us'] / 1000:.3f}ms "
+              f"(transfer {proj['transfer_us'] / 1000:.3f}ms, kernel {proj['kernel_us'] / 1000:.3f}ms, "
+              f"{proj['bytes_moved'] / 1024:.1f} KiB moved)")
+        print(f"   DBPU → {proj['projected_total_us'] / 1000:6.2f}ms "
+              f"(overall {proj['projected_speedup']:.2f}x speedup, {proj['projected_qps']:,.0f} queries/s)")
+        print(f"   Break-even batch: " + (f"nq ≥ {be:.0f}" if be == be else "never (CPU wins up to nq=4096)"))
+
+def stats_from_store(store, since=None, window_s=WINDOW_S):
+    """Per-index and per-selectivity IndexStats plus per-window sketches from the columnar store (vectorized)"""
+    df = store.load("hooks", columns=["timestamp", "index_type", "total_time_us", "scan_codes_time_us", "nq",
+                                      "selectivity", *IndexStats.CONFIG_FIELDS], since=since)
+    by_index = {}
+    for idx, group in df.groupby("index_type"):
+        last = group.iloc[-1]
+        config = {k: (json.loads(last[k]) if k.endswith("_params") else int(last[k]))
+                  for k in IndexStats.CONFIG_FIELDS if last[k] is not None and last[k] == last[k]}
+        stats = IndexStats(len(group), int(group["total_time_us"].sum()), int(group["scan_codes_time_us"].sum()),
+                           nq_total=int(group["nq"].fillna(1).sum()), config=config)
+        stats.total_sketch.add_many(group["total_time_us"].to_numpy(dtype=float))
+        stats.scan_sketch.add_many(group["scan_codes_time_us"].to_numpy(dtype=float))
+        by_index[idx] = stats
+    
+    by_selectivity = {}
+    filtered = df[df["selectivity"].notna()]
+    if not filtered.empty:
+        buckets = pd.Series(selectivity_bucket(filtered["selectivity"].to_numpy()), index=filtered.index)
+        for (idx, bucket), group in filtered.groupby(["index_type", buckets]):
+            by_selectivity[(idx, bucket)] = IndexStats(len(group), int(group["total_time_us"].sum()),
+                                                       int(group["scan_codes_time_us"].sum()))
+    
+    windows = {}
+    df = df[df["timestamp"].notna()]
+    starts = df["timestamp"].dt.floor(f"{window_s}s").dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+    for (key, idx), group in df.groupby([starts, "index_type"]):
+        sketch = LatencySketch()
+        sketch.add_many(group["total_time_us"].to_numpy(dtype=float))
+        windows.setdefault(key, {})[idx] = sketch
+    return by_index, by_selectivity, windows
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Analyze C++ profiling hook logs")
+    parser.add_argument("--log", default=os.getenv("HOOK_LOG_FILE", "/tmp/dbpu-knowhere-hooks.jsonl"),
+                        help="hook log file (JSONL)")
+    parser.add_argument("--reset", action="store_true",
+                        help="ignore saved state and re-aggregate from the start of the file")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep tailing the log and re-print the breakdown as new lines arrive")
+    parser.add_argument("--store", action="store_true",
+                        help="aggregate from the Parquet run store instead of the raw log")
+    parser.add_argument("--since", default=None, metavar="YYYY-MM-DD",
+                        help="with --store: only hook records on or after this date")
+    parser.add_argument("--window", type=int, default=WINDOW_S,
+                        help="time window for per-window percentiles (s)")
+    parser.add_argument("--interval", type=float, default=5.0, help="poll interval for --follow (s)")
+    add_device_args(parser.add_argument_group("offload model"))
+    return parser.parse_args()
 
 def main():
     """Main analysis entry point"""
-    import os
-    
-    hook_file = os.getenv("HOOK_LOG_FILE", "/tmp/dbpu-knowhere-hooks.jsonl")
+    args = parse_args()
+    hook_file = args.log
+    device, workload = device_from_args(args)
     
     # Load data (real or mock)
-    data = load_hook_data(hook_file)
+    ensure_hook_data(hook_file)
+    
+    if args.store:
+        from run_store import open_store
+        store = open_store()
+        if store is not None:
+            by_index, by_selectivity, windows = stats_from_store(store, args.since, args.window)
+            print(f"✅ Aggregated {sum(st.count for st in by_index.values()):,} hook records "
+                  f"from run store {store.store_dir}")
+            summary = analyze_bottlenecks(by_index)
+            print_latency_distribution(by_index)
+            print_selectivity_breakdown(by_selectivity)
+            print_windows(windows)
+            calculate_acceleration_potential(summary, device, workload)
+            return
+    
+    aggregator = HookAggregator(hook_file, window_s=args.window)
+    if not args.reset and aggregator.load_state():
+        print(f"↪️  Resuming from byte {aggregator.offset:,} ({aggregator.records:,} records already aggregated)")
+    new = aggregator.consume()
+    aggregator.save_state()
+    print(f"✅ Aggregated {new:,} new hook records from {hook_file} ({aggregator.records:,} total)")
+    if aggregator.bad_lines:
+        print(f"⚠️  Skipped {aggregator.bad_lines} malformed lines")
     
     # Analyze
-    summary = analyze_bottlenecks(data)
-    calculate_acceleration_potential(summary)
+    summary = analyze_bottlenecks(aggregator.by_index)
+    print_latency_distribution(aggregator.by_index)
+    print_selectivity_breakdown(aggregator.by_selectivity)
+    print_windows(aggregator.windows)
+    calculate_acceleration_potential(summary, device, workload)
+    
+    if args.follow:
+        print(f"\n👀 Following {hook_file} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(args.interval)
+                new = aggregator.consume()
+                if new:
+                    aggregator.save_state()
+                    print(f"\n[{time.strftime('%H:%M:%S')}] +{new:,} records ({aggregator.records:,} total)")
+                    analyze_bottlenecks(aggregator.by_index)
+                    print_latency_distribution(aggregator.by_index)
+        except KeyboardInterrupt:
+            aggregator.save_state()
+            print("\n👋 Stopped following")
+        return
     
     print("\n" + "="*80)
     print("💡 Next Steps:")
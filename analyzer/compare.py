@@ -0,0 +1,304 @@
+"""
+DBPU Run Comparison
+Diffs two lab runs per configuration with bootstrap confidence intervals
+and exits nonzero when a statistically significant regression is found
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+LOG_FILE = os.getenv("LOG_FILE", "/tmp/dbpu-knowhere.jsonl")
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE = 0.95
+MIN_EFFECT = 0.05  # changes smaller than 5% are never flagged, however certain
+CONFIG_FIELDS = ["workload", "index_type", "metric", "index_params", "search_params", "concurrency",
+                 "processes", "offered_qps", "num_queries", "top_k", "cache", "cache_params",
+                 "filter_field", "target_selectivity"]
+LATENCY_METRICS = [("p50", 0.50), ("p99", 0.99)]
+# Under a fixed client count throughput is concurrency / mean latency (Little's law)
+CLOSED_LOOP_WORKLOADS = {"closed_loop", "multi_process", "mixed"}
+SKIP_WORKLOADS = {"run_info", "ingest", "index_build", "resource_sample"}
+
+
+def load_records(log_file=LOG_FILE, use_store=False):
+    """All client records (every run) as dicts"""
+    if use_store:
+        from run_store import open_store, CLIENT_COLUMNS
+        store = open_store()
+        if store is not None:
+            df = store.load("client")
+            records = []
+            for row in df.to_dict("records"):
+                extra = json.loads(row.pop("extra") or "{}")
+                record = {k: v for k, v in row.items() if v is not None and v == v}
+                for k, kind in CLIENT_COLUMNS.items():
+                    if k in record and kind == "json":
+                        record[k] = json.loads(record[k])
+                    elif k in record and kind == "int64":
+                        record[k] = int(record[k])
+                record["timestamp"] = str(record.get("timestamp", ""))
+                record.update(extra)
+                records.append(record)
+            return records
+    with open(log_file, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def runs_in_order(records):
+    """run_id -> first timestamp, oldest first"""
+    started = {}
+    for r in records:
+        run_id = r.get("run_id")
+        if run_id and (run_id not in started or str(r.get("timestamp", "")) < started[run_id]):
+            started[run_id] = str(r.get("timestamp", ""))
+    return sorted(started, key=started.get)
+
+
+def resolve_run(records, ref):
+    """Run id from 'latest', 'previous', a full/prefix run id, or a --tag given to lab_gen"""
+    runs = runs_in_order(records)
+    if not runs:
+        raise SystemExit("❌ No tagged runs in the log (run workloads/lab_gen.py first)")
+    if ref == "latest":
+        return runs[-1]
+    if ref == "previous":
+        if len(runs) < 2:
+            raise SystemExit("❌ Only one run in the log; nothing to compare against")
+        return runs[-2]
+    if ref in runs:
+        return ref
+    tagged = [r["run_id"] for r in records if r.get("tag") == ref and r.get("run_id")]
+    if tagged:
+        return max(tagged, key=runs.index)
+    matches = [run for run in runs if run.startswith(ref)]
+    if len(matches) == 1:
+        return matches[0]
+    raise SystemExit(f"❌ Run '{ref}' not found" + (" (ambiguous prefix)" if matches else ""))
+
+
+def config_key(record):
+    # Records written before the metric was logged were all L2
+    record = dict(record, metric=record.get("metric") or "L2")
+    return tuple(json.dumps(record.get(f), sort_keys=True) for f in CONFIG_FIELDS)
+
+
+def config_label(record):
+    label = record.get("label") or record.get("index_type")
+    parts = [label, record.get("workload") or "single"]
+    if record.get("concurrency") is not None:
+        parts.append(f"c={record['concurrency']}")
+    if record.get("offered_qps") is not None:
+        parts.append(f"@{record['offered_qps']:.0f}qps")
+    if record.get("workload") == "batch_sweep":
+        parts.append(f"nq={record.get('num_queries')} k={record.get('top_k')}")
+    if record.get("filter_field") is not None:
+        parts.append(f"{record['filter_field']} sel={record.get('target_selectivity'):g}")
+    if record.get("cache") is not None:
+        params = record.get("cache_params") or {}
+        parts.append(record["cache"])
+        if "threshold" in params:
+            parts.append(f"t={params['threshold']:g}")
+        if "quant_step" in params:
+            parts.append(f"q={params['quant_step']:g}")
+        if "max_mb" in params:
+            parts.append(f"{params['max_mb']:g}MB")
+    return " ".join(str(p) for p in parts)
+
+
+def weighted_samples(records):
+    """
+    (sorted values, counts) of per-request latency in ms for one config.
+
+    Records carrying a latency sketch contribute their buckets (each at its
+    representative value, within the sketch's 1% error); single-shot records
+    contribute their one latency.
+    """
+    values, counts = [], []
+    for r in records:
+        sketch = r.get("latency_sketch")
+        if sketch:
+            gamma = (1 + sketch["relative_accuracy"]) / (1 - sketch["relative_accuracy"])
+            for key, n in sketch["buckets"].items():
+                values.append(2 * gamma ** int(key) / (gamma + 1))
+                counts.append(n)
+            if sketch["zero_count"]:
+                values.append(0.0)
+                counts.append(sketch["zero_count"])
+        elif r.get("latency_ms") is not None:
+            values.append(r["latency_ms"])
+            counts.append(1)
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    order = np.argsort(values)
+    return values[order], counts[order]
+
+
+def _quantiles(values, counts, q):
+    """q-quantile of each row of a (B, m) count matrix over sorted `values`"""
+    counts = np.atleast_2d(counts)
+    cum = counts.cumsum(axis=1)
+    rank = q * (cum[:, -1] - 1)
+    idx = (cum <= rank[:, None]).sum(axis=1)
+    return values[np.minimum(idx, len(values) - 1)]
+
+
+def bootstrap(values, counts, rng, samples=BOOTSTRAP_SAMPLES):
+    """Observed statistics and bootstrap replicates (arrays) of p50, p99 and mean latency"""
+    n = int(counts.sum())
+    observed = {name: float(_quantiles(values, counts, q)[0]) for name, q in LATENCY_METRICS}
+    observed["mean"] = float((values * counts).sum() / n)
+    if n < 2:
+        return observed, None
+    # Resampling n requests with replacement = multinomial draw over the distinct values
+    resampled = rng.multinomial(n, counts / n, size=samples)
+    replicates = {name: _quantiles(values, resampled, q) for name, q in LATENCY_METRICS}
+    replicates["mean"] = (resampled * values).sum(axis=1) / n
+    return observed, replicates
+
+
+def summarize_config(records, rng, samples):
+    values, counts = weighted_samples(records)
+    if counts.sum() == 0:
+        return None
+    observed, replicates = bootstrap(values, counts, rng, samples)
+    observed["n"] = int(counts.sum())
+    qps = [r["qps"] for r in records if r.get("qps") is not None]
+    if qps:
+        observed["qps"] = float(np.mean(qps))
+        if replicates is not None and records[0].get("workload") in CLOSED_LOOP_WORKLOADS:
+            replicates["qps"] = observed["qps"] * observed["mean"] / replicates["mean"]
+        elif replicates is not None and len(qps) > 1:
+            picks = rng.integers(0, len(qps), size=(samples, len(qps)))
+            replicates["qps"] = np.asarray(qps)[picks].mean(axis=1)
+    return observed, replicates
+
+
+def compare_runs(records, baseline, candidate, samples=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE,
+                 min_effect=MIN_EFFECT, seed=0):
+    """
+    One row per (config, metric) present in both runs.
+
+    The change is candidate/baseline; its confidence interval comes from
+    pairing independent bootstrap replicates of the two runs. A latency
+    metric regresses when the whole interval lies above 1 + min_effect,
+    QPS when it lies below 1 - min_effect; intervals on the other side mark
+    improvements.
+    """
+    rng = np.random.default_rng(seed)
+    by_run = {baseline: {}, candidate: {}}
+    labels = {}
+    for r in records:
+        if r.get("run_id") in by_run and r.get("workload") not in SKIP_WORKLOADS:
+            key = config_key(r)
+            by_run[r["run_id"]].setdefault(key, []).append(r)
+            labels.setdefault(key, config_label(r))
+
+    alpha = (1 - confidence) / 2
+    rows = []
+    for key in by_run[baseline]:
+        if key not in by_run[candidate]:
+            continue
+        base = summarize_config(by_run[baseline][key], rng, samples)
+        cand = summarize_config(by_run[candidate][key], rng, samples)
+        if base is None or cand is None:
+            continue
+        (base_obs, base_rep), (cand_obs, cand_rep) = base, cand
+        for metric in ["p50", "p99", "qps"]:
+            if metric not in base_obs or metric not in cand_obs or not base_obs[metric]:
+                continue
+            row = {"config": labels[key], "metric": metric, "baseline": base_obs[metric],
+                   "candidate": cand_obs[metric], "ratio": cand_obs[metric] / base_obs[metric],
+                   "n_baseline": base_obs["n"], "n_candidate": cand_obs["n"],
+                   "ci_low": None, "ci_high": None, "verdict": "insufficient data"}
+            if base_rep is not None and cand_rep is not None and metric in base_rep and metric in cand_rep:
+                ratios = cand_rep[metric] / np.maximum(base_rep[metric], 1e-12)
+                row["ci_low"], row["ci_high"] = (float(v) for v in np.quantile(ratios, [alpha, 1 - alpha]))
+                higher_is_worse = metric != "qps"
+                if row["ci_low"] > 1 + min_effect:
+                    row["verdict"] = "REGRESSION" if higher_is_worse else "improved"
+                elif row["ci_high"] < 1 - min_effect:
+                    row["verdict"] = "improved" if higher_is_worse else "REGRESSION"
+                else:
+                    row["verdict"] = "no change"
+            rows.append(row)
+    return rows
+
+
+def environment_diff(records, baseline, candidate):
+    """Environment fields that differ between the two runs' run_info records"""
+    envs = {}
+    for r in records:
+        if r.get("workload") == "run_info" and r.get("run_id") in (baseline, candidate):
+            envs[r["run_id"]] = r.get("environment", {})
+    a, b = envs.get(baseline, {}), envs.get(candidate, {})
+    return {k: (a.get(k), b.get(k)) for k in sorted(set(a) | set(b))
+            if k != "argv" and a.get(k) != b.get(k)}
+
+
+def print_report(rows, baseline, candidate, env_diff, confidence):
+    print("\n" + "="*100)
+    print("⚖️  RUN COMPARISON")
+    print("="*100)
+    print(f"Baseline:  {baseline}")
+    print(f"Candidate: {candidate}")
+    if env_diff:
+        print("\nEnvironment differences:")
+        for k, (a, b) in env_diff.items():
+            print(f"  {k:<16} {a} → {b}")
+
+    print(f"\n{'Config':<48} {'Metric':<6} {'Baseline':>10} {'Candidate':>10} {'Change':>8} "
+          f"{f'{confidence:.0%} CI':>17}  Verdict")
+    print("-" * 100)
+    for row in rows:
+        change = (row["ratio"] - 1) * 100
+        ci = (f"[{(row['ci_low'] - 1) * 100:+.1f}, {(row['ci_high'] - 1) * 100:+.1f}]%"
+              if row["ci_low"] is not None else "n/a")
+        marker = "🔴 " if row["verdict"] == "REGRESSION" else ("🟢 " if row["verdict"] == "improved" else "")
+        unit = "" if row["metric"] == "qps" else "ms"
+        print(f"{row['config'][:48]:<48} {row['metric']:<6} {row['baseline']:>8.2f}{unit:<2} "
+              f"{row['candidate']:>8.2f}{unit:<2} {change:>+7.1f}% {ci:>17}  {marker}{row['verdict']}")
+    print()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare two lab runs with bootstrap confidence intervals")
+    parser.add_argument("baseline", nargs="?", default="previous",
+                        help="run id (or prefix), tag, 'previous' or 'latest' (default: previous)")
+    parser.add_argument("candidate", nargs="?", default="latest",
+                        help="run id (or prefix), tag, 'previous' or 'latest' (default: latest)")
+    parser.add_argument("--log", default=LOG_FILE, help="client log file (JSONL)")
+    parser.add_argument("--store", action="store_true", help="read runs from the Parquet run store")
+    parser.add_argument("--bootstrap", type=int, default=BOOTSTRAP_SAMPLES, help="bootstrap replicates")
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE, help="confidence level")
+    parser.add_argument("--min-effect", type=float, default=MIN_EFFECT,
+                        help="smallest relative change that can be flagged (0.05 = 5%%)")
+    parser.add_argument("--seed", type=int, default=0, help="bootstrap RNG seed")
+    return parser.parse_args()
+
+
+def main():
+    """Exit status: 0 no significant regression, 1 regression found, 2 nothing comparable"""
+    args = parse_args()
+    records = load_records(args.log, args.store)
+    baseline = resolve_run(records, args.baseline)
+    candidate = resolve_run(records, args.candidate)
+
+    rows = compare_runs(records, baseline, candidate, args.bootstrap, args.confidence,
+                        args.min_effect, args.seed)
+    print_report(rows, baseline, candidate, environment_diff(records, baseline, candidate), args.confidence)
+
+    if not rows:
+        print("⚠️  No configurations in common between the two runs")
+        sys.exit(2)
+    regressions = [r for r in rows if r["verdict"] == "REGRESSION"]
+    if regressions:
+        print(f"❌ {len(regressions)} significant regression(s)")
+        sys.exit(1)
+    print("✅ No significant regressions")
+
+
+if __name__ == "__main__":
+    main()
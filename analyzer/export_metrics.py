@@ -3,84 +3,249 @@ DBPU Metrics Exporter for Prometheus/Grafana
 Exports profiling metrics in Prometheus format
 """
 import json
+import os
+import threading
 import time
-from collections import defaultdict
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from collections import defaultdict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pandas as pd
+
+from latency_sketch import LatencySketch, QUANTILES
+from offload_model import project
+
+HOOK_LOG_FILE = os.getenv("HOOK_LOG_FILE", "/tmp/dbpu-knowhere-hooks.jsonl")
+RECENT_RECORDS = 30  # window for the "current" average gauges
+LATENCY_BUCKETS_MS = [0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+# Hook fields kept for recent records: the timings plus what the offload model needs
+RECENT_FIELDS = ["index_type", "total_time_us", "scan_codes_time_us", "nq", "dim", "top_k",
+                 "num_vectors", "index_params", "search_params"]
 
 # Mock data if no real logs exist
-def load_latest_metrics():
-    """Load latest profiling metrics"""
-    try:
-        with open("/tmp/dbpu-knowhere-hooks.jsonl", 'r') as f:
-            data = [json.loads(line) for line in f]
-        # Get last 30 records
-        return data[-30:] if len(data) > 30 else data
-    except:
-        # Return mock data
-        return [
-            {"index_type": "FLAT", "total_time_us": 300000, "scan_codes_time_us": 285000},
-            {"index_type": "IVF_FLAT", "total_time_us": 120000, "scan_codes_time_us": 95000},
-            {"index_type": "HNSW", "total_time_us": 50000, "scan_codes_time_us": 5000},
-        ]
+MOCK_RECORDS = [
+    {"index_type": "FLAT", "total_time_us": 300000, "scan_codes_time_us": 285000},
+    {"index_type": "IVF_FLAT", "total_time_us": 120000, "scan_codes_time_us": 95000},
+    {"index_type": "HNSW", "total_time_us": 50000, "scan_codes_time_us": 5000},
+]
+
+
+class IndexMetrics:
+    """Monotonic counters, histogram buckets and a quantile sketch for one index type"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.scan_ms = 0.0
+        self.total_buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.scan_buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.sketch = LatencySketch()
+
+    @staticmethod
+    def _observe(buckets, value_ms):
+        for i, le in enumerate(LATENCY_BUCKETS_MS):
+            if value_ms <= le:
+                buckets[i] += 1
+                return
+
+    def add(self, total_ms, scan_ms):
+        self.count += 1
+        self.total_ms += total_ms
+        self.scan_ms += scan_ms
+        self._observe(self.total_buckets, total_ms)
+        self._observe(self.scan_buckets, scan_ms)
+        self.sketch.add(total_ms)
+
+
+class MetricsCollector:
+    """
+    Tails the hook log in a background thread and keeps the rendered text.
+
+    Each poll consumes only complete lines appended since the last byte
+    offset, updates running counters/histograms per index type, and
+    re-renders the exposition text only if something changed. Scrapes just
+    return the cached string, so their cost does not grow with the log.
+    """
+
+    def __init__(self, log_file=HOOK_LOG_FILE, interval=1.0, device=None, workload=None):
+        self.log_file = log_file
+        self.interval = interval
+        self.device = device      # offload_model overrides; None = its defaults
+        self.workload = workload
+        self.offset = 0
+        self.inode = None
+        self.by_index = defaultdict(IndexMetrics)
+        self.recent = deque(maxlen=RECENT_RECORDS)
+        self.lines = 0
+        self.bad_lines = 0
+        self.text = ""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _reset(self):
+        self.offset = 0
+        self.by_index = defaultdict(IndexMetrics)
+        self.recent.clear()
+
+    def _add(self, record):
+        total_ms = record['total_time_us'] / 1000
+        scan_ms = record['scan_codes_time_us'] / 1000
+        self.by_index[record['index_type']].add(total_ms, scan_ms)
+        self.recent.append({f: record[f] for f in RECENT_FIELDS if f in record})
+
+    def poll(self):
+        """Consume new log lines and re-render if needed; returns lines consumed"""
+        with self._lock:
+            if not os.path.exists(self.log_file):
+                if not self.text:
+                    self.recent.extend(dict(r) for r in MOCK_RECORDS)
+                    self.text = self.render()
+                return 0
+
+            st = os.stat(self.log_file)
+            if st.st_ino != self.inode or st.st_size < self.offset:
+                self._reset()
+                self.inode = st.st_ino
+
+            new = 0
+            with open(self.log_file, 'rb') as f:
+                f.seek(self.offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    self.offset += len(line)
+                    try:
+                        self._add(json.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        self.bad_lines += 1
+                        continue
+                    new += 1
+            self.lines += new
+            if new or not self.text:
+                self.text = self.render()
+            return new
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except OSError:
+                pass
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.poll()
+        self._thread = threading.Thread(target=self._run, name="hook-tailer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def render(self):
+        """Prometheus exposition text for the current state"""
+        metrics = []
+        
+        # Averages over the most recent records (same semantics as before)
+        recent = defaultdict(lambda: {'total': 0, 'scan': 0, 'count': 0})
+        for r in self.recent:
+            recent[r['index_type']]['total'] += r['total_time_us']
+            recent[r['index_type']]['scan'] += r['scan_codes_time_us']
+            recent[r['index_type']]['count'] += 1
+        
+        # Help text
+        metrics.append("# HELP dbpu_search_latency_ms Average search latency in milliseconds")
+        metrics.append("# TYPE dbpu_search_latency_ms gauge")
+        
+        for idx, stats in recent.items():
+            avg_ms = (stats['total'] / stats['count']) / 1000
+            metrics.append(f'dbpu_search_latency_ms{{index_type="{idx}"}} {avg_ms:.2f}')
+        
+        metrics.append("")
+        metrics.append("# HELP dbpu_scan_codes_latency_ms Average scan_codes latency in milliseconds")
+        metrics.append("# TYPE dbpu_scan_codes_latency_ms gauge")
+        
+        for idx, stats in recent.items():
+            avg_ms = (stats['scan'] / stats['count']) / 1000
+            metrics.append(f'dbpu_scan_codes_latency_ms{{index_type="{idx}"}} {avg_ms:.2f}')
+        
+        metrics.append("")
+        metrics.append("# HELP dbpu_scan_codes_percentage Percentage of time spent in scan_codes")
+        metrics.append("# TYPE dbpu_scan_codes_percentage gauge")
+        
+        for idx, stats in recent.items():
+            pct = (stats['scan'] / stats['total']) * 100 if stats['total'] else 0.0
+            metrics.append(f'dbpu_scan_codes_percentage{{index_type="{idx}"}} {pct:.2f}')
+        
+        metrics.append("")
+        metrics.append("# HELP dbpu_acceleration_potential Projected speedup with scan_codes offloaded "
+                       "(offload_model: transfer, launch and kernel time)")
+        metrics.append("# TYPE dbpu_acceleration_potential gauge")
+        
+        if self.recent:
+            projected = project(pd.DataFrame(list(self.recent)), self.device, self.workload)
+            sums = projected.groupby("index_type")[["total_time_us", "projected_total_us"]].sum()
+            for idx, row in sums.iterrows():
+                speedup = row['total_time_us'] / row['projected_total_us'] if row['projected_total_us'] else 1.0
+                metrics.append(f'dbpu_acceleration_potential{{index_type="{idx}"}} {speedup:.2f}')
+        
+        # Cumulative counters and histograms since the exporter started reading the log
+        metrics.append("")
+        metrics.append("# HELP dbpu_searches_total Search operations seen in the hook log")
+        metrics.append("# TYPE dbpu_searches_total counter")
+        for idx, m in self.by_index.items():
+            metrics.append(f'dbpu_searches_total{{index_type="{idx}"}} {m.count}')
+        
+        for name, attr, buckets_attr, help_text in (
+            ("dbpu_search_duration_ms", "total_ms", "total_buckets", "Search latency histogram in milliseconds"),
+            ("dbpu_scan_codes_duration_ms", "scan_ms", "scan_buckets", "scan_codes latency histogram in milliseconds"),
+        ):
+            metrics.append("")
+            metrics.append(f"# HELP {name} {help_text}")
+            metrics.append(f"# TYPE {name} histogram")
+            for idx, m in self.by_index.items():
+                cumulative = 0
+                for le, n in zip(LATENCY_BUCKETS_MS, getattr(m, buckets_attr)):
+                    cumulative += n
+                    metrics.append(f'{name}_bucket{{index_type="{idx}",le="{le}"}} {cumulative}')
+                metrics.append(f'{name}_bucket{{index_type="{idx}",le="+Inf"}} {m.count}')
+                metrics.append(f'{name}_sum{{index_type="{idx}"}} {getattr(m, attr):.3f}')
+                metrics.append(f'{name}_count{{index_type="{idx}"}} {m.count}')
+        
+        metrics.append("")
+        metrics.append("# HELP dbpu_search_latency_quantile_ms Search latency quantiles in milliseconds")
+        metrics.append("# TYPE dbpu_search_latency_quantile_ms summary")
+        for idx, m in self.by_index.items():
+            for _, q in QUANTILES:
+                metrics.append(f'dbpu_search_latency_quantile_ms{{index_type="{idx}",quantile="{q}"}} {m.sketch.quantile(q):.2f}')
+            metrics.append(f'dbpu_search_latency_quantile_ms_sum{{index_type="{idx}"}} {m.sketch.sum:.2f}')
+            metrics.append(f'dbpu_search_latency_quantile_ms_count{{index_type="{idx}"}} {m.sketch.count}')
+        
+        metrics.append("")
+        metrics.append("# HELP dbpu_search_latency_max_ms Maximum search latency in milliseconds")
+        metrics.append("# TYPE dbpu_search_latency_max_ms gauge")
+        for idx, m in self.by_index.items():
+            metrics.append(f'dbpu_search_latency_max_ms{{index_type="{idx}"}} {m.sketch.max:.2f}')
+        
+        metrics.append("")
+        metrics.append("# HELP dbpu_exporter_log_lines_total Hook log lines consumed by the exporter")
+        metrics.append("# TYPE dbpu_exporter_log_lines_total counter")
+        metrics.append(f'dbpu_exporter_log_lines_total{{status="ok"}} {self.lines}')
+        metrics.append(f'dbpu_exporter_log_lines_total{{status="malformed"}} {self.bad_lines}')
+        
+        return "\n".join(metrics) + "\n"
 
 def generate_prometheus_metrics():
-    """Generate Prometheus-format metrics"""
-    data = load_latest_metrics()
-    
-    # Aggregate by index type
-    by_index = defaultdict(lambda: {'total': 0, 'scan': 0, 'count': 0})
-    
-    for record in data:
-        idx = record['index_type']
-        by_index[idx]['total'] += record['total_time_us']
-        by_index[idx]['scan'] += record['scan_codes_time_us']
-        by_index[idx]['count'] += 1
-    
-    # Generate metrics
-    metrics = []
-    
-    # Help text
-    metrics.append("# HELP dbpu_search_latency_ms Average search latency in milliseconds")
-    metrics.append("# TYPE dbpu_search_latency_ms gauge")
-    
-    for idx, stats in by_index.items():
-        avg_ms = (stats['total'] / stats['count']) / 1000
-        metrics.append(f'dbpu_search_latency_ms{{index_type="{idx}"}} {avg_ms:.2f}')
-    
-    metrics.append("")
-    metrics.append("# HELP dbpu_scan_codes_latency_ms Average scan_codes latency in milliseconds")
-    metrics.append("# TYPE dbpu_scan_codes_latency_ms gauge")
-    
-    for idx, stats in by_index.items():
-        avg_ms = (stats['scan'] / stats['count']) / 1000
-        metrics.append(f'dbpu_scan_codes_latency_ms{{index_type="{idx}"}} {avg_ms:.2f}')
-    
-    metrics.append("")
-    metrics.append("# HELP dbpu_scan_codes_percentage Percentage of time spent in scan_codes")
-    metrics.append("# TYPE dbpu_scan_codes_percentage gauge")
-    
-    for idx, stats in by_index.items():
-        pct = (stats['scan'] / stats['total']) * 100
-        metrics.append(f'dbpu_scan_codes_percentage{{index_type="{idx}"}} {pct:.2f}')
-    
-    metrics.append("")
-    metrics.append("# HELP dbpu_acceleration_potential Potential speedup with 10x DBPU")
-    metrics.append("# TYPE dbpu_acceleration_potential gauge")
-    
-    for idx, stats in by_index.items():
-        avg_total = stats['total'] / stats['count']
-        avg_scan = stats['scan'] / stats['count']
-        new_scan = avg_scan / 10
-        new_total = (avg_total - avg_scan) + new_scan
-        speedup = avg_total / new_total
-        metrics.append(f'dbpu_acceleration_potential{{index_type="{idx}"}} {speedup:.2f}')
-    
-    return "\n".join(metrics)
+    """Generate Prometheus-format metrics (one-shot, for scripts and tests)"""
+    collector = MetricsCollector()
+    collector.poll()
+    return collector.text
 
 class MetricsHandler(BaseHTTPRequestHandler):
+    collector = None  # shared MetricsCollector, set in main()
+    
     def do_GET(self):
         if self.path == '/metrics':
-            metrics = generate_prometheus_metrics()
+            metrics = self.collector.text
             self.send_response(200)
             self.send_header('Content-type', 'text/plain; charset=utf-8')
             self.end_headers()
@@ -105,7 +270,7 @@ scrape_configs:
                 </pre>
             </body>
             </html>
-            """.format(generate_prometheus_metrics())
+            """.format(self.collector.text)
             
             self.send_response(200)
             self.send_header('Content-type', 'text/html')
@@ -122,7 +287,11 @@ scrape_configs:
 def main():
     """Start metrics exporter server"""
     port = 9090
-    server = HTTPServer(('0.0.0.0', port), MetricsHandler)
+    collector = MetricsCollector(HOOK_LOG_FILE)
+    collector.start()
+    MetricsHandler.collector = collector
+    # Threaded so concurrent scrapers (e.g. Prometheus HA pairs) never queue behind each other
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
     
     print("="*60)
     print("🚀 DBPU Metrics Exporter Started")
@@ -139,6 +308,7 @@ def main():
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n\n👋 Shutting down...")
+        collector.stop()
         server.shutdown()
 
 if __name__ == "__main__":
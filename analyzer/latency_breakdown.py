@@ -0,0 +1,197 @@
+"""
+DBPU Per-Request Latency Breakdown
+Joins client request records with server hook records and splits each
+request into serialization, transport/queueing, engine and scan_codes time
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REQUEST_LOG_FILE = os.getenv("REQUEST_LOG_FILE", "/tmp/dbpu-requests.jsonl")
+HOOK_LOG_FILE = os.getenv("HOOK_LOG_FILE", "/tmp/dbpu-knowhere-hooks.jsonl")
+PERCENTILES = [50, 90, 99]
+COMPONENTS = ["serialize_ms", "transport_ms", "engine_other_ms", "scan_ms"]
+GROUP_FIELDS = ["workload", "label", "index_type"]
+TOLERANCE_MS = 1.0  # clock slack allowed when matching hooks to requests by time
+LOCAL_TZ = datetime.now().astimezone().tzinfo  # for naive timestamps, written by datetime.now()
+OFFSET_SUFFIX = r"(?:Z|[+-]\d\d:?\d\d)$"
+
+
+def read_jsonl(path):
+    """Records of a JSONL file as a DataFrame; malformed lines (e.g. a torn last line) are skipped"""
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return pd.DataFrame(records)
+
+
+def parse_times(values):
+    """
+    ISO timestamps as tz-aware UTC. Hooks and request records carry an
+    offset (Milvus hooks end in Z); naive ones, from older logs and the run
+    log, are local time and are localized before conversion.
+    """
+    values = pd.Series(values).astype(str)
+    naive = ~values.str.contains(OFFSET_SUFFIX)
+    times = pd.to_datetime(values.where(~naive, values + "Z"), utc=True, format="ISO8601")
+    if naive.any():
+        local = pd.to_datetime(values[naive], format="ISO8601").dt.tz_localize(LOCAL_TZ)
+        times[naive] = local.dt.tz_convert("UTC")
+    return times
+
+
+def select_run(requests, run_id):
+    """Requests of one run: 'latest', a full run id or a unique prefix"""
+    if requests.empty:
+        raise SystemExit("❌ Request log is empty (run workloads/lab_gen.py first)")
+    started = requests.groupby("run_id")["sent_at"].min().sort_values()
+    if run_id == "latest":
+        run_id = started.index[-1]
+    else:
+        matches = [r for r in started.index if r.startswith(run_id)]
+        if len(matches) != 1:
+            raise SystemExit(f"❌ Run '{run_id}' not found" + (" (ambiguous prefix)" if matches else ""))
+        run_id = matches[0]
+    return run_id, requests[requests["run_id"] == run_id].copy()
+
+
+def join_hooks(requests, hooks, tolerance_ms=TOLERANCE_MS):
+    """
+    Attach one hook record to each request where possible.
+
+    Hooks carrying a request_id (the local engine) join exactly. The rest
+    (Milvus hooks, which pymilvus gives no way to tag) are matched by time:
+    a hook belongs to the most recently sent request with the same nq and
+    top_k whose [sent, received] window contains the hook's start and end,
+    within `tolerance_ms`. When several hooks land on one request, e.g. one
+    per segment, the slowest is kept since segments are searched in parallel.
+    Returns the requests with total_time_us, scan_codes_time_us and a
+    `match` column ("id", "time" or None).
+    """
+    requests = requests.copy()
+    requests["sent"] = parse_times(requests["sent_at"])
+    requests["received"] = parse_times(requests["timestamp"])
+    requests["match"] = None
+    if hooks.empty:
+        requests["total_time_us"] = np.nan
+        requests["scan_codes_time_us"] = np.nan
+        return requests
+
+    if "operation" in hooks:
+        hooks = hooks[hooks["operation"] == "search"]
+    hooks = hooks.copy()
+    if "request_id" not in hooks:
+        hooks["request_id"] = None
+    fields = ["total_time_us", "scan_codes_time_us"]
+
+    by_id = hooks[hooks["request_id"].isin(requests["request_id"])]
+    by_id = by_id.sort_values("total_time_us").drop_duplicates("request_id", keep="last")
+    matched = by_id[["request_id"] + fields].assign(match="id")
+
+    pending_requests = requests[~requests["request_id"].isin(matched["request_id"])]
+    loose = hooks[hooks["request_id"].isna()].copy()
+    if not loose.empty and not pending_requests.empty:
+        tolerance = pd.Timedelta(milliseconds=tolerance_ms)
+        loose["end"] = parse_times(loose["timestamp"])
+        loose["start"] = loose["end"] - pd.to_timedelta(loose["total_time_us"], unit="us")
+        window = requests["sent"].min() - tolerance, requests["received"].max() + tolerance
+        loose = loose[(loose["start"] >= window[0]) & (loose["end"] <= window[1])]
+        loose = loose.astype({"nq": "int64", "top_k": "int64"}).sort_values("start")
+        candidates = pending_requests[["request_id", "sent", "received", "nq", "top_k"]]
+        candidates = candidates.astype({"nq": "int64", "top_k": "int64"}).sort_values("sent")
+        timed = pd.merge_asof(loose, candidates, left_on="start", right_on="sent", by=["nq", "top_k"],
+                              direction="backward", tolerance=None, suffixes=("_hook", ""))
+        timed = timed[timed["received"].notna()
+                      & (timed["start"] >= timed["sent"] - tolerance)
+                      & (timed["end"] <= timed["received"] + tolerance)]
+        timed = timed.sort_values("total_time_us").drop_duplicates("request_id", keep="last")
+        matched = pd.concat([matched, timed[["request_id"] + fields].assign(match="time")])
+
+    requests = requests.drop(columns="match").merge(matched, on="request_id", how="left")
+    return requests
+
+
+def breakdown(joined):
+    """Per-request components in ms; requests without a matched hook are dropped"""
+    df = joined[joined["match"].notna()].copy()
+    df["engine_ms"] = df["total_time_us"] / 1000
+    df["scan_ms"] = df["scan_codes_time_us"] / 1000
+    df["engine_other_ms"] = df["engine_ms"] - df["scan_ms"]
+    # Whatever the client waited beyond encoding and engine time: network, RPC, proxy and queueing
+    df["transport_ms"] = (df["latency_ms"] - df["serialize_ms"] - df["engine_ms"]).clip(lower=0)
+    return df
+
+
+def summarize(df, group_fields=GROUP_FIELDS):
+    """Per group: request count and p50/p90/p99 plus mean share of latency for each component"""
+    group_fields = [f for f in group_fields if f in df]
+    rows = []
+    for key, group in df.groupby(group_fields, dropna=False, sort=False):
+        key = key if isinstance(key, tuple) else (key,)
+        row = dict(zip(group_fields, key), requests=len(group))
+        total = group["latency_ms"].sum()
+        for column in ["latency_ms"] + COMPONENTS:
+            for p in PERCENTILES:
+                row[f"{column}_p{p}"] = float(np.percentile(group[column], p))
+            row[f"{column}_share"] = float(group[column].sum() / total) if total > 0 else 0.0
+        rows.append(row)
+    return rows
+
+
+def print_breakdown(rows):
+    for row in rows:
+        name = " / ".join(str(row[f]) for f in GROUP_FIELDS if row.get(f) is not None)
+        print(f"\n{name}  ({row['requests']:,} requests)")
+        print(f"  {'component':<16} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'share':>7}")
+        for column in ["latency_ms"] + COMPONENTS:
+            label = "end-to-end" if column == "latency_ms" else column[:-3]
+            print(f"  {label:<16} {row[f'{column}_p50']:>9.3f} {row[f'{column}_p90']:>9.3f} "
+                  f"{row[f'{column}_p99']:>9.3f} {row[f'{column}_share'] * 100:>6.1f}%")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Split per-request latency into client, transport and engine time")
+    parser.add_argument("--requests", default=REQUEST_LOG_FILE, help="client request log (JSONL)")
+    parser.add_argument("--hooks", default=HOOK_LOG_FILE, help="hook log (JSONL)")
+    parser.add_argument("--run-id", default="latest", help="run id or unique prefix (default: latest)")
+    parser.add_argument("--tolerance-ms", type=float, default=TOLERANCE_MS,
+                        help="clock slack when matching hooks without a request id by time")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.requests):
+        raise SystemExit(f"❌ No request log at {args.requests} (run workloads/lab_gen.py first)")
+    run_id, requests = select_run(read_jsonl(args.requests), args.run_id)
+    hooks = read_jsonl(args.hooks) if os.path.exists(args.hooks) else pd.DataFrame()
+    if "run_id" in hooks:
+        # Hooks of other lab runs can never match; untagged (Milvus) hooks are kept for the time join
+        hooks = hooks[hooks["run_id"].isna() | (hooks["run_id"] == run_id)]
+
+    joined = join_hooks(requests, hooks, args.tolerance_ms)
+    counts = joined["match"].value_counts()
+    rows = summarize(breakdown(joined))
+    if args.json:
+        print(json.dumps({"run_id": run_id, "requests": len(joined), "matched": counts.to_dict(),
+                          "groups": rows}, indent=2))
+        return
+    print(f"Run {run_id}: {len(joined):,} requests, {counts.get('id', 0):,} joined by id, "
+          f"{counts.get('time', 0):,} by time window, {joined['match'].isna().sum():,} unmatched")
+    if not rows:
+        print("⚠️  No request could be matched to a hook record")
+        return
+    print_breakdown(rows)
+
+
+if __name__ == "__main__":
+    main()
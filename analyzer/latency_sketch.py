@@ -0,0 +1,188 @@
+"""
+DBPU Latency Sketches
+Bounded-memory, mergeable latency histograms (log-bucketed, DDSketch-style)
+shared by the workload runner, hook analyzer and metrics exporter
+"""
+import json
+import math
+import sys
+
+import numpy as np
+
+QUANTILES = [("p50", 0.50), ("p95", 0.95), ("p99", 0.99)]
+
+
+class LatencySketch:
+    """
+    Log-bucketed histogram with a fixed relative error.
+
+    A value v lands in bucket ceil(log(v) / log(gamma)), with
+    gamma = (1 + a) / (1 - a), so any quantile is reported within a relative
+    error of `a` (1% by default). Memory is bounded by `max_buckets`; past
+    that the lowest buckets are folded together, which only affects the
+    fast end of the distribution. Two sketches with the same accuracy merge
+    exactly by adding bucket counts, so per-run or per-node sketches can be
+    combined without the raw samples. Units are whatever the caller adds.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, n=1):
+        if value <= 0:
+            self.zero_count += n
+        else:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        self.count += n
+        self.sum += value * n
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def add_many(self, values):
+        """Vectorized add of an array of samples"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return
+        positive = values[values > 0]
+        self.zero_count += int(values.size - positive.size)
+        if positive.size:
+            keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64),
+                                     return_counts=True)
+            for key, n in zip(keys.tolist(), counts.tolist()):
+                self.buckets[key] = self.buckets.get(key, 0) + n
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.buckets)
+        excess = len(keys) - self.max_buckets
+        folded = sum(self.buckets.pop(k) for k in keys[:excess + 1])
+        self.buckets[keys[excess]] = folded
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        return self
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def summary(self):
+        """p50/p95/p99/max/mean/count as a flat dict"""
+        out = {name: self.quantile(q) for name, q in QUANTILES}
+        out["max"] = self.max if self.count else 0.0
+        out["mean"] = self.mean
+        out["count"] = self.count
+        return out
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_buckets": self.max_buckets,
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d["relative_accuracy"], d.get("max_buckets", 2048))
+        sketch.buckets = {int(k): v for k, v in d["buckets"].items()}
+        sketch.zero_count = d["zero_count"]
+        sketch.count = d["count"]
+        sketch.sum = d["sum"]
+        sketch.min = d["min"] if d["min"] is not None else math.inf
+        sketch.max = d["max"] if d["max"] is not None else -math.inf
+        return sketch
+
+
+def merge_all(sketches):
+    """Merge an iterable of sketches into a new one (None if empty)"""
+    merged = None
+    for sketch in sketches:
+        if merged is None:
+            merged = LatencySketch(sketch.relative_accuracy, sketch.max_buckets)
+        merged.merge(sketch)
+    return merged
+
+
+def main():
+    """
+    Merge sketches from several runs or nodes without the raw samples.
+
+    Accepts analyze_hooks state files (*.state.json, per-index sketches in
+    microseconds) and lab client logs (JSONL records carrying a
+    `latency_sketch` in milliseconds).
+    """
+    if len(sys.argv) < 2:
+        print("Usage: python analyzer/latency_sketch.py <state.json|client.jsonl> ...")
+        sys.exit(1)
+
+    hooks, client = {}, {}
+    for path in sys.argv[1:]:
+        with open(path, 'r') as f:
+            if path.endswith(".json"):
+                state = json.load(f)
+                for idx, stats in state["by_index"].items():
+                    hooks.setdefault(idx, []).append(LatencySketch.from_dict(stats["total_sketch"]))
+                continue
+            for line in f:
+                record = json.loads(line)
+                if "latency_sketch" in record:
+                    key = record.get("label") or record.get("index_type")
+                    client.setdefault(key, []).append(LatencySketch.from_dict(record["latency_sketch"]))
+
+    print(f"{'Source':<8} {'Key':<24} {'Count':>10} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+    print("-" * 88)
+    for source, groups, scale in (("hooks", hooks, 1000.0), ("client", client, 1.0)):
+        for key, sketches in sorted(groups.items()):
+            s = merge_all(sketches).summary()
+            print(f"{source:<8} {key:<24} {s['count']:>10,} {s['p50'] / scale:>9.2f}ms "
+                  f"{s['p95'] / scale:>8.2f}ms {s['p99'] / scale:>8.2f}ms {s['max'] / scale:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+DBPU Offload Cost Model
+Projects per-query latency and QPS when scan_codes runs on an accelerator,
+including host<->device transfer, launch overhead and batch (nq) effects
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+HOOK_LOG_FILE = os.getenv("HOOK_LOG_FILE", "/tmp/dbpu-knowhere-hooks.jsonl")
+
+# Hypothetical DBPU card; every term can be overridden from the CLI
+DEFAULT_DEVICE = {
+    "pcie_gbps": 25.0,              # effective host<->device bandwidth, GB/s
+    "launch_us": 10.0,              # per-batch kernel launch + driver overhead
+    "device_mem_gbps": 400.0,       # on-device memory bandwidth, GB/s
+    "device_tflops": 20.0,          # fp32 distance throughput, TFLOP/s
+    "random_access_efficiency": 0.1,  # bandwidth fraction for graph (gather) access
+    "data_resident": True,          # vectors already in device memory
+}
+DEFAULT_WORKLOAD = {
+    "num_vectors": 10000,  # used when a record does not say how big the dataset is
+    "nprobe": 10,
+    "ef": 64,
+}
+BREAK_EVEN_GRID = 2 ** np.arange(13)  # nq = 1 .. 4096
+BYTES_PER_RESULT = 12  # int64 id + float32 distance
+
+
+def _scan_shape(index_type, index_params, search_params, workload):
+    """
+    (fraction of N, absolute visits) scanned by one query.
+
+    IVF scans nprobe/nlist of the data; a graph visits roughly ef * M nodes
+    regardless of N; FLAT and anything unknown scan everything.
+    """
+    if index_type == "IVF_FLAT":
+        nlist = index_params.get("nlist", 128)
+        nprobe = search_params.get("nprobe", workload["nprobe"])
+        return min(nprobe, nlist) / nlist, 0.0
+    if index_type == "HNSW":
+        return 0.0, float(search_params.get("ef", workload["ef"]) * index_params.get("M", 16))
+    return 1.0, 0.0
+
+
+def _as_dict(value):
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str) and value:
+        return json.loads(value)
+    return {}
+
+
+def _offload_scan_us(nq, dim, top_k, scanned, num_vectors, index_type, device):
+    """Launch + transfer + kernel time for one batch; all arguments are arrays"""
+    shared = index_type == "FLAT"
+    graph = index_type == "HNSW"
+    # FLAT reads every vector once per batch; IVF lists may overlap (bounded by N); graph gathers per query
+    vectors_read = np.where(shared, num_vectors, np.minimum(nq * scanned, num_vectors))
+    vectors_read = np.where(graph, nq * scanned, vectors_read)
+    codes_bytes = vectors_read * dim * 4.0
+    mem_gbps = np.where(graph, device["device_mem_gbps"] * device["random_access_efficiency"],
+                        device["device_mem_gbps"])
+
+    h2d = nq * dim * 4.0 + (0.0 if device["data_resident"] else codes_bytes)
+    d2h = nq * top_k * BYTES_PER_RESULT
+    transfer_us = (h2d + d2h) / (device["pcie_gbps"] * 1e3)
+    flops = 2.0 * nq * scanned * dim
+    kernel_us = np.maximum(codes_bytes / (mem_gbps * 1e3), flops / (device["device_tflops"] * 1e6))
+    return device["launch_us"] + transfer_us + kernel_us, transfer_us, kernel_us, h2d + d2h
+
+
+def project(df, device=None, workload=None):
+    """
+    Add offload projections to a DataFrame of hook records (vectorized).
+
+    Needs total_time_us and scan_codes_time_us; uses nq, dim, top_k,
+    index_params, search_params and num_vectors when present. Scanned-vector
+    counts are computed once per distinct (index_type, params) combination
+    and broadcast, so millions of rows cost a few array operations.
+    """
+    device = dict(DEFAULT_DEVICE, **(device or {}))
+    workload = dict(DEFAULT_WORKLOAD, **(workload or {}))
+    out = df.copy()
+    n = len(out)
+
+    def column(name, default):
+        if name in out:
+            return pd.to_numeric(out[name], errors="coerce").fillna(default).to_numpy(dtype=float)
+        return np.full(n, float(default))
+
+    nq = np.maximum(column("nq", 1), 1)
+    dim = column("dim", 128)
+    top_k = column("top_k", 10)
+    num_vectors = column("num_vectors", workload["num_vectors"])
+    total_us = out["total_time_us"].to_numpy(dtype=float)
+    scan_us = out["scan_codes_time_us"].to_numpy(dtype=float)
+    index_type = out["index_type"].astype(str).to_numpy()
+
+    def params(name):
+        if name not in out:
+            return pd.Series("{}", index=out.index)
+        col = out[name]
+        if col.map(type).eq(str).all():
+            return col  # run store columns are already canonical JSON
+        return col.map(lambda v: json.dumps(_as_dict(v), sort_keys=True))
+
+    # Distinct configs are few, so the param parsing runs once per config, not per row
+    key = out["index_type"].astype(str) + "|" + params("index_params") + "|" + params("search_params")
+    shapes = {}
+    for k in key.unique():
+        idx_type, idx_params, search_params = k.split("|", 2)
+        shapes[k] = _scan_shape(idx_type, json.loads(idx_params), json.loads(search_params), workload)
+    fraction = key.map({k: v[0] for k, v in shapes.items()}).to_numpy(dtype=float)
+    visits = key.map({k: v[1] for k, v in shapes.items()}).to_numpy(dtype=float)
+    scanned = np.where(visits > 0, np.minimum(visits, num_vectors), fraction * num_vectors)
+
+    offload_us, transfer_us, kernel_us, bytes_moved = _offload_scan_us(
+        nq, dim, top_k, scanned, num_vectors, index_type, device)
+    other_us = np.maximum(total_us - scan_us, 0.0)
+    projected_us = other_us + offload_us
+
+    out["nq"] = nq
+    out["vectors_scanned_per_query"] = scanned
+    out["bytes_moved"] = bytes_moved
+    out["transfer_us"] = transfer_us
+    out["kernel_us"] = kernel_us
+    out["offload_scan_us"] = offload_us
+    out["projected_total_us"] = projected_us
+    out["projected_speedup"] = np.divide(total_us, projected_us, out=np.ones(n), where=projected_us > 0)
+    out["projected_qps"] = np.divide(nq * 1e6, projected_us, out=np.zeros(n), where=projected_us > 0)
+    out["break_even_nq"] = _break_even_nq(scan_us / nq, dim, top_k, scanned, num_vectors, index_type, device)
+    return out
+
+
+def _break_even_nq(cpu_scan_per_query_us, dim, top_k, scanned, num_vectors, index_type, device):
+    """Smallest nq on the 1..4096 grid where offload beats CPU scan (NaN if never)"""
+    grid = BREAK_EVEN_GRID[:, None].astype(float)
+    device_us, _, _, _ = _offload_scan_us(grid, dim[None, :], top_k[None, :], scanned[None, :],
+                                          num_vectors[None, :], index_type[None, :], device)
+    wins = device_us < grid * cpu_scan_per_query_us[None, :]
+    first = np.argmax(wins, axis=0)
+    return np.where(wins.any(axis=0), BREAK_EVEN_GRID[first], np.nan)
+
+
+def summarize(projected):
+    """Per-index-type means of the projection columns"""
+    return projected.groupby("index_type").agg(
+        records=("total_time_us", "size"),
+        nq=("nq", "mean"),
+        total_ms=("total_time_us", lambda s: s.mean() / 1000),
+        scan_ms=("scan_codes_time_us", lambda s: s.mean() / 1000),
+        offload_scan_ms=("offload_scan_us", lambda s: s.mean() / 1000),
+        transfer_ms=("transfer_us", lambda s: s.mean() / 1000),
+        kernel_ms=("kernel_us", lambda s: s.mean() / 1000),
+        projected_ms=("projected_total_us", lambda s: s.mean() / 1000),
+        speedup=("projected_speedup", "mean"),
+        projected_qps=("projected_qps", "mean"),
+        break_even_nq=("break_even_nq", "median"),
+    )
+
+
+def load_hook_frame(log_file=HOOK_LOG_FILE, use_store=False):
+    """Hook records as a DataFrame from the run store or raw JSONL"""
+    if use_store:
+        from run_store import open_store
+        store = open_store()
+        if store is not None:
+            return store.load("hooks")
+    return pd.read_json(log_file, lines=True)
+
+
+def add_device_args(parser):
+    for name, value in DEFAULT_DEVICE.items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(value, bool):
+            parser.add_argument(flag, type=lambda v: v.lower() in ("1", "true", "yes"), default=value,
+                                help=f"(default {value})")
+        else:
+            parser.add_argument(flag, type=float, default=value, help=f"(default {value})")
+    for name, value in DEFAULT_WORKLOAD.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=int, default=value,
+                            help=f"used when a record lacks it (default {value})")
+
+
+def device_from_args(args):
+    return ({name: getattr(args, name) for name in DEFAULT_DEVICE},
+            {name: getattr(args, name) for name in DEFAULT_WORKLOAD})
+
+
+def main():
+    """Project offload performance for every hook record and summarize per index type"""
+    parser = argparse.ArgumentParser(description="DBPU offload cost model")
+    parser.add_argument("--log", default=HOOK_LOG_FILE, help="hook log file (JSONL)")
+    parser.add_argument("--store", action="store_true", help="read hook records from the run store")
+    add_device_args(parser)
+    args = parser.parse_args()
+    device, workload = device_from_args(args)
+
+    df = load_hook_frame(args.log, args.store)
+    projected = project(df, device, workload)
+    summary = summarize(projected)
+
+    print("\n" + "="*100)
+    print("🧮 DBPU OFFLOAD PROJECTION")
+    print("="*100)
+    print(f"Device: PCIe {device['pcie_gbps']} GB/s, launch {device['launch_us']} us, "
+          f"mem {device['device_mem_gbps']} GB/s, {device['device_tflops']} TFLOP/s, "
+          f"resident={device['data_resident']}")
+    print(f"\n{'Index Type':<12} {'Records':>9} {'nq':>6} {'CPU ms':>9} {'scan ms':>9} {'→ dev ms':>9} "
+          f"{'xfer ms':>9} {'proj ms':>9} {'Speedup':>8} {'QPS':>10} {'BE nq':>7}")
+    print("-" * 100)
+    for idx, row in summary.iterrows():
+        be = f"{row['break_even_nq']:.0f}" if row['break_even_nq'] == row['break_even_nq'] else "never"
+        print(f"{idx:<12} {int(row['records']):>9,} {row['nq']:>6.1f} {row['total_ms']:>9.2f} {row['scan_ms']:>9.2f} "
+              f"{row['offload_scan_ms']:>9.3f} {row['transfer_ms']:>9.3f} {row['projected_ms']:>9.2f} "
+              f"{row['speedup']:>7.2f}x {row['projected_qps']:>10,.0f} {be:>7}")
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+DBPU Run History Store
+Converts append-only client/hook JSONL logs into a typed, partitioned
+Parquet store (date=/run_id=) that analyzers query with pandas
+"""
+import json
+import os
+import sys
+import uuid
+
+import pandas as pd
+
+PYARROW_AVAILABLE = False
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pass
+
+STORE_DIR = os.getenv("DBPU_STORE_DIR", "/tmp/dbpu-store")
+CLIENT_LOG = os.getenv("LOG_FILE", "/tmp/dbpu-knowhere.jsonl")
+HOOK_LOG = os.getenv("HOOK_LOG_FILE", "/tmp/dbpu-knowhere-hooks.jsonl")
+CHUNK_LINES = 200000
+PARTITION_COLS = ["date", "run_id"]
+
+# Typed columns per table; any other record fields are kept as JSON in `extra`
+# so the Parquet schema stays identical across files
+CLIENT_COLUMNS = {
+    "timestamp": "timestamp", "mode": "string", "workload": "string", "tag": "string",
+    "index_type": "string", "metric": "string", "label": "string",
+    "index_params": "json", "search_params": "json",
+    "latency_ms": "float64", "recall_at_k": "float64", "top_k": "int64",
+    "expr": "string", "selectivity": "float64",
+    "num_queries": "int64", "dim": "int64", "concurrency": "int64",
+    "num_requests": "int64", "errors": "int64", "elapsed_s": "float64",
+    "qps": "float64", "offered_qps": "float64",
+    "p50_ms": "float64", "p90_ms": "float64", "p99_ms": "float64",
+    "p999_ms": "float64", "max_ms": "float64",
+    "scan_codes_time_us": "float64", "other_time_us": "float64",
+    "vectors_per_s": "float64", "mb_per_s": "float64", "flush_s": "float64",
+    "index_build_s": "float64", "index_load_s": "float64", "index_bytes": "int64", "index_rows": "int64",
+    "build_vectors_per_s": "float64",
+}
+HOOK_COLUMNS = {
+    "timestamp": "timestamp", "operation": "string", "source": "string",
+    "index_type": "string", "index_params": "json", "search_params": "json",
+    "num_vectors": "int64", "total_time_us": "int64", "scan_codes_time_us": "int64", "other_time_us": "int64",
+    "scan_codes_percentage": "float64", "nq": "int64", "dim": "int64", "top_k": "int64",
+    "expr": "string", "selectivity": "float64",
+}
+TABLES = {
+    "client": (CLIENT_LOG, CLIENT_COLUMNS),
+    "hooks": (HOOK_LOG, HOOK_COLUMNS),
+}
+
+
+def _arrow_schema(columns):
+    types = {
+        "timestamp": pa.timestamp("us", tz="UTC"), "string": pa.string(), "json": pa.string(),
+        "float64": pa.float64(), "int64": pa.int64(),
+    }
+    fields = [pa.field(name, types[kind]) for name, kind in columns.items()]
+    fields.append(pa.field("extra", pa.string()))
+    return pa.schema(fields)
+
+
+def _full_schema(columns):
+    return _arrow_schema(columns).append(pa.field("date", pa.string())).append(pa.field("run_id", pa.string()))
+
+
+def records_to_frame(records, columns):
+    """Typed DataFrame (plus date/run_id partition keys) from a list of log dicts"""
+    raw = pd.DataFrame.from_records(records)
+    df = pd.DataFrame(index=raw.index)
+    for name, kind in columns.items():
+        col = raw[name] if name in raw else pd.Series([None] * len(raw), index=raw.index)
+        if kind == "timestamp":
+            df[name] = pd.to_datetime(col, utc=True, format="ISO8601", errors="coerce")
+        elif kind == "json":
+            df[name] = col.map(lambda v: None if v is None or v != v else json.dumps(v, sort_keys=True))
+        elif kind == "int64":
+            df[name] = pd.to_numeric(col, errors="coerce").astype("Int64")
+        elif kind == "float64":
+            df[name] = pd.to_numeric(col, errors="coerce").astype("float64")
+        else:
+            df[name] = col.astype("string")
+
+    known = set(columns) | {"run_id"}
+    extra_cols = [c for c in raw.columns if c not in known]
+    if extra_cols:
+        extras = raw[extra_cols].to_dict("records")
+        df["extra"] = [json.dumps({k: v for k, v in e.items() if v is not None and v == v}, default=str)
+                       for e in extras]
+    else:
+        df["extra"] = None
+
+    df["date"] = df["timestamp"].dt.strftime("%Y-%m-%d").fillna("unknown")
+    run_id = raw["run_id"] if "run_id" in raw else pd.Series([None] * len(raw), index=raw.index)
+    df["run_id"] = run_id.fillna("unknown").astype(str)
+    return df
+
+
+class RunStore:
+    """Incremental JSONL -> Parquet ingestion with a per-source byte offset"""
+
+    def __init__(self, store_dir=STORE_DIR):
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for the run store (pip install pyarrow)")
+        self.store_dir = store_dir
+        self.state_file = os.path.join(store_dir, "_ingest_state.json")
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp = self.state_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_file)
+
+    def _write(self, table, records, columns):
+        df = records_to_frame(records, columns)
+        arrow = pa.Table.from_pandas(df, schema=_full_schema(columns), preserve_index=False)
+        pq.write_to_dataset(
+            arrow, os.path.join(self.store_dir, table), partition_cols=PARTITION_COLS,
+            basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.parquet"
+        )
+
+    def ingest(self, table, log_file=None):
+        """Append lines written since the last ingest of `table`; returns rows added"""
+        default_log, columns = TABLES[table]
+        log_file = log_file or default_log
+        if not os.path.exists(log_file):
+            return 0
+
+        state = self._load_state()
+        src = state.get(table, {})
+        st = os.stat(log_file)
+        offset = src.get("offset", 0)
+        if src.get("inode") != st.st_ino or st.st_size < offset:
+            offset = 0  # rotated or truncated: the new file starts fresh
+
+        added = 0
+        records = []
+        with open(log_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+                if len(records) >= CHUNK_LINES:
+                    self._write(table, records, columns)
+                    added += len(records)
+                    records = []
+                    state[table] = {"log_file": log_file, "inode": st.st_ino, "offset": offset}
+                    self._save_state(state)
+        if records:
+            self._write(table, records, columns)
+            added += len(records)
+
+        state[table] = {"log_file": log_file, "inode": st.st_ino, "offset": offset}
+        self._save_state(state)
+        return added
+
+    def ingest_all(self):
+        return {table: self.ingest(table) for table in TABLES}
+
+    def load(self, table, columns=None, run_ids=None, since=None):
+        """
+        Query a table into a DataFrame.
+
+        run_ids / since (a 'YYYY-MM-DD' date) prune partitions before any
+        file is read, so history size does not slow down narrow queries.
+        """
+        _, table_columns = TABLES[table]
+        path = os.path.join(self.store_dir, table)
+        schema = _full_schema(table_columns)
+        if not os.path.isdir(path):
+            return schema.empty_table().to_pandas()
+
+        dataset = ds.dataset(path, schema=schema, format="parquet", partitioning="hive")
+        expr = None
+        if run_ids is not None:
+            expr = ds.field("run_id").isin(list(run_ids))
+        if since is not None:
+            date_expr = ds.field("date") >= since
+            expr = date_expr if expr is None else expr & date_expr
+        return dataset.to_table(columns=columns, filter=expr).to_pandas()
+
+
+def open_store():
+    """RunStore with new log lines already ingested, or None if pyarrow is missing"""
+    if not PYARROW_AVAILABLE:
+        print("⚠️  pyarrow not installed - run store unavailable, reading JSONL instead")
+        return None
+    store = RunStore()
+    store.ingest_all()
+    return store
+
+
+def main():
+    """Ingest new log lines and summarize what the store holds"""
+    if not PYARROW_AVAILABLE:
+        print("❌ pyarrow not installed (pip install pyarrow)")
+        sys.exit(1)
+
+    store = RunStore()
+    added = store.ingest_all()
+    print(f"📦 Run store: {store.store_dir}")
+    for table, n in added.items():
+        df = store.load(table, columns=["run_id", "date"])
+        print(f"   {table:<7} +{n:,} rows → {len(df):,} rows, "
+              f"{df['run_id'].nunique()} runs, {df['date'].nunique()} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+DBPU Resource Saturation Report
+Lines up the resource samples of a lab run with its per-interval tail
+latency and flags intervals where a latency spike meets a saturated resource
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from latency_breakdown import parse_times, read_jsonl, REQUEST_LOG_FILE
+
+LOG_FILE = os.getenv("LOG_FILE", "/tmp/dbpu-knowhere.jsonl")
+SPIKE_FACTOR = 2.0          # interval p99 over this multiple of the run's median interval p99
+MIN_REQUESTS = 5            # intervals with fewer requests have no meaningful p99
+# CPU is saturated at this % of what can be used: all cores host-wide; for a process,
+# min(threads, cores) cores in total or one core for its busiest thread (e.g. a GIL-bound client)
+CPU_SATURATED_PCT = 90.0
+IOWAIT_PCT = 20.0
+MEM_AVAILABLE_MIN_PCT = 5.0
+CTX_SWITCH_FACTOR = 3.0     # involuntary switches over this multiple of the run median...
+CTX_SWITCH_MIN_PER_S = 1000  # ...and at least this many per second
+
+
+def load_samples(log_file, run_id):
+    """Resource samples of one run ('latest' = the last run that has any), oldest first"""
+    samples = read_jsonl(log_file)
+    if samples.empty or "workload" not in samples:
+        raise SystemExit(f"❌ No records in {log_file}")
+    samples = samples[samples["workload"] == "resource_sample"]
+    if samples.empty:
+        raise SystemExit("❌ No resource samples in the log (lab_gen.py --sample-interval 0 disables them)")
+    if run_id == "latest":
+        run_id = samples.loc[samples["timestamp"].idxmax(), "run_id"]
+    else:
+        matches = [r for r in samples["run_id"].unique() if r.startswith(run_id)]
+        if len(matches) != 1:
+            raise SystemExit(f"❌ Run '{run_id}' not found" + (" (ambiguous prefix)" if matches else ""))
+        run_id = matches[0]
+    samples = samples[samples["run_id"] == run_id].copy()
+    samples["end"] = parse_times(samples["timestamp"])
+    samples["start"] = samples["end"] - pd.to_timedelta(samples["interval_s"], unit="s")
+    return run_id, samples.sort_values("end").reset_index(drop=True)
+
+
+def interval_latency(samples, requests):
+    """Request count and p99 latency per sample interval, by completion time"""
+    counts = np.zeros(len(samples), dtype=np.int64)
+    p99 = np.full(len(samples), np.nan)
+    if not requests.empty:
+        # Naive UTC datetime64 arrays, so searchsorted compares numbers rather than Timestamp objects
+        done = parse_times(requests["timestamp"]).dt.tz_localize(None).to_numpy()
+        latency = requests["latency_ms"].to_numpy(dtype=np.float64)
+        order = np.argsort(done)
+        done, latency = done[order], latency[order]
+        lo = np.searchsorted(done, samples["start"].dt.tz_localize(None).to_numpy(), side="right")
+        hi = np.searchsorted(done, samples["end"].dt.tz_localize(None).to_numpy(), side="right")
+        for i, (a, b) in enumerate(zip(lo, hi)):
+            counts[i] = b - a
+            if b - a >= MIN_REQUESTS:
+                p99[i] = np.percentile(latency[a:b], 99)
+    return counts, p99
+
+
+def saturation_reasons(samples):
+    """Per interval, the list of resources that were saturated"""
+    reasons = [[] for _ in range(len(samples))]
+    cores = samples["cpu_count"].fillna(1).to_numpy() * 100
+    for i, row in enumerate(samples.itertuples()):
+        if row.host_cpu_pct >= CPU_SATURATED_PCT:
+            reasons[i].append(f"host cpu {row.host_cpu_pct:.0f}%")
+        if row.host_iowait_pct >= IOWAIT_PCT:
+            reasons[i].append(f"iowait {row.host_iowait_pct:.0f}%")
+        if row.host_swap_in_per_s > 0 or row.host_swap_out_per_s > 0:
+            reasons[i].append("swapping")
+        mem = getattr(row, "host_mem_available_pct", None)
+        if mem is not None and mem == mem and mem < MEM_AVAILABLE_MIN_PCT:
+            reasons[i].append(f"memory {mem:.1f}% free")
+        for name, proc in (row.processes or {}).items():
+            usable = min(proc.get("threads") or 1, cores[i] / 100) * 100
+            thread_pct = proc.get("max_thread_cpu_pct") or 0.0
+            if proc["cpu_pct"] >= CPU_SATURATED_PCT / 100 * usable:
+                reasons[i].append(f"{name} cpu {proc['cpu_pct']:.0f}% of {usable:.0f}%")
+            elif thread_pct >= CPU_SATURATED_PCT:
+                reasons[i].append(f"{name} thread at {thread_pct:.0f}% of a core")
+
+    # Involuntary context switches only mean something relative to the run's own baseline
+    names = {name for processes in samples["processes"] for name in (processes or {})}
+    for name in names:
+        rates = np.array([(p or {}).get(name, {}).get("nonvoluntary_ctx_per_s") or 0.0
+                          for p in samples["processes"]])
+        threshold = max(CTX_SWITCH_FACTOR * np.median(rates), CTX_SWITCH_MIN_PER_S)
+        for i in np.flatnonzero(rates > threshold):
+            reasons[i].append(f"{name} preempted {rates[i]:,.0f}/s")
+    return reasons
+
+
+def correlate(samples, requests):
+    """One row per sample interval: latency, spike flag and saturated resources"""
+    counts, p99 = interval_latency(samples, requests)
+    baseline = np.nanmedian(p99) if np.isfinite(p99).any() else np.nan
+    reasons = saturation_reasons(samples)
+    t0 = samples["start"].iloc[0]
+    rows = []
+    for i, row in samples.iterrows():
+        rows.append({
+            "t_s": (row["end"] - t0).total_seconds(),
+            "requests": int(counts[i]),
+            "p99_ms": None if np.isnan(p99[i]) else float(p99[i]),
+            "spike": bool(p99[i] > SPIKE_FACTOR * baseline) if np.isfinite(p99[i]) else False,
+            "saturated": reasons[i],
+            "host_cpu_pct": row["host_cpu_pct"],
+        })
+    return rows, baseline
+
+
+def print_report(run_id, rows, baseline, show_all=False):
+    spikes = [r for r in rows if r["spike"]]
+    aligned = [r for r in spikes if r["saturated"]]
+    saturated_only = [r for r in rows if r["saturated"] and not r["spike"]]
+    print(f"Run {run_id}: {len(rows)} intervals, median interval p99 "
+          + (f"{baseline:.2f} ms" if baseline == baseline else "n/a (no request log for this run)"))
+    print(f"  Tail-latency spikes (p99 > {SPIKE_FACTOR:.0f}x median): {len(spikes)}, "
+          f"{len(aligned)} with a saturated resource; saturated intervals without a spike: {len(saturated_only)}")
+    flagged = [r for r in rows if r["spike"] or (show_all and r["saturated"])]
+    if not flagged:
+        print("✅ No tail-latency spikes" + ("" if show_all else " (--all lists saturated intervals too)"))
+        return
+    print(f"\n  {'t (s)':>7} {'reqs':>6} {'p99 ms':>9} {'host cpu':>8}  flags")
+    for r in flagged:
+        p99 = f"{r['p99_ms']:.2f}" if r["p99_ms"] is not None else "n/a"
+        marker = "⚠️  spike + " if r["spike"] and r["saturated"] else ("spike" if r["spike"] else "")
+        print(f"  {r['t_s']:>7.1f} {r['requests']:>6} {p99:>9} {r['host_cpu_pct']:>7.0f}%  "
+              f"{marker}{', '.join(r['saturated'])}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Flag intervals where resource saturation meets tail-latency spikes")
+    parser.add_argument("--log", default=LOG_FILE, help="lab run log with resource_sample records (JSONL)")
+    parser.add_argument("--requests", default=REQUEST_LOG_FILE, help="client request log (JSONL)")
+    parser.add_argument("--run-id", default="latest", help="run id or unique prefix (default: latest sampled run)")
+    parser.add_argument("--all", action="store_true", help="also list saturated intervals without a spike")
+    parser.add_argument("--json", action="store_true", help="print the per-interval rows as JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    run_id, samples = load_samples(args.log, args.run_id)
+    requests = read_jsonl(args.requests) if os.path.exists(args.requests) else pd.DataFrame()
+    if "run_id" in requests:
+        requests = requests[requests["run_id"] == run_id]
+    rows, baseline = correlate(samples, requests)
+    if args.json:
+        print(json.dumps({"run_id": run_id, "median_p99_ms": baseline, "intervals": rows}, indent=2, default=str))
+        return
+    print_report(run_id, rows, baseline, args.all)
+
+
+if __name__ == "__main__":
+    main()
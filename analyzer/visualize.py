@@ -2,10 +2,13 @@
 DBPU Profiling Results Visualizer
 Analyzes and visualizes acceleration potential
 """
+import argparse
 import json
 import sys
 from datetime import datetime
 
+import pandas as pd
+
 def load_logs(log_file="/tmp/dbpu-knowhere.jsonl"):
     """Load logs from file"""
     logs = []
@@ -21,12 +24,18 @@ def load_logs(log_file="/tmp/dbpu-knowhere.jsonl"):
 
 def analyze_and_visualize(logs):
     """Analyze and create visual report"""
+    # Single-batch search records only (ingest, load and sweep records are skipped)
+    logs = [log for log in logs if 'latency_ms' in log and 'workload' not in log]
     if not logs:
         print("❌ No logs found")
         return
     
-    # Get latest run (last 3 entries)
-    latest_logs = logs[-3:] if len(logs) >= 3 else logs
+    # Get latest run: every record sharing the last run_id (older logs: last 3 entries)
+    last_run = logs[-1].get('run_id')
+    if last_run:
+        latest_logs = [log for log in logs if log.get('run_id') == last_run]
+    else:
+        latest_logs = logs[-3:] if len(logs) >= 3 else logs
     
     print("\n" + "="*80)
     print("📊 DBPU ACCELERATION POTENTIAL ANALYSIS")
@@ -43,25 +52,30 @@ def analyze_and_visualize(logs):
     # Performance table
     print("📈 Performance Comparison")
     print("-" * 80)
-    print(f"{'Index Type':<15} {'Label':<20} {'Latency (ms)':<15} {'Bar Chart'}")
+    print(f"{'Index Type':<15} {'Label':<20} {'Latency (ms)':<15} {'Recall':<9} {'Bar Chart'}")
     print("-" * 80)
     
     results = []
+    recalls = {}
     for log in latest_logs:
         index_type = log['index_type']
         label = log['label']
         latency = log['latency_ms']
         results.append((index_type, label, latency))
+        recalls[label] = log.get('recall_at_k')
     
-    # Normalize for bar chart (max 50 chars)
+    # Normalize for bar chart (max 40 chars)
     max_latency = max(r[2] for r in results)
     
     for index_type, label, latency in results:
-        bar_length = int((latency / max_latency) * 50)
+        bar_length = int((latency / max_latency) * 40)
         bar = "█" * bar_length
-        print(f"{index_type:<15} {label:<20} {latency:>10.2f}      {bar}")
+        recall = recalls[label]
+        recall_str = f"{recall:.4f}" if recall is not None else "n/a"
+        print(f"{index_type:<15} {label:<20} {latency:>10.2f}      {recall_str:<9} {bar}")
     
     print()
+    print_build_costs(latest_logs)
     
     # Speedup analysis
     print("🚀 Acceleration Potential")
@@ -77,7 +91,9 @@ def analyze_and_visualize(logs):
         for index_type, label, latency in results:
             if index_type != 'FLAT':
                 speedup = flat_latency / latency
-                print(f"{label:<25} {speedup:>6.2f}x faster than FLAT")
+                recall = recalls[label]
+                at_recall = f" at recall@k {recall:.4f}" if recall is not None else " (recall not measured)"
+                print(f"{label:<25} {speedup:>6.2f}x faster than FLAT{at_recall}")
         
         print()
         print("💡 DBPU Acceleration Scenarios:")
@@ -120,10 +136,101 @@ def analyze_and_visualize(logs):
     print("   4. Calculate ROI for DBPU acceleration")
     print()
 
+def print_build_costs(logs):
+    """Build time, throughput, load time and size per index config (one row per build)"""
+    builds = {}
+    for log in logs:
+        if log.get('index_build_s') is not None:
+            key = (log['index_type'], json.dumps(log.get('index_params'), sort_keys=True))
+            builds.setdefault(key, log)
+    if not builds:
+        return
+    
+    print("🏗️  Index Build Cost")
+    print("-" * 80)
+    print(f"{'Index Type':<15} {'Params':<28} {'Build s':>8} {'vectors/s':>11} {'Load s':>7} {'Size MB':>8} {'B/vec':>6}")
+    print("-" * 80)
+    for (index_type, params), log in builds.items():
+        rate = log.get('build_vectors_per_s')
+        load = log.get('index_load_s')
+        size = log.get('index_bytes')
+        rows = log.get('index_rows')
+        print(f"{index_type:<15} {params[:28]:<28} {log['index_build_s']:>8.2f} "
+              f"{f'{rate:,.0f}' if rate else 'n/a':>11} {f'{load:.2f}' if load is not None else 'n/a':>7} "
+              f"{f'{size / 2**20:.1f}' if size else 'n/a':>8} {f'{size / rows:.0f}' if size and rows else 'n/a':>6}")
+    print()
+
+def load_logs_from_store(store):
+    """Latest run's single-shot search records, one row per label (vectorized groupby)"""
+    df = store.load("client", columns=["timestamp", "run_id", "mode", "workload", "index_type", "index_params",
+                                       "label", "latency_ms", "recall_at_k", "index_build_s", "index_load_s",
+                                       "index_bytes", "index_rows", "build_vectors_per_s"])
+    df = df[df["latency_ms"].notna() & df["workload"].isna()]
+    if df.empty:
+        return []
+    last_run = df.loc[df["timestamp"].idxmax(), "run_id"]
+    latest = df[df["run_id"] == last_run]
+    grouped = latest.groupby(["index_type", "label"], sort=False).agg(
+        latency_ms=("latency_ms", "median"), recall_at_k=("recall_at_k", "mean"),
+        timestamp=("timestamp", "min"), mode=("mode", "first"), index_params=("index_params", "first"),
+        index_build_s=("index_build_s", "first"), index_load_s=("index_load_s", "first"),
+        index_bytes=("index_bytes", "first"), index_rows=("index_rows", "first"),
+        build_vectors_per_s=("build_vectors_per_s", "first"),
+    ).reset_index()
+    grouped["timestamp"] = grouped["timestamp"].astype(str)
+    grouped["run_id"] = last_run
+    for column in ["recall_at_k", "index_build_s", "index_load_s", "index_bytes", "index_rows", "build_vectors_per_s"]:
+        grouped[column] = grouped[column].astype(object).where(grouped[column].notna(), None)
+    grouped["index_params"] = grouped["index_params"].map(lambda v: json.loads(v) if isinstance(v, str) else v)
+    return grouped.to_dict("records")
+
+def print_history(store, last_n=20):
+    """Median latency per label across the most recent runs"""
+    df = store.load("client", columns=["timestamp", "run_id", "workload", "label", "latency_ms"])
+    df = df[df["latency_ms"].notna() & df["workload"].isna()]
+    if df.empty:
+        print("❌ No runs in store")
+        return
+    
+    started = df.groupby("run_id")["timestamp"].min().sort_values()
+    runs = started.index[-last_n:]
+    table = (df[df["run_id"].isin(runs)]
+             .pivot_table(index="run_id", columns="label", values="latency_ms", aggfunc="median")
+             .reindex(runs))
+    
+    print("\n" + "="*80)
+    print(f"🕒 RUN HISTORY (median latency ms, last {len(runs)} of {len(started)} runs)")
+    print("="*80)
+    with pd.option_context("display.width", 160, "display.max_columns", 20):
+        print(table.round(2).to_string())
+    print()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Visualize lab results")
+    parser.add_argument("--store", action="store_true",
+                        help="read from the Parquet run store (ingests new log lines first)")
+    parser.add_argument("--history", type=int, metavar="N", default=None,
+                        help="with --store: show median latency per label for the last N runs")
+    return parser.parse_args()
+
 def main():
     """Main entry point"""
     import os
     
+    args = parse_args()
+    store = None
+    if args.store or args.history:
+        from run_store import open_store
+        store = open_store()
+    
+    if store is not None:
+        print(f"📂 Reading run store: {store.store_dir}")
+        if args.history:
+            print_history(store, args.history)
+            return
+        analyze_and_visualize(load_logs_from_store(store))
+        return
+    
     log_file = os.getenv("LOG_FILE", "/tmp/dbpu-knowhere.jsonl")
     print(f"📂 Reading logs from: {log_file}")
     
@@ -0,0 +1,76 @@
+"""
+Hook/request joins in analyzer/latency_breakdown.py across timestamp formats
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "analyzer"))
+
+from latency_breakdown import join_hooks, parse_times, LOCAL_TZ  # noqa: E402
+
+
+def request(request_id, sent, received, nq=1, top_k=10):
+    """A request record as RequestLog writes it (UTC, with offset)"""
+    return {
+        "request_id": request_id,
+        "sent_at": datetime.fromisoformat(sent).replace(tzinfo=timezone.utc).isoformat(),
+        "timestamp": datetime.fromisoformat(received).replace(tzinfo=timezone.utc).isoformat(),
+        "latency_ms": (datetime.fromisoformat(received) - datetime.fromisoformat(sent)).total_seconds() * 1000,
+        "serialize_ms": 0.0,
+        "nq": nq,
+        "top_k": top_k,
+    }
+
+
+def test_milvus_hooks_join_by_time_window():
+    requests = pd.DataFrame([
+        request("r-1", "2026-02-11T10:00:00.000", "2026-02-11T10:00:00.100"),
+        request("r-2", "2026-02-11T10:00:00.200", "2026-02-11T10:00:00.300"),
+    ])
+    # Milvus hooks: UTC with a Z suffix, no request_id
+    hooks = pd.DataFrame([
+        {"timestamp": "2026-02-11T10:00:00.090Z", "total_time_us": 50000, "scan_codes_time_us": 40000,
+         "nq": 1, "top_k": 10, "operation": "search"},
+        {"timestamp": "2026-02-11T10:00:00.280Z", "total_time_us": 30000, "scan_codes_time_us": 20000,
+         "nq": 1, "top_k": 10, "operation": "search"},
+    ])
+    joined = join_hooks(requests, hooks).set_index("request_id")
+    assert joined.loc["r-1", "match"] == "time"
+    assert joined.loc["r-1", "total_time_us"] == 50000
+    assert joined.loc["r-2", "match"] == "time"
+    assert joined.loc["r-2", "total_time_us"] == 30000
+
+
+def test_id_and_time_matches_mix():
+    requests = pd.DataFrame([
+        request("r-1", "2026-02-11T10:00:00.000", "2026-02-11T10:00:00.100"),
+        request("r-2", "2026-02-11T10:00:00.200", "2026-02-11T10:00:00.300"),
+    ])
+    hooks = pd.DataFrame([
+        {"timestamp": "2026-02-11T10:00:00.090+00:00", "total_time_us": 50000, "scan_codes_time_us": 40000,
+         "nq": 1, "top_k": 10, "request_id": "r-1"},
+        {"timestamp": "2026-02-11T10:00:00.280Z", "total_time_us": 30000, "scan_codes_time_us": 20000,
+         "nq": 1, "top_k": 10, "request_id": None},
+    ])
+    joined = join_hooks(requests, hooks).set_index("request_id")
+    assert joined.loc["r-1", "match"] == "id"
+    assert joined.loc["r-2", "match"] == "time"
+
+
+def test_hook_outside_every_window_stays_unmatched():
+    requests = pd.DataFrame([request("r-1", "2026-02-11T10:00:00.000", "2026-02-11T10:00:00.100")])
+    hooks = pd.DataFrame([{"timestamp": "2026-02-11T10:00:05.000Z", "total_time_us": 1000,
+                           "scan_codes_time_us": 500, "nq": 1, "top_k": 10}])
+    joined = join_hooks(requests, hooks)
+    assert joined["match"].isna().all()
+
+
+def test_parse_times_localizes_naive_values():
+    local = datetime(2026, 2, 11, 10, 0, 0)
+    times = parse_times(["2026-02-11T10:00:00Z", local.isoformat()])
+    assert times.dt.tz is not None
+    assert times[0] == pd.Timestamp("2026-02-11T10:00:00", tz="UTC")
+    assert times[1] == pd.Timestamp(local.replace(tzinfo=LOCAL_TZ)).tz_convert("UTC")
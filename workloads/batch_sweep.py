@@ -0,0 +1,98 @@
+"""
+DBPU Acceleration Lab - Batch Size Sweep
+Latency and throughput over nq (queries per request) and top_k, with the
+point where larger batches stop paying off
+"""
+import time
+
+import numpy as np
+
+DEFAULT_NQ = [2 ** i for i in range(13)]  # 1 .. 4096
+DEFAULT_TOP_K = [1, 10, 100, 1000]
+PEAK_FRACTION = 0.9  # share of peak throughput at which larger batches stop paying off
+
+
+def params_for_k(search_params, k):
+    """Graph searches need ef >= top_k; raise it instead of failing the request"""
+    if "ef" in search_params and search_params["ef"] < k:
+        return dict(search_params, ef=k)
+    return search_params
+
+
+def find_batch_knee(points, peak_fraction=PEAK_FRACTION):
+    """
+    Index of the smallest batch that reaches `peak_fraction` of the best
+    vectors/s in the series, or None for an empty series.
+
+    Past this nq, larger batches add per-batch latency for at most a few
+    percent more throughput (or less, once caches spill). Comparing against
+    the series peak rather than neighbouring points keeps timing noise at
+    small nq from triggering an early knee.
+    """
+    if not points:
+        return None
+    peak = max(p["vectors_per_s"] for p in points)
+    for i, point in enumerate(points):
+        if point["vectors_per_s"] >= peak_fraction * peak:
+            return i
+    return None
+
+
+def measure_batch(search, payload, k, params, repeats):
+    """Per-batch latencies (ms) of `repeats` timed searches after one warm-up"""
+    search(payload, k, params)
+    latencies = np.empty(repeats)
+    for r in range(repeats):
+        start = time.perf_counter()
+        search(payload, k, params)
+        latencies[r] = (time.perf_counter() - start) * 1000
+    return latencies
+
+
+def sweep_batch(prepare, search, search_params, nq_values=None, top_k_values=None,
+                repeats=5, max_batch_ms=2000.0, peak_fraction=PEAK_FRACTION):
+    """
+    Sweep nq for each top_k and return one point per (top_k, nq).
+
+    prepare(nq) builds a payload.Payload outside the timed region, whose
+    preparation and encoding costs are reported with each point;
+    search(payload.data, k, params) must block until results arrive. For each
+    top_k the nq sweep stops early once a batch takes longer than
+    `max_batch_ms`, since larger batches only get slower. The knee point of
+    each top_k series is marked with knee=True.
+    """
+    nq_values = sorted(nq_values or DEFAULT_NQ)
+    top_k_values = sorted(top_k_values or DEFAULT_TOP_K)
+    payloads = {}
+
+    points = []
+    for k in top_k_values:
+        params = params_for_k(search_params, k)
+        series = []
+        for nq in nq_values:
+            if nq not in payloads:
+                payloads[nq] = prepare(nq)
+            payload = payloads[nq]
+            latencies = measure_batch(search, payload.data, k, params, repeats)
+            batch_ms = float(np.median(latencies))
+            series.append({
+                "nq": nq,
+                "top_k": k,
+                "effective_search_params": params,
+                "repeats": repeats,
+                "batch_ms": batch_ms,
+                "batch_p99_ms": float(np.percentile(latencies, 99)),
+                "per_query_ms": batch_ms / nq,
+                "vectors_per_s": nq / batch_ms * 1000 if batch_ms > 0 else 0.0,
+                "results_per_s": nq * k / batch_ms * 1000 if batch_ms > 0 else 0.0,
+                "payload_prepare_ms": payload.prepare_s * 1000,
+                "serialize_ms": payload.serialize_s * 1000,
+                "knee": False,
+            })
+            if batch_ms > max_batch_ms:
+                break
+        knee = find_batch_knee(series, peak_fraction)
+        if knee is not None:
+            series[knee]["knee"] = True
+        points.extend(series)
+    return points
@@ -0,0 +1,244 @@
+"""
+DBPU Acceleration Lab - Dataset Cache
+Seeded on-disk vector sets served through np.memmap, plus SIFT/GIST
+.fvecs/.bvecs/.ivecs loaders
+"""
+import glob
+import os
+
+import numpy as np
+
+DATASET_DIR = os.getenv("DBPU_DATASET_DIR", "/tmp/dbpu-datasets")
+GENERATE_CHUNK = 100000
+HELDOUT_QUERIES = 1000  # rows kept out of a single-file dataset's base set to serve as queries
+
+
+def read_vecs(path):
+    """
+    Memory-map a TEXMEX .fvecs/.bvecs/.ivecs file as an (n, dim) array.
+
+    Each row is stored as a 4-byte little-endian dim followed by the
+    components, so the returned array is a strided zero-copy view that skips
+    the per-row header.
+    """
+    ext = os.path.splitext(path)[1]
+    dtype = {".fvecs": np.float32, ".ivecs": np.int32, ".bvecs": np.uint8}[ext]
+    dim = int(np.fromfile(path, dtype=np.int32, count=1)[0])
+
+    if ext == ".bvecs":
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        return raw.reshape(-1, dim + 4)[:, 4:]
+    raw = np.memmap(path, dtype=np.int32, mode='r')
+    return raw.reshape(-1, dim + 1)[:, 1:].view(dtype)
+
+
+def _write_npy(path, num_vectors, dim, chunk_fn):
+    """Write an (n, dim) float32 .npy file chunk by chunk from chunk_fn(start, end)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(num_vectors, dim))
+    for start in range(0, num_vectors, GENERATE_CHUNK):
+        end = min(start + GENERATE_CHUNK, num_vectors)
+        out[start:end] = chunk_fn(start, end)
+    out.flush()
+    del out
+    os.replace(tmp, path)  # only complete files ever appear under the final name
+
+
+def _normalized(rows):
+    return rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+
+
+def _generate(path, num_vectors, dim, seed, normalize=False):
+    """Write a seeded uniform-random .npy file chunk by chunk"""
+    rng = np.random.default_rng(seed)
+
+    def chunk(start, end):
+        rows = rng.random((end - start, dim), dtype=np.float32)
+        return _normalized(rows) if normalize else rows
+
+    _write_npy(path, num_vectors, dim, chunk)
+
+
+class GaussianMixture:
+    """
+    Clustered embedding-like data: each cluster is a Gaussian spread along
+    its own random `intrinsic_dim`-dimensional subspace around a random
+    center, plus a little isotropic noise in the full space.
+
+    Inter-center distances grow like sqrt(2 * dim) while points spread
+    about cluster_std * sqrt(intrinsic_dim) around their center, so the
+    default clusters overlap the way real embedding neighbourhoods do.
+    Cluster sizes are uneven (Dirichlet weights). Everything derives from
+    `seed`, so base and query files can be generated independently.
+    """
+
+    def __init__(self, dim, num_clusters=256, intrinsic_dim=16, cluster_std=2.0, noise_std=0.1, seed=42):
+        rng = np.random.default_rng([seed, 0])
+        self.dim = dim
+        self.intrinsic_dim = min(intrinsic_dim, dim)
+        self.cluster_std = cluster_std
+        self.noise_std = noise_std
+        self.centers = rng.normal(0.0, 1.0, (num_clusters, dim)).astype(np.float32)
+        # Orthonormal (intrinsic_dim, dim) basis per cluster
+        self.bases = np.stack([
+            np.linalg.qr(rng.normal(size=(dim, self.intrinsic_dim)))[0].T for _ in range(num_clusters)
+        ]).astype(np.float32)
+        self.weights = rng.dirichlet(np.full(num_clusters, 2.0))
+
+    def __len__(self):
+        return len(self.centers)
+
+    def sample(self, n, rng, clusters=None):
+        """n points (from `clusters` if given, else drawn by cluster weight)"""
+        if clusters is None:
+            clusters = rng.choice(len(self), size=n, p=self.weights)
+        out = self.centers[clusters] + rng.normal(0.0, self.noise_std, (n, self.dim)).astype(np.float32)
+        z = rng.normal(0.0, self.cluster_std, (n, self.intrinsic_dim)).astype(np.float32)
+        # One matmul per cluster present: sort by cluster and walk the runs
+        order = np.argsort(clusters, kind="stable")
+        bounds = np.flatnonzero(np.diff(clusters[order])) + 1
+        for run in np.split(order, bounds):
+            if run.size:
+                out[run] += z[run] @ self.bases[clusters[run[0]]]
+        return out
+
+    def zipf_clusters(self, n, rng, s):
+        """Cluster ids with Zipf(s) popularity over a random ranking of the clusters"""
+        ranking = rng.permutation(len(self))
+        p = 1.0 / np.arange(1, len(self) + 1) ** s
+        return ranking[rng.choice(len(self), size=n, p=p / p.sum())]
+
+
+class Dataset:
+    """
+    Base vectors, query vectors and optional ground-truth ids, all memory-mapped.
+
+    `cache_key` identifies the data for the ground-truth cache, so the same
+    dataset is never brute-forced twice.
+    """
+
+    def __init__(self, name, base, queries, gt_ids=None, cache_key=None):
+        self.name = name
+        self.base = base
+        self.queries = queries
+        self.gt_ids = gt_ids
+        self.cache_key = cache_key or {"source": name, "num_vectors": len(base)}
+
+    @property
+    def dim(self):
+        return self.base.shape[1]
+
+    def __len__(self):
+        return len(self.base)
+
+    def batches(self, batch_size):
+        """Yield (start_id, rows) slices of the base set (views, not copies, for .npy)"""
+        for start in range(0, len(self.base), batch_size):
+            yield start, self.base[start:start + batch_size]
+
+    def query_batch(self, nq, offset=0):
+        """Rows [offset, offset+nq) of the query set, wrapping around if needed"""
+        idx = (np.arange(nq) + offset) % len(self.queries)
+        if idx[0] + nq <= len(self.queries):
+            return self.queries[idx[0]:idx[0] + nq]
+        return self.queries[idx]
+
+
+def random_dataset(num_vectors, dim, seed=42, num_queries=1000, query_seed=7, normalize=False):
+    """Seeded uniform-random dataset, generated once and then memory-mapped"""
+    suffix = "_norm" if normalize else ""
+    base_path = os.path.join(DATASET_DIR, f"random_n{num_vectors}_d{dim}_s{seed}{suffix}.npy")
+    query_path = os.path.join(DATASET_DIR, f"random_q{num_queries}_d{dim}_s{query_seed}{suffix}.npy")
+    if not os.path.exists(base_path):
+        print(f"📦 Generating dataset cache: {base_path}")
+        _generate(base_path, num_vectors, dim, seed, normalize)
+    if not os.path.exists(query_path):
+        _generate(query_path, num_queries, dim, query_seed, normalize)
+
+    cache_key = {"source": "random", "num_vectors": num_vectors, "dim": dim,
+                 "seed": seed, "query_seed": query_seed}
+    if normalize:
+        cache_key["normalize"] = True
+    return Dataset("random", np.load(base_path, mmap_mode='r'),
+                   np.load(query_path, mmap_mode='r'), cache_key=cache_key)
+
+
+def clustered_dataset(num_vectors, dim, seed=42, num_queries=1000, query_seed=7, num_clusters=256,
+                      intrinsic_dim=16, cluster_std=2.0, query_zipf=1.1, normalize=False):
+    """
+    Gaussian-mixture dataset (see GaussianMixture), generated once and then
+    memory-mapped. Queries are fresh draws from the same mixture, so they
+    land near the data, with clusters picked by Zipf(query_zipf) popularity
+    (0 = as often as the data). normalize=True L2-normalizes base and
+    queries for IP / COSINE runs.
+    """
+    mixture = GaussianMixture(dim, num_clusters, intrinsic_dim, cluster_std, seed=seed)
+    shape = f"d{dim}_c{num_clusters}_r{mixture.intrinsic_dim}_sd{cluster_std:g}_s{seed}"
+    suffix = "_norm" if normalize else ""
+    base_path = os.path.join(DATASET_DIR, f"clustered_n{num_vectors}_{shape}{suffix}.npy")
+    query_path = os.path.join(DATASET_DIR,
+                              f"clustered_q{num_queries}_{shape}_qs{query_seed}_z{query_zipf:g}{suffix}.npy")
+
+    def chunks(points):
+        def chunk(start, end):
+            # Per-chunk generator: the file is identical however it is chunked
+            rows = points(end - start, np.random.default_rng([seed, 1, start]))
+            return _normalized(rows) if normalize else rows
+        return chunk
+
+    if not os.path.exists(base_path):
+        print(f"📦 Generating dataset cache: {base_path}")
+        _write_npy(base_path, num_vectors, dim, chunks(lambda n, rng: mixture.sample(n, rng)))
+    if not os.path.exists(query_path):
+        rng = np.random.default_rng([query_seed, 2])
+        queries = mixture.sample(num_queries, rng, mixture.zipf_clusters(num_queries, rng, query_zipf))
+        _write_npy(query_path, num_queries, dim, lambda start, end: _normalized(queries[start:end])
+                   if normalize else queries[start:end])
+
+    cache_key = {"source": "clustered", "num_vectors": num_vectors, "dim": dim, "seed": seed,
+                 "query_seed": query_seed, "num_clusters": num_clusters, "intrinsic_dim": mixture.intrinsic_dim,
+                 "cluster_std": cluster_std, "query_zipf": query_zipf, "normalize": normalize}
+    return Dataset("clustered", np.load(base_path, mmap_mode='r'),
+                   np.load(query_path, mmap_mode='r'), cache_key=cache_key)
+
+
+def file_dataset(path, limit=None):
+    """
+    Load a dataset from disk.
+
+    `path` may be a .npy/.fvecs/.bvecs file (its last 1000 rows, at most
+    half the file, are held out of the base set as queries, so no query is
+    its own nearest neighbor) or a directory in SIFT/GIST layout containing
+    *_base.*vecs, *_query.*vecs and optionally *_groundtruth.ivecs.
+    `limit` keeps only the first N base vectors; the shipped ground truth is
+    ignored in that case because it refers to the full set.
+    """
+    def load(p):
+        return np.load(p, mmap_mode='r') if p.endswith(".npy") else read_vecs(p)
+
+    gt_ids = None
+    if os.path.isdir(path):
+        def find(pattern):
+            hits = sorted(glob.glob(os.path.join(path, pattern)))
+            return hits[0] if hits else None
+
+        base_file = find("*_base.*vecs") or find("*base*.npy")
+        query_file = find("*_query.*vecs") or find("*query*.npy")
+        gt_file = find("*_groundtruth.ivecs")
+        if not base_file or not query_file:
+            raise FileNotFoundError(f"no *_base/*_query vectors found in {path}")
+        base, queries = load(base_file), load(query_file)
+        if gt_file and limit is None:
+            gt_ids = read_vecs(gt_file)
+    else:
+        base = load(path)
+        held_out = min(HELDOUT_QUERIES, len(base) // 2)
+        base, queries = base[:len(base) - held_out], base[len(base) - held_out:]
+
+    if limit is not None:
+        base = base[:limit]
+    name = os.path.basename(os.path.normpath(path))
+    cache_key = {"source": os.path.abspath(path), "num_vectors": len(base),
+                 "size": os.path.getsize(path) if os.path.isfile(path) else None}
+    return Dataset(name, base, queries, gt_ids=gt_ids, cache_key=cache_key)
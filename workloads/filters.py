@@ -0,0 +1,106 @@
+"""
+DBPU Acceleration Lab - Scalar Fields & Filter Expressions
+Deterministic scalar columns (category, timestamp, tag) derived from row
+ids, selectivity-targeted Milvus `expr` strings, and a small evaluator for
+those expressions used by the local engine
+"""
+import re
+
+import numpy as np
+
+NUM_CATEGORIES = 1000          # uniform: `category < c` selects c / 1000 of the rows
+TIMESTAMP_START = 1767225600   # 2026-01-01T00:00:00Z; one row per second of ingest, with jitter
+TIMESTAMP_JITTER_S = 30
+NUM_TAGS = 64                  # Zipf-distributed popularity, like real labels
+TAG_ZIPF_S = 1.1
+SELECTIVITIES = [0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 0.9]
+FILTER_FIELDS = ["category", "timestamp", "tag"]
+
+TAGS = np.array([f"tag{i:02d}" for i in range(NUM_TAGS)])
+_tag_weights = 1.0 / np.arange(1, NUM_TAGS + 1) ** TAG_ZIPF_S
+TAG_PROBS = _tag_weights / _tag_weights.sum()
+_TAG_CDF = np.cumsum(TAG_PROBS)
+
+
+def _uniform(ids, salt):
+    """Counter-based uniform [0, 1) per row id (splitmix64), independent of batching"""
+    with np.errstate(over="ignore"):
+        z = np.asarray(ids, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(salt)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def scalar_columns(start, n, seed=0):
+    """category / timestamp / tag for rows [start, start + n)"""
+    ids = np.arange(start, start + n, dtype=np.uint64)
+    category = (_uniform(ids, seed * 3 + 1) * NUM_CATEGORIES).astype(np.int64)
+    jitter = (_uniform(ids, seed * 3 + 2) * TIMESTAMP_JITTER_S).astype(np.int64)
+    timestamp = TIMESTAMP_START + ids.astype(np.int64) + jitter
+    tag = TAGS[np.minimum(np.searchsorted(_TAG_CDF, _uniform(ids, seed * 3 + 3), side="right"),
+                          NUM_TAGS - 1)]
+    return {"category": category, "timestamp": timestamp, "tag": tag}
+
+
+def selectivity_expr(field, target, num_vectors):
+    """
+    Milvus boolean expression selecting about `target` of the rows.
+
+    category: a uniform threshold; timestamp: the most recent fraction of
+    ingested rows (filters correlated with insert order); tag: the least
+    popular tags whose Zipf mass adds up closest to the target.
+    """
+    if field == "category":
+        return f"category < {max(1, round(target * NUM_CATEGORIES))}"
+    if field == "timestamp":
+        cutoff = TIMESTAMP_START + int(round((1 - target) * num_vectors))
+        return f"timestamp >= {cutoff}"
+    if field == "tag":
+        order = np.argsort(TAG_PROBS)  # rarest first, so small targets are reachable
+        chosen, total = [], 0.0
+        for i in order:
+            if chosen and abs(total + TAG_PROBS[i] - target) > abs(total - target):
+                continue
+            chosen.append(TAGS[i])
+            total += TAG_PROBS[i]
+        return "tag in [" + ", ".join(f'"{t}"' for t in sorted(chosen)) + "]"
+    raise ValueError(f"unknown filter field: {field}")
+
+
+_COMPARE = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(-?\d+(?:\.\d+)?)\s*$")
+_IN = re.compile(r"^\s*(\w+)\s+in\s+\[(.*)\]\s*$")
+_OPS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+        "==": np.equal, "!=": np.not_equal}
+
+
+def compile_expr(expr):
+    """
+    Turn an expression into mask_fn(columns) -> bool array.
+
+    Supports the subset the lab generates: `field <op> number` and
+    `field in ["a", "b"]` clauses joined by `and`.
+    """
+    clauses = []
+    for part in re.split(r"\s+and\s+", expr.strip()):
+        m = _COMPARE.match(part)
+        if m:
+            field, op, value = m.groups()
+            clauses.append((field, _OPS[op], float(value) if "." in value else int(value)))
+            continue
+        m = _IN.match(part)
+        if m:
+            field, items = m.groups()
+            values = [v.strip().strip('"').strip("'") for v in items.split(",") if v.strip()]
+            clauses.append((field, np.isin, np.array(values)))
+            continue
+        raise ValueError(f"unsupported filter expression: {part!r}")
+
+    def mask_fn(columns):
+        mask = None
+        for field, op, value in clauses:
+            m = op(columns[field], value)
+            mask = m if mask is None else mask & m
+        return mask
+
+    return mask_fn
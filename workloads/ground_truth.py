@@ -0,0 +1,104 @@
+"""
+DBPU Acceleration Lab - Exact Ground Truth & Recall
+Blocked NumPy brute-force top-k with an on-disk cache
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+GROUND_TRUTH_DIR = "/tmp/dbpu-groundtruth"
+
+
+def _merge_topk(best_ids, best_dists, ids, dists, k, largest):
+    """Merge a candidate block into the running top-k (per query row)"""
+    all_ids = np.concatenate([best_ids, ids], axis=1)
+    all_dists = np.concatenate([best_dists, dists], axis=1)
+    order_key = -all_dists if largest else all_dists
+    keep = np.argpartition(order_key, k - 1, axis=1)[:, :k] if all_ids.shape[1] > k \
+        else np.argsort(order_key, axis=1)
+    rows = np.arange(all_ids.shape[0])[:, None]
+    return all_ids[rows, keep], all_dists[rows, keep]
+
+
+def exact_topk(queries, blocks, k, metric="L2", timing=None):
+    """
+    Exact top-k over a stream of (start_id, vectors) blocks.
+
+    Distances are computed one block at a time with a single matrix
+    multiply, so memory is O(nq * block) rather than O(nq * N). For L2 the
+    ||q||^2 term is added back at the end; it does not change the ranking.
+    Returns (ids, distances), each (nq, k), sorted best first. If `timing`
+    is a dict, timing["scan_s"] is set to the time spent fetching blocks
+    and computing distances, without the top-k selection and merges.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    largest = metric in ("IP", "COSINE")
+    if metric == "COSINE":
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+    nq = queries.shape[0]
+    fill = -np.inf if largest else np.inf
+    best_ids = np.full((nq, 0), -1, dtype=np.int64)
+    best_dists = np.full((nq, 0), fill, dtype=np.float32)
+
+    scan_s = 0.0
+    t0 = time.perf_counter()
+    for start, block in blocks:
+        block = np.asarray(block, dtype=np.float32)
+        if metric == "COSINE":
+            block = block / np.linalg.norm(block, axis=1, keepdims=True)
+        scores = queries @ block.T
+        if metric == "L2":
+            scores = np.einsum("ij,ij->i", block, block)[None, :] - 2.0 * scores
+        scan_s += time.perf_counter() - t0
+
+        take = min(k, block.shape[0])
+        order_key = -scores if largest else scores
+        local = np.argpartition(order_key, take - 1, axis=1)[:, :take]
+        rows = np.arange(nq)[:, None]
+        best_ids, best_dists = _merge_topk(
+            best_ids, best_dists, local.astype(np.int64) + start, scores[rows, local], k, largest
+        )
+        t0 = time.perf_counter()  # the next block's fetch counts as scan time
+    if timing is not None:
+        timing["scan_s"] = scan_s
+
+    order = np.argsort(-best_dists if largest else best_dists, axis=1)
+    rows = np.arange(nq)[:, None]
+    ids, dists = best_ids[rows, order], best_dists[rows, order]
+    if metric == "L2":
+        dists = dists + np.einsum("ij,ij->i", queries, queries)[:, None]
+    return ids, dists
+
+
+def ground_truth(queries, blocks_fn, k, cache_key, metric="L2", cache_dir=GROUND_TRUTH_DIR):
+    """
+    Exact top-k ids for `queries`, cached on disk under `cache_key`.
+
+    cache_key is any JSON-serializable description of the dataset and query
+    set (sizes, seeds, source files); blocks_fn() is only called on a miss.
+    """
+    key = json.dumps({"data": cache_key, "k": k, "metric": metric}, sort_keys=True)
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f"gt_{digest}.npy")
+
+    if os.path.exists(path):
+        ids = np.load(path)
+        if ids.shape == (len(queries), k):
+            return ids
+
+    ids, _ = exact_topk(queries, blocks_fn(), k, metric)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(path, ids)
+    return ids
+
+
+def recall_at_k(result_ids, gt_ids, k):
+    """Mean fraction of the true top-k found in each result's first k ids"""
+    hits = 0
+    for found, truth in zip(result_ids, gt_ids):
+        hits += len(set(list(found)[:k]) & set(truth[:k].tolist()))
+    return hits / (len(gt_ids) * k) if len(gt_ids) else 0.0
@@ -0,0 +1,57 @@
+"""
+DBPU Acceleration Lab - Streaming Bulk Ingest
+Bounded parallel insert workers fed from a stream of vector batches
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parallel_ingest(insert_fn, batches, workers=4, max_in_flight=None):
+    """
+    Feed batches to `workers` insert threads with bounded memory.
+
+    At most `max_in_flight` batches (default 2 per worker) are generated
+    ahead of the inserts, so peak memory is a few batches regardless of
+    the total dataset size. insert_fn(start_id, batch) receives the id of
+    the first row and a 2-D float32 array.
+    Returns ingest stats (vectors, bytes, elapsed, vectors/s, MB/s).
+    """
+    max_in_flight = max_in_flight or workers * 2
+    slots = threading.Semaphore(max_in_flight)
+    totals = {"vectors": 0, "bytes": 0}
+    totals_lock = threading.Lock()
+    failures = []
+
+    def insert(start_id, batch):
+        try:
+            insert_fn(start_id, batch)
+            with totals_lock:
+                totals["vectors"] += len(batch)
+                totals["bytes"] += batch.nbytes
+        except Exception as e:
+            failures.append(e)
+        finally:
+            slots.release()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for start_id, batch in batches:
+            slots.acquire()
+            if failures:
+                slots.release()
+                break
+            pool.submit(insert, start_id, batch)
+    elapsed_s = time.perf_counter() - start
+
+    if failures:
+        raise failures[0]
+
+    return {
+        "vectors": totals["vectors"],
+        "bytes": totals["bytes"],
+        "elapsed_s": elapsed_s,
+        "vectors_per_s": totals["vectors"] / elapsed_s if elapsed_s > 0 else 0.0,
+        "mb_per_s": totals["bytes"] / 1e6 / elapsed_s if elapsed_s > 0 else 0.0,
+        "workers": workers,
+    }
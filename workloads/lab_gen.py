@@ -6,14 +6,42 @@ import numpy as np
 import time
 import json
 import os
+import argparse
+import hashlib
+import sys
+import threading
+import uuid
 from datetime import datetime
 
+# Shared analysis modules (latency sketches) live in analyzer/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analyzer"))
+
+from ground_truth import ground_truth, recall_at_k
+from dataset_cache import random_dataset, clustered_dataset, file_dataset
+from ingest import parallel_ingest
+from local_engine import LocalEngine
+from sweep import load_spec, group_by_index
+from load_gen import run_closed_loop, run_schedule, summarize_latencies, sweep_offered_load
+from batch_sweep import sweep_batch
+from mixed import run_mixed
+from query_trace import Trace
+from replay import replay_trace
+from query_cache import ExactCache, SemanticCache, CachedSearch
+from request_log import RequestLog
+from payload import prepare_payload, payload_pool, pool_stats
+from resource_sampler import ResourceSampler, parse_targets, SAMPLE_INTERVAL_S, TARGET_PIDS_ENV
+from multiproc import run_multiprocess
+from run_info import collect_environment
+from filters import scalar_columns, selectivity_expr, compile_expr, SELECTIVITIES
+
 # Milvus 연결 시도
+MILVUS_HOST = os.getenv("MILVUS_HOST", "localhost")
+MILVUS_PORT = os.getenv("MILVUS_PORT", "19530")
 MILVUS_AVAILABLE = False
 try:
     from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
     try:
-        connections.connect("default", host="localhost", port="19530", timeout=2)
+        connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT, timeout=2)
         MILVUS_AVAILABLE = True
         print("✅ Milvus detected - Running in REAL mode")
     except Exception as e:
@@ -26,83 +54,275 @@ except ImportError:
 # Configuration
 DIM = 128
 NUM_VECTORS = 10000
+INGEST_BATCH_SIZE = 5000
+INGEST_WORKERS = 4
+TOP_K = 10
+DATA_SEED = 42
+QUERY_SEED = 7
 LOG_FILE = "/tmp/dbpu-knowhere.jsonl"
+DEFAULT_SPEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "specs", "default.json")
+HOOK_LOG_FILE = os.getenv("HOOK_LOG_FILE", "/tmp/dbpu-knowhere-hooks.jsonl")
+COLLECTION_NAME = "dbpu_accel_test"
+# Build/load cost of the active index, copied onto every record of that config
+BUILD_FIELDS = ["index_build_s", "index_load_s", "index_bytes", "index_rows", "build_vectors_per_s"]
+GENERATOR_PROBE_S = 1.0
+GENERATOR_PROBE_REQUESTS = 20000
+# Measured throughput above this fraction of the no-op ceiling says more about the client than the server
+GENERATOR_BOUND_FRACTION = 0.5
 
 class WorkloadRunner:
-    def __init__(self, use_real=MILVUS_AVAILABLE):
+    def __init__(self, use_real=MILVUS_AVAILABLE, tag=None, metric="L2"):
         self.use_real = use_real
+        self.metric = metric  # L2, IP or COSINE, for every index and ground truth of the run
+        # Tags every record of this run so analyzers can group and compare runs
+        self.run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.tag = tag  # optional human label, e.g. "baseline" or a build name
+        self.requests = RequestLog(self.run_id)  # per-request client timings, joined to hooks by id
         self.collection = None
+        self.engine = None  # in-process engine used in MOCK mode
         self.logs = []
+        self.dataset = None
+        self.dim = DIM
+        self._payloads = {}           # nq -> prepared query pool
+        self._generator_ceiling = {}  # (kind, nq, concurrency) -> no-op backend QPS
+        self.index_build = None       # stats of the last index build, see _build_index
+        self.sampler = None
+        
+    def start_sampler(self, targets=None, interval_s=SAMPLE_INTERVAL_S):
+        """Log /proc resource samples of this process and `targets` ({name: pid}) for the rest of the run"""
+        if interval_s and interval_s > 0 and os.path.exists("/proc/self/stat"):
+            self.sampler = ResourceSampler(self.save_log, targets, interval_s).start()
+        return self.sampler
+    
+    def stop_sampler(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+    
+    def record_run_info(self, dataset, spec):
+        """Log one run_info record: what ran, where, and against which builds"""
+        server_version = None
+        if self.use_real:
+            try:
+                server_version = utility.get_server_version()
+            except Exception:
+                pass
+        log = {
+            "timestamp": datetime.now().isoformat(),
+            "mode": "real" if self.use_real else "mock",
+            "workload": "run_info",
+            "dataset": dataset.name,
+            "dataset_key": dataset.cache_key,
+            "spec": os.path.abspath(spec),
+            "environment": collect_environment(server_version)
+        }
+        self.save_log(log)
+        return log
+    
+    def setup_collection(self, dataset, batch_size=INGEST_BATCH_SIZE, workers=INGEST_WORKERS):
+        """Setup collection (real or mock) via the streaming ingest pipeline"""
+        self.dataset = dataset
+        self.dim = dataset.dim
+        self._payloads = {}
+        num_vectors = len(dataset)
+        batches = dataset.batches(batch_size)
         
-    def setup_collection(self):
-        """Setup collection (real or mock)"""
         if self.use_real:
             print(f"Setting up real Milvus collection...")
-            COLLECTION_NAME = "dbpu_accel_test"
             
             if utility.has_collection(COLLECTION_NAME):
                 utility.drop_collection(COLLECTION_NAME)
             
             fields = [
-                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-                FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=DIM)
+                # Explicit ids = row index, so results can be scored against ground truth
+                FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+                FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=self.dim),
+                # Scalar columns for filtered search (see workloads/filters.py)
+                FieldSchema(name="category", dtype=DataType.INT64),
+                FieldSchema(name="timestamp", dtype=DataType.INT64),
+                FieldSchema(name="tag", dtype=DataType.VARCHAR, max_length=16)
             ]
             schema = CollectionSchema(fields, "DBPU Acceleration Test")
             self.collection = Collection(COLLECTION_NAME, schema)
             
-            print(f"Inserting {NUM_VECTORS} vectors (dim={DIM})...")
-            data = [np.random.random((NUM_VECTORS, DIM)).astype(np.float32).tolist()]
-            self.collection.insert(data)
+            print(f"Inserting {num_vectors} vectors (dim={self.dim}, batch={batch_size}, workers={workers})...")
+            def insert(start, batch):
+                scalars = scalar_columns(start, len(batch), DATA_SEED)
+                self.collection.insert([
+                    list(range(start, start + len(batch))), np.asarray(batch, dtype=np.float32).tolist(),
+                    scalars["category"].tolist(), scalars["timestamp"].tolist(), scalars["tag"].tolist()
+                ])
+            
+            stats = parallel_ingest(insert, batches, workers=workers)
+            
+            flush_start = time.perf_counter()
             self.collection.flush()
+            stats["flush_s"] = time.perf_counter() - flush_start
             print("✅ Real data inserted")
         else:
-            print(f"[MOCK] Creating collection with {NUM_VECTORS} vectors (dim={DIM})...")
-            time.sleep(0.5)
+            print(f"[MOCK] Creating collection with {num_vectors} vectors (dim={self.dim})...")
+            self.engine = LocalEngine(self.dim, num_vectors, hook_log=HOOK_LOG_FILE, run_id=self.run_id)
+            stats = parallel_ingest(
+                lambda start, batch: self.engine.add(start, batch, scalar_columns(start, len(batch), DATA_SEED)),
+                batches, workers=workers
+            )
+            stats["flush_s"] = 0.0
             print("✅ [MOCK] Data ready")
+        
+        print(f"   Ingest: {stats['vectors_per_s']:,.0f} vectors/s, {stats['mb_per_s']:.1f} MB/s, "
+              f"flush {stats['flush_s']:.2f}s")
+        
+        log = {
+            "timestamp": datetime.now().isoformat(),
+            "mode": "real" if self.use_real else "mock",
+            "workload": "ingest",
+            "dataset": dataset.name,
+            "batch_size": batch_size,
+            "dim": self.dim
+        }
+        log.update(stats)
+        self.save_log(log)
+        return stats
+    
+    def query_vectors(self, nq, offset=0):
+        """Rows of the dataset's fixed query set, so every index config sees the same queries"""
+        return np.ascontiguousarray(self.dataset.query_batch(nq, offset), dtype=np.float32)
     
-    def run_search_test(self, index_type, index_params, search_params, label):
-        """Run search test (real or mock)"""
+    def ground_truth_ids(self, nq, k=TOP_K):
+        """Exact top-k ids for the first `nq` queries (shipped with the dataset or cached on disk)"""
+        gt = self.dataset.gt_ids
+        # Shipped SIFT/GIST ground truth is L2
+        if gt is not None and gt.shape[1] >= k and len(gt) >= nq and self.metric == "L2":
+            return np.asarray(gt[:nq, :k])
+        
+        cache_key = dict(self.dataset.cache_key, nq=nq)
+        return ground_truth(
+            self.query_vectors(nq),
+            lambda: self.dataset.batches(INGEST_BATCH_SIZE),
+            k, cache_key, metric=self.metric
+        )
+    
+    def filter_mask(self, expr):
+        """Rows passing `expr`, evaluated client-side on the same deterministic scalar columns"""
+        if self.engine is not None:
+            return self.engine.filter_mask(expr)
+        if getattr(self, "_scalars", None) is None:
+            self._scalars = scalar_columns(0, len(self.dataset), DATA_SEED)
+        return compile_expr(expr)(self._scalars)
+    
+    def filtered_ground_truth_ids(self, nq, k, expr):
+        """Exact top-k among rows passing `expr` (cached on disk per expression)"""
+        rows = np.flatnonzero(self.filter_mask(expr))
+        k = min(k, rows.size)
+        if k == 0:
+            return np.empty((nq, 0), dtype=np.int64)
+        base = self.dataset.base
+        blocks = lambda: ((s, base[rows[s:s + INGEST_BATCH_SIZE]]) for s in range(0, rows.size, INGEST_BATCH_SIZE))
+        positions = ground_truth(self.query_vectors(nq), blocks, k,
+                                 dict(self.dataset.cache_key, nq=nq, expr=expr, scalar_seed=DATA_SEED),
+                                 metric=self.metric)
+        return rows[positions]
+    
+    def run_search_test(self, index_type, index_params, search_params, label, build=True):
+        """Run search test (real or mock); build=False reuses the loaded index"""
         print(f"\n{'='*60}")
         print(f"Testing: {label} ({index_type})")
         print(f"{'='*60}")
         
+        if build:
+            self._build_index(index_type, index_params)
         if self.use_real:
             return self._run_real_search(index_type, index_params, search_params, label)
         else:
             return self._run_mock_search(index_type, index_params, search_params, label)
     
-    def _run_real_search(self, index_type, index_params, search_params, label):
-        """Real Milvus search"""
-        self.collection.release()
-        self.collection.drop_index()
-        
-        print(f"Creating index: {index_params}")
-        self.collection.create_index(
-            field_name="vector",
-            index_params={
-                "index_type": index_type,
-                "metric_type": "L2",
-                "params": index_params
+    def _build_index(self, index_type, index_params):
+        """
+        Drop any existing index, build the requested one and load it. Build
+        and load wall time, index size and build throughput are logged as an
+        index_build record and returned.
+        """
+        if not self.use_real:
+            print(f"[MOCK] Creating index: {index_params}")
+            # The local engine searches the index where it was built; there is no load step
+            stats = self.engine.build_index(index_type, index_params, metric=self.metric)
+            stats["index_load_s"] = None
+        else:
+            self.collection.release()
+            self.collection.drop_index()
+            
+            print(f"Creating index: {index_params}")
+            build_start = time.perf_counter()
+            self.collection.create_index(
+                field_name="vector",
+                index_params={
+                    "index_type": index_type,
+                    "metric_type": self.metric,
+                    "params": index_params
+                }
+            )
+            utility.wait_for_index_building_complete(COLLECTION_NAME)
+            build_s = time.perf_counter() - build_start
+            load_start = time.perf_counter()
+            self.collection.load()
+            stats = {
+                "index_build_s": build_s,
+                "index_load_s": time.perf_counter() - load_start,
+                "index_rows": self.collection.num_entities,
+                "index_bytes": self._loaded_bytes(),
             }
-        )
-        self.collection.load()
         
+        stats["build_vectors_per_s"] = stats["index_rows"] / stats["index_build_s"] if stats["index_build_s"] > 0 else None
+        self.index_build = dict(stats, index_type=index_type, index_params=index_params)
+        size = f"{stats['index_bytes'] / 2**20:.1f} MB" if stats["index_bytes"] is not None else "size n/a"
+        load = f"load {stats['index_load_s']:.2f}s, " if stats["index_load_s"] is not None else ""
+        print(f"   Build {stats['index_build_s']:.2f}s ({stats['build_vectors_per_s'] or 0:,.0f} vectors/s), "
+              f"{load}index {size}")
+        
+        log = {
+            "timestamp": datetime.now().isoformat(),
+            "mode": "real" if self.use_real else "mock",
+            "workload": "index_build",
+            "index_type": index_type,
+            "index_params": index_params,
+            "dim": self.dim
+        }
+        log.update(stats)
+        self.save_log(log)
+        return stats
+    
+    def _loaded_bytes(self):
+        """Memory of the loaded segments (vectors + index) as reported by the query nodes"""
+        try:
+            return sum(segment.mem_size for segment in utility.get_query_segment_info(COLLECTION_NAME))
+        except Exception:
+            return None
+    
+    def _run_real_search(self, index_type, index_params, search_params, label):
+        """Real Milvus search"""
         # Warm-up
-        search_vectors = np.random.random((5, DIM)).astype(np.float32).tolist()
-        self.collection.search(data=search_vectors, anns_field="vector", param=search_params, limit=10)
+        warmup = prepare_payload(self.query_vectors(5), real=True)
+        self.collection.search(data=warmup.data, anns_field="vector", param=search_params, limit=10)
         
-        # Actual test
-        search_vectors = np.random.random((10, DIM)).astype(np.float32).tolist()
+        # Actual test: the payload is converted before the clock starts
+        queries = self.query_vectors(10)
+        payload = prepare_payload(queries, real=True)
+        request_id = self.requests.new_id()
         start_time = time.time()
         results = self.collection.search(
-            data=search_vectors,
+            data=payload.data,
             anns_field="vector",
             param=search_params,
-            limit=10
+            limit=TOP_K
         )
-        latency_ms = (time.time() - start_time) * 1000
+        end_time = time.time()
+        latency_ms = (end_time - start_time) * 1000
+        self.requests.record(request_id, start_time, end_time, payload.serialize_s, len(queries), TOP_K,
+                             {"workload": "single", "label": label, "index_type": index_type,
+                              "search_params": search_params})
         
-        print(f"✅ Latency: {latency_ms:.2f} ms (REAL)")
+        recall = recall_at_k([hits.ids for hits in results], self.ground_truth_ids(len(queries)), TOP_K)
+        print(f"✅ Latency: {latency_ms:.2f} ms, recall@{TOP_K}: {recall:.4f} (REAL)")
         
         return {
             "timestamp": datetime.now().isoformat(),
@@ -112,25 +332,33 @@ class WorkloadRunner:
             "search_params": search_params,
             "label": label,
             "latency_ms": latency_ms,
-            "num_queries": len(search_vectors),
-            "dim": DIM
+            "recall_at_k": recall,
+            "top_k": TOP_K,
+            "payload_prepare_ms": payload.prepare_s * 1000,
+            "serialize_ms": payload.serialize_s * 1000,
+            "num_queries": len(queries),
+            "dim": self.dim
         }
     
     def _run_mock_search(self, index_type, index_params, search_params, label):
-        """Mock search with realistic latencies"""
-        print(f"[MOCK] Creating index: {index_params}")
-        time.sleep(0.3)
+        """Search the in-process NumPy engine (no Milvus needed)"""
+        # Warm-up
+        self.engine.search(self.query_vectors(5), TOP_K, search_params)
         
-        # Realistic latency simulation
-        if index_type == "HNSW":
-            latency_ms = np.random.uniform(40, 60)
-        elif index_type == "IVF_FLAT":
-            latency_ms = np.random.uniform(80, 120)
-        else:  # FLAT
-            latency_ms = np.random.uniform(200, 300)
+        # Actual test
+        queries = self.query_vectors(10)
+        request_id = self.requests.new_id()
+        start_time = time.time()
+        ids, _, total_us, scan_us = self.engine.search(queries, TOP_K, search_params, request_id=request_id)
+        end_time = time.time()
+        latency_ms = (end_time - start_time) * 1000
+        self.requests.record(request_id, start_time, end_time, 0.0, len(queries), TOP_K,
+                             {"workload": "single", "label": label, "index_type": index_type,
+                              "search_params": search_params})
         
-        time.sleep(latency_ms / 1000)
-        print(f"✅ Latency: {latency_ms:.2f} ms (MOCK)")
+        recall = recall_at_k(ids, self.ground_truth_ids(len(queries)), TOP_K)
+        print(f"✅ Latency: {latency_ms:.2f} ms, recall@{TOP_K}: {recall:.4f}, "
+              f"scan_codes {scan_us / total_us * 100:.1f}% (MOCK)")
         
         return {
             "timestamp": datetime.now().isoformat(),
@@ -140,38 +368,934 @@ class WorkloadRunner:
             "search_params": search_params,
             "label": label,
             "latency_ms": latency_ms,
-            "num_queries": 10,
-            "dim": DIM
+            "recall_at_k": recall,
+            "top_k": TOP_K,
+            "scan_codes_time_us": scan_us,
+            "other_time_us": total_us - scan_us,
+            "num_queries": len(queries),
+            "dim": self.dim
+        }
+    
+    def query_pool(self, nq):
+        """Prepared payloads of `nq` queries, converted once per run and shared by all load tests"""
+        if nq not in self._payloads:
+            self._payloads[nq] = payload_pool(lambda i: self.query_vectors(nq, offset=i * nq), self.use_real)
+        return self._payloads[nq]
+    
+    def _load_search_fn(self, index_type, index_params, search_params, nq, build=True, **context):
+        """Build the index (unless reused) and return a search_fn(seq) for load generators"""
+        if build:
+            self._build_index(index_type, index_params)
+        search_fn = self._search_fn(search_params, nq, dict(context, index_type=index_type))
+        search_fn(0)  # warm-up
+        return search_fn
+    
+    def _search_fn(self, search_params, nq, context, noop=False):
+        """
+        search_fn(seq) over the prepared query pool. Every call gets a
+        request id and a request-log entry tagged with `context` (workload,
+        label, ...); the local engine copies the id into its hook record.
+        With noop=True the backend call is skipped but everything else the
+        client does per request stays, and nothing reaches the request log.
+        """
+        pool = self.query_pool(nq)
+        context = dict(context, search_params=search_params)
+        requests = RequestLog(self.run_id, os.devnull) if noop else self.requests
+        if noop:
+            def send(payload, request_id):
+                pass
+        elif self.use_real:
+            # pymilvus has no field for the id; the analyzer matches hooks by time instead
+            def send(payload, request_id):
+                self.collection.search(data=payload.data, anns_field="vector", param=search_params, limit=TOP_K)
+        else:
+            def send(payload, request_id):
+                self.engine.search(payload.data, TOP_K, search_params, request_id=request_id)
+        
+        def search_fn(seq):
+            payload = pool[seq % len(pool)]
+            request_id = requests.new_id()
+            sent = time.time()
+            send(payload, request_id)
+            requests.record(request_id, sent, time.time(), payload.serialize_s, nq, TOP_K, context)
+        
+        return search_fn
+    
+    def generator_ceiling(self, nq, concurrency=None, max_workers=256):
+        """
+        Requests/s the load generator sustains against a no-op backend:
+        closed-loop with `concurrency` clients, or, without it, the open-loop
+        scheduler dispatching a backlog to `max_workers` senders. Measured
+        once per shape and run.
+        """
+        key = ("closed", nq, concurrency) if concurrency else ("open", nq, max_workers)
+        if key not in self._generator_ceiling:
+            noop_fn = self._search_fn({}, nq, {}, noop=True)
+            if concurrency:
+                latencies_ms, elapsed_s, _ = run_closed_loop(noop_fn, concurrency, duration_s=GENERATOR_PROBE_S)
+                done = len(latencies_ms)
+            else:
+                latencies_ms, _, elapsed_s, _ = run_schedule(noop_fn, np.zeros(GENERATOR_PROBE_REQUESTS),
+                                                             max_workers=max_workers)
+                done = len(latencies_ms)
+            self._generator_ceiling[key] = done / elapsed_s if elapsed_s > 0 else float("inf")
+        return self._generator_ceiling[key]
+    
+    def run_closed_loop_test(self, index_type, index_params, search_params, label,
+                             concurrency_levels=(1, 4, 16), duration_s=10.0,
+                             num_requests=None, nq=10, build=True):
+        """Closed-loop load: N clients issuing back-to-back searches per level"""
+        print(f"\n{'='*60}")
+        print(f"Closed-loop: {label} ({index_type}) concurrency={list(concurrency_levels)}")
+        print(f"{'='*60}")
+        
+        search_fn = self._load_search_fn(index_type, index_params, search_params, nq, build,
+                                         workload="closed_loop", label=label)
+        
+        logs = []
+        for concurrency in concurrency_levels:
+            latencies_ms, elapsed_s, errors = run_closed_loop(
+                search_fn, concurrency, duration_s=duration_s, num_requests=num_requests
+            )
+            summary = summarize_latencies(latencies_ms, elapsed_s, errors)
+            ceiling = self.generator_ceiling(nq, concurrency)
+            generator_bound = summary["qps"] > GENERATOR_BOUND_FRACTION * ceiling
+            print(f"  c={concurrency:<4} QPS={summary['qps']:>9.1f}  "
+                  f"p50={summary['p50_ms']:.2f}  p90={summary['p90_ms']:.2f}  "
+                  f"p99={summary['p99_ms']:.2f}  p99.9={summary['p999_ms']:.2f} ms"
+                  + (f"  errors={errors}" if errors else "")
+                  + (f"  ⚠️  generator-bound (no-op ceiling {ceiling:.0f} QPS)" if generator_bound else ""))
+            
+            log = {
+                "timestamp": datetime.now().isoformat(),
+                "mode": "real" if self.use_real else "mock",
+                "workload": "closed_loop",
+                "index_type": index_type,
+                "index_params": index_params,
+                "search_params": search_params,
+                "label": label,
+                "concurrency": concurrency,
+                "num_queries": nq,
+                "dim": self.dim,
+                "generator_qps": ceiling,
+                "generator_bound": generator_bound
+            }
+            log.update(pool_stats(self.query_pool(nq)))
+            log.update(summary)
+            logs.append(log)
+        
+        return logs
+    
+    def run_open_loop_test(self, index_type, index_params, search_params, label,
+                           rates=None, duration_s=10.0, arrival="constant", nq=10, build=True):
+        """Open-loop load: sweep offered rate up to saturation, mark the knee"""
+        print(f"\n{'='*60}")
+        print(f"Open-loop ({arrival}): {label} ({index_type})")
+        print(f"{'='*60}")
+        
+        search_fn = self._load_search_fn(index_type, index_params, search_params, nq, build,
+                                         workload="open_loop", label=label)
+        points = sweep_offered_load(search_fn, rates=rates, duration_s=duration_s, arrival=arrival)
+        ceiling = self.generator_ceiling(nq)
+        print(f"  Generator ceiling (no-op backend): {ceiling:.0f} QPS")
+        
+        print(f"  {'Offered':>9} {'Achieved':>9} {'p50 ms':>9} {'p99 ms':>9} {'p99.9 ms':>9} {'svc p99':>9}")
+        logs = []
+        for point in points:
+            marker = "  ◀ knee" if point["knee"] else ""
+            generator_bound = point["offered_qps"] > GENERATOR_BOUND_FRACTION * ceiling
+            if generator_bound:
+                marker += "  ⚠️  generator-bound"
+            print(f"  {point['offered_qps']:>9.1f} {point['qps']:>9.1f} {point['p50_ms']:>9.2f} "
+                  f"{point['p99_ms']:>9.2f} {point['p999_ms']:>9.2f} {point['service_p99_ms']:>9.2f}{marker}")
+            
+            log = {
+                "timestamp": datetime.now().isoformat(),
+                "mode": "real" if self.use_real else "mock",
+                "workload": "open_loop",
+                "index_type": index_type,
+                "index_params": index_params,
+                "search_params": search_params,
+                "label": label,
+                "num_queries": nq,
+                "dim": self.dim,
+                "generator_qps": ceiling,
+                "generator_bound": generator_bound
+            }
+            log.update(pool_stats(self.query_pool(nq)))
+            log.update(point)
+            logs.append(log)
+        if points and not points[0]["knee_reached"]:
+            print(f"  ⚠️  Knee not reached: every rate up to {points[-1]['offered_qps']:.0f} QPS was sustained "
+                  f"(raise --rates to find it)")
+        
+        return logs
+    
+    def run_batch_sweep_test(self, index_type, index_params, search_params, label,
+                             nq_values=None, top_k_values=None, repeats=5, build=True):
+        """Sweep batch size (nq) and top_k; report per-batch, per-query and vectors/s"""
+        print(f"\n{'='*60}")
+        print(f"Batch sweep: {label} ({index_type})")
+        print(f"{'='*60}")
+        
+        if build:
+            self._build_index(index_type, index_params)
+        # Payloads are converted once per nq, outside the timed region, like the other workloads
+        prepare = lambda nq: prepare_payload(self.query_vectors(nq), self.use_real)
+        if self.use_real:
+            def search(data, k, params):
+                self.collection.search(data=data, anns_field="vector", param=params, limit=k)
+        else:
+            def search(data, k, params):
+                self.engine.search(data, k, params)
+        
+        top_k_values = [k for k in (top_k_values or [1, 10, 100, 1000]) if k <= len(self.dataset)]
+        points = sweep_batch(prepare, search, search_params, nq_values, top_k_values, repeats=repeats)
+        
+        print(f"  {'top_k':>6} {'nq':>6} {'batch ms':>10} {'p99 ms':>10} {'ms/query':>10} {'vectors/s':>12}")
+        logs = []
+        for point in points:
+            marker = "  ◀ batching stops paying off" if point["knee"] else ""
+            print(f"  {point['top_k']:>6} {point['nq']:>6} {point['batch_ms']:>10.2f} {point['batch_p99_ms']:>10.2f} "
+                  f"{point['per_query_ms']:>10.4f} {point['vectors_per_s']:>12,.0f}{marker}")
+            
+            log = {
+                "timestamp": datetime.now().isoformat(),
+                "mode": "real" if self.use_real else "mock",
+                "workload": "batch_sweep",
+                "index_type": index_type,
+                "index_params": index_params,
+                "search_params": search_params,
+                "label": label,
+                "num_queries": point["nq"],
+                "latency_ms": point["batch_ms"],
+                "dim": self.dim
+            }
+            log.update(point)
+            logs.append(log)
+        
+        return logs
+    
+    def _worker_search_fn(self, search_params, nq):
+        """make_search_fn(worker_id) for forked load generators: own connection, own query stream"""
+        def make_search_fn(worker_id):
+            # Each process starts at a different offset of the query set
+            pool = [self.query_vectors(nq, offset=(worker_id * 64 + i) * nq) for i in range(64)]
+            if self.use_real:
+                alias = f"dbpu-worker-{worker_id}"
+                connections.connect(alias, host=MILVUS_HOST, port=MILVUS_PORT)
+                collection = Collection(COLLECTION_NAME, using=alias)
+                pool = [q.tolist() for q in pool]
+                
+                def search_fn(seq):
+                    collection.search(data=pool[seq % len(pool)], anns_field="vector",
+                                      param=search_params, limit=TOP_K)
+            else:
+                # Forked children share the parent's built index copy-on-write
+                def search_fn(seq):
+                    self.engine.search(pool[seq % len(pool)], TOP_K, search_params)
+            search_fn(0)  # warm-up before the start barrier
+            return search_fn
+        
+        return make_search_fn
+    
+    def run_multiprocess_test(self, index_type, index_params, search_params, label,
+                              processes=4, concurrency_levels=(1, 4), duration_s=10.0,
+                              num_requests=None, nq=10, merge="sketch", build=True):
+        """Closed-loop load from several processes (past the GIL), merged into one report"""
+        print(f"\n{'='*60}")
+        print(f"Multi-process: {label} ({index_type}) processes={processes} "
+              f"concurrency/process={list(concurrency_levels)}")
+        print(f"{'='*60}")
+        
+        if build:
+            self._build_index(index_type, index_params)
+        make_search_fn = self._worker_search_fn(search_params, nq)
+        
+        logs = []
+        for concurrency in concurrency_levels:
+            summary, per_worker = run_multiprocess(
+                make_search_fn, processes, concurrency, duration_s=duration_s,
+                num_requests=num_requests, merge=merge,
+                on_exit=self.engine.flush_hooks if self.engine is not None else None
+            )
+            skew = max(w["start_skew_ms"] for w in per_worker)
+            print(f"  {processes}x{concurrency:<4} QPS={summary['qps']:>9.1f}  "
+                  f"p50={summary['p50_ms']:.2f}  p90={summary['p90_ms']:.2f}  "
+                  f"p99={summary['p99_ms']:.2f}  p99.9={summary['p999_ms']:.2f} ms  "
+                  f"start skew {skew:.1f}ms"
+                  + (f"  errors={summary['errors']}" if summary['errors'] else ""))
+            
+            log = {
+                "timestamp": datetime.now().isoformat(),
+                "mode": "real" if self.use_real else "mock",
+                "workload": "multi_process",
+                "index_type": index_type,
+                "index_params": index_params,
+                "search_params": search_params,
+                "label": label,
+                "processes": processes,
+                "concurrency": processes * concurrency,
+                "merge": merge,
+                "per_worker": per_worker,
+                "num_queries": nq,
+                "dim": self.dim
+            }
+            log.update(summary)
+            logs.append(log)
+        
+        return logs
+    
+    def run_filtered_test(self, index_type, index_params, search_params, label, field="category",
+                          selectivities=None, repeats=5, nq=10, build=True):
+        """Hybrid scalar + vector search over a sweep of filter selectivities"""
+        print(f"\n{'='*60}")
+        print(f"Filtered search ({field}): {label} ({index_type})")
+        print(f"{'='*60}")
+        
+        if build:
+            self._build_index(index_type, index_params)
+        queries = self.query_vectors(nq)
+        payload = queries.tolist() if self.use_real else queries
+        
+        print(f"  {'target':>7} {'actual':>8} {'p50 ms':>9} {'p99 ms':>9} {'recall':>7} {'scan %':>7}  expr")
+        logs = []
+        for target in selectivities or SELECTIVITIES:
+            expr = selectivity_expr(field, target, len(self.dataset))
+            selectivity = float(self.filter_mask(expr).mean())
+            gt = self.filtered_ground_truth_ids(nq, TOP_K, expr)
+            
+            latencies, scan, other = [], [], []
+            for r in range(repeats + 1):  # first search is a warm-up
+                start_time = time.perf_counter()
+                if self.use_real:
+                    results = self.collection.search(data=payload, anns_field="vector", param=search_params,
+                                                     limit=TOP_K, expr=expr)
+                    ids = [hits.ids for hits in results]
+                else:
+                    ids, _, total_us, scan_us = self.engine.search(payload, TOP_K, search_params, expr=expr)
+                    scan.append(scan_us)
+                    other.append(total_us - scan_us)
+                latencies.append((time.perf_counter() - start_time) * 1000)
+            latencies, scan, other = latencies[1:], scan[1:], other[1:]
+            
+            recall = recall_at_k(ids, gt, gt.shape[1]) if gt.shape[1] else None
+            log = {
+                "timestamp": datetime.now().isoformat(),
+                "mode": "real" if self.use_real else "mock",
+                "workload": "filtered",
+                "index_type": index_type,
+                "index_params": index_params,
+                "search_params": search_params,
+                "label": label,
+                "filter_field": field,
+                "expr": expr,
+                "target_selectivity": target,
+                "selectivity": selectivity,
+                "latency_ms": float(np.median(latencies)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "recall_at_k": recall,
+                "top_k": TOP_K,
+                "num_queries": nq,
+                "dim": self.dim
+            }
+            if scan:
+                log["scan_codes_time_us"] = float(np.median(scan))
+                log["other_time_us"] = float(np.median(other))
+            scan_pct = (f"{log['scan_codes_time_us'] / (log['scan_codes_time_us'] + log['other_time_us']) * 100:>6.1f}%"
+                        if scan else f"{'-':>7}")
+            print(f"  {target:>7.1%} {selectivity:>8.2%} {log['latency_ms']:>9.2f} {log['p99_ms']:>9.2f} "
+                  f"{recall if recall is not None else float('nan'):>7.3f} {scan_pct}  {expr[:40]}")
+            logs.append(log)
+        
+        return logs
+    
+    def exact_ids(self, queries, k, expr=None):
+        """Exact top-k ids for arbitrary query vectors (optionally filtered), cached on disk"""
+        rows = np.flatnonzero(self.filter_mask(expr)) if expr else np.arange(len(self.dataset))
+        k = min(k, rows.size)
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64)
+        base = self.dataset.base
+        blocks = lambda: ((s, base[rows[s:s + INGEST_BATCH_SIZE]]) for s in range(0, rows.size, INGEST_BATCH_SIZE))
+        digest = hashlib.sha1(np.ascontiguousarray(queries, dtype=np.float32).tobytes()).hexdigest()[:16]
+        positions = ground_truth(queries, blocks, k,
+                                 dict(self.dataset.cache_key, queries=digest, expr=expr, scalar_seed=DATA_SEED),
+                                 metric=self.metric)
+        return rows[positions]
+    
+    def run_replay_test(self, index_type, index_params, search_params, label, trace_path,
+                        speed=1.0, senders=64, params_from="trace", limit=None, build=True):
+        """
+        Replay a recorded query trace (see workloads/query_trace.py) at `speed`
+        x its original pace. params_from="trace" sends each request's recorded
+        search params (spec params fill in missing keys); "spec" sends the
+        spec's params, so one trace can drive a parameter sweep.
+        """
+        trace = Trace(trace_path)
+        print(f"\n{'='*60}")
+        print(f"Replay {os.path.basename(trace_path)} x{speed:g}: {label} ({index_type}) "
+              f"{len(trace)} requests over {trace.duration_s:.1f}s, {senders} senders")
+        print(f"{'='*60}")
+        if trace.dim != self.dim:
+            raise ValueError(f"trace dim {trace.dim} does not match dataset dim {self.dim}")
+        
+        if build:
+            self._build_index(index_type, index_params)
+        
+        def params_for(recorded):
+            return dict(search_params, **recorded) if params_from == "trace" else search_params
+        
+        if self.use_real:
+            def search(vectors, params, k, expr):
+                results = self.collection.search(data=vectors.tolist(), anns_field="vector",
+                                                 param=params_for(params), limit=k, expr=expr)
+                return [hits.ids for hits in results]
+        else:
+            def search(vectors, params, k, expr):
+                return self.engine.search(vectors, k, params_for(params), expr=expr)[0]
+        
+        search(*trace.request(0))  # warm-up
+        summary, results = replay_trace(trace, search, speed=speed, senders=senders, limit=limit)
+        
+        # Recall over the first requests, grouped so each ground-truth batch is one brute-force pass
+        groups = {}
+        for i in sorted(results):
+            vectors, _, k, expr = trace.request(i)
+            groups.setdefault((k, expr), []).append(i)
+        hits, total = 0.0, 0
+        for (k, expr), idx in groups.items():
+            queries = np.concatenate([np.asarray(trace.request(i)[0], dtype=np.float32) for i in idx])
+            gt = self.exact_ids(queries, k, expr)
+            found = [row for i in idx for row in results[i]]
+            if gt.shape[1]:
+                hits += recall_at_k(found, gt, gt.shape[1]) * len(found)
+                total += len(found)
+        recall = hits / total if total else None
+        
+        print(f"  scheduled {summary['scheduled_qps'] or 0:>8.1f} QPS  achieved {summary['qps']:>8.1f} QPS  "
+              f"p50={summary['p50_ms']:.2f}  p99={summary['p99_ms']:.2f}  p99.9={summary['p999_ms']:.2f} ms  "
+              f"svc p99={summary['service_p99_ms']:.2f} ms"
+              + (f"  recall={recall:.4f}" if recall is not None else "")
+              + (f"  errors={summary['errors']}" if summary['errors'] else ""))
+        
+        log = {
+            "timestamp": datetime.now().isoformat(),
+            "mode": "real" if self.use_real else "mock",
+            "workload": "replay",
+            "index_type": index_type,
+            "index_params": index_params,
+            "search_params": search_params,
+            "label": label,
+            "recall_at_k": recall,
+            "top_k": int(trace.records["top_k"].max()) if len(trace) else TOP_K,
+            "top_k_values": trace.summary()["top_k"],
+            "num_queries": int(round(trace.records["nq"].mean())) if len(trace) else 0,
+            "dim": self.dim,
+            "trace": os.path.abspath(trace_path),
+            "trace_meta": trace.meta,
+            "params_from": params_from
         }
+        log.update(summary)
+        return [log]
+    
+    def _backend_search(self):
+        """search(queries, k, params, expr) -> per-row ids against Milvus or the local engine"""
+        if self.use_real:
+            def search(queries, k, params, expr=None):
+                results = self.collection.search(data=queries.tolist(), anns_field="vector",
+                                                 param=params, limit=k, expr=expr)
+                return [hits.ids for hits in results]
+        else:
+            def search(queries, k, params, expr=None):
+                return list(self.engine.search(queries, k, params, expr=expr)[0])
+        return search
+    
+    def skewed_query_stream(self, num_requests, nq=1, zipf=1.1, near_dup=0.3, noise=0.01, seed=QUERY_SEED):
+        """
+        Request payloads with Zipf(zipf) popularity over the query set; a
+        `near_dup` fraction gets Gaussian noise of `noise` x the vector norm,
+        so exact repeats and near-duplicates both occur.
+        """
+        rng = np.random.default_rng(seed)
+        pool = self.query_vectors(len(self.dataset.queries))
+        p = 1.0 / np.arange(1, len(pool) + 1) ** zipf
+        rows = rng.permutation(len(pool))[rng.choice(len(pool), size=(num_requests, nq), p=p / p.sum())]
+        stream = pool[rows]
+        jitter = rng.random((num_requests, nq)) < near_dup
+        scale = noise * np.linalg.norm(stream, axis=2, keepdims=True) / np.sqrt(self.dim)
+        stream += np.where(jitter[..., None], rng.normal(size=stream.shape) * scale, 0).astype(np.float32)
+        return stream
     
-    def save_logs(self):
-        """Save logs to file"""
+    def run_cache_test(self, index_type, index_params, search_params, label, caches=("exact", "semantic"),
+                       cache_mb=16.0, threshold=0.99, quant_step=1e-4, num_requests=5000, concurrency=4,
+                       nq=1, zipf=1.1, near_dup=0.3, noise=0.01, recall_sample=500, build=True):
+        """
+        Replay one skewed stream uncached, then through each cache, and report
+        hit rate, latency saved, recall lost to approximate hits and memory
+        """
+        print(f"\n{'='*60}")
+        print(f"Query cache: {label} ({index_type}) {num_requests} requests, zipf={zipf}, "
+              f"near-dup={near_dup:.0%}, budget {cache_mb:g} MB")
+        print(f"{'='*60}")
+        
+        if build:
+            self._build_index(index_type, index_params)
+        stream = self.skewed_query_stream(num_requests, nq, zipf, near_dup, noise)
+        backend = self._backend_search()
+        sample = np.unique(np.linspace(0, num_requests - 1, min(recall_sample, num_requests)).astype(np.int64))
+        gt = self.exact_ids(stream[sample].reshape(-1, self.dim), TOP_K)
+        
+        def run(search):
+            results = {}
+            
+            def search_fn(seq):
+                ids = search(stream[seq], TOP_K, search_params)
+                if seq in sampled:
+                    results[seq] = ids
+            
+            search(stream[0], TOP_K, search_params)  # warm-up
+            latencies_ms, elapsed_s, errors = run_closed_loop(search_fn, concurrency, num_requests=num_requests)
+            found = [row for seq in sample for row in results.get(seq, [[]] * nq)]
+            summary = summarize_latencies(latencies_ms, elapsed_s, errors)
+            summary["recall_at_k"] = recall_at_k(found, gt, gt.shape[1]) if gt.shape[1] else None
+            return summary
+        
+        sampled = set(sample.tolist())
+        modes = [("none", None)] + [(kind, CachedSearch(
+            ExactCache(int(cache_mb * 2**20), quant_step) if kind == "exact"
+            else SemanticCache(int(cache_mb * 2**20), threshold), backend)) for kind in caches]
+        
+        print(f"  {'cache':<9} {'hit rate':>8} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>9} "
+              f"{'recall':>7} {'saved s':>8} {'memory':>9}")
+        logs, baseline = [], None
+        for kind, cached in modes:
+            summary = run(cached or backend)
+            log = {
+                "timestamp": datetime.now().isoformat(),
+                "mode": "real" if self.use_real else "mock",
+                "workload": "cache",
+                "index_type": index_type,
+                "index_params": index_params,
+                "search_params": search_params,
+                "label": label,
+                "cache": kind,
+                "concurrency": concurrency,
+                "top_k": TOP_K,
+                "num_queries": nq,
+                "dim": self.dim,
+                "zipf": zipf,
+                "near_dup": near_dup,
+                "noise": noise
+            }
+            log.update(summary)
+            if cached is None:
+                baseline = summary
+            else:
+                log.update(cached.stats())
+                log["cache_params"] = {"max_mb": cache_mb, "quant_step": quant_step} if kind == "exact" \
+                    else {"max_mb": cache_mb, "threshold": threshold}
+                log["recall_loss"] = (baseline["recall_at_k"] - summary["recall_at_k"]
+                                      if baseline["recall_at_k"] is not None else None)
+                # Whole-stream speedup, to set against a projected accelerator speedup
+                log["mean_latency_speedup"] = baseline["latency_ms"] / summary["latency_ms"] \
+                    if summary["latency_ms"] else None
+            print(f"  {kind:<9} {log.get('hit_rate', 0):>8.1%} {summary['latency_ms']:>8.2f} "
+                  f"{summary['p50_ms']:>8.2f} {summary['p99_ms']:>8.2f} {summary['qps']:>9.1f} "
+                  f"{summary['recall_at_k'] or 0:>7.4f} {log.get('estimated_saved_ms', 0) / 1000:>8.2f} "
+                  f"{log.get('peak_memory_bytes', 0) / 2**20:>7.2f}MB")
+            logs.append(log)
+        
+        for log in logs[1:]:
+            print(f"  {log['cache']}: x{log['mean_latency_speedup']:.2f} mean latency, "
+                  f"recall loss {log['recall_loss'] or 0:+.4f}, {log['evictions']} evictions")
+        return logs
+    
+    def _write_ops(self, search_params):
+        """insert / upsert / delete / compact / probe calls against Milvus or the local engine"""
+        if self.use_real:
+            def columns(ids, vectors):
+                scalars = scalar_columns(int(ids[0]), len(ids), DATA_SEED)
+                return [ids.tolist(), vectors.tolist(), scalars["category"].tolist(),
+                        scalars["timestamp"].tolist(), scalars["tag"].tolist()]
+            
+            def compact():
+                self.collection.compact()
+                self.collection.wait_for_compaction_completed()
+            
+            def nearest(vector):
+                results = self.collection.search(data=[vector.tolist()], anns_field="vector",
+                                                 param=search_params, limit=1)
+                return results[0].ids[0] if len(results[0]) else None
+            
+            return {
+                "insert": lambda ids, vectors: self.collection.insert(columns(ids, vectors)),
+                "upsert": lambda ids, vectors: self.collection.upsert(columns(ids, vectors)),
+                "delete": lambda ids: self.collection.delete(f"id in {ids.tolist()}"),
+                "compact": compact,
+                "nearest": nearest,
+            }
+        
+        scalars = lambda ids: scalar_columns(int(ids[0]), len(ids), DATA_SEED)
+        return {
+            "insert": lambda ids, vectors: self.engine.insert(ids, vectors, scalars(ids)),
+            "upsert": lambda ids, vectors: self.engine.upsert(ids, vectors, scalars(ids)),
+            "delete": self.engine.delete,
+            "compact": self.engine.compact,
+            "nearest": lambda vector: int(self.engine.search(vector[None, :], 1, search_params)[0][0, 0]),
+        }
+    
+    def run_mixed_test(self, index_type, index_params, search_params, label, concurrency=4,
+                       duration_s=10.0, insert_rate=1000, upsert_rate=0, delete_rate=0,
+                       write_batch=100, compact_every_s=None, nq=10, build=True):
+        """
+        Search under concurrent writes: a read-only baseline, then the same
+        closed loop with insert / upsert / delete streams (vectors/s), optional
+        periodic compaction and a freshness probe. Written rows are reverted
+        afterwards so later cases see the original dataset.
+        """
+        print(f"\n{'='*60}")
+        print(f"Mixed read/write: {label} ({index_type}) c={concurrency} "
+              f"insert={insert_rate}/s upsert={upsert_rate}/s delete={delete_rate}/s")
+        print(f"{'='*60}")
+        
+        search_fn = self._load_search_fn(index_type, index_params, search_params, nq, build,
+                                         workload="mixed", label=label)
+        latencies_ms, elapsed_s, errors = run_closed_loop(search_fn, concurrency, duration_s=duration_s)
+        baseline = summarize_latencies(latencies_ms, elapsed_s, errors)
+        
+        n = len(self.dataset)
+        base = self.dataset.base
+        ops = self._write_ops(search_params)
+        id_lock = threading.Lock()
+        next_id = [n]
+        touched = []  # (start, count) blocks of original rows that were upserted or deleted
+        
+        def new_ids(count):
+            with id_lock:
+                start = next_id[0]
+                next_id[0] += count
+            return np.arange(start, start + count, dtype=np.int64)
+        
+        def vectors_for(ids, seq):
+            # Near an existing row, so new data lands inside the indexed distribution
+            noise = np.random.default_rng(seq).normal(0, 0.01, (len(ids), self.dim))
+            return (np.asarray(base[ids % n], dtype=np.float32) + noise).astype(np.float32)
+        
+        def insert(seq):
+            ids = new_ids(write_batch)
+            ops["insert"](ids, vectors_for(ids, seq))
+            return len(ids)
+        
+        def upsert(seq):
+            start = seq * write_batch * 7919 % max(1, n - write_batch)
+            ids = np.arange(start, start + min(write_batch, n), dtype=np.int64)
+            touched.append((start, len(ids)))
+            ops["upsert"](ids, vectors_for(ids, seq + (1 << 32)))
+            return len(ids)
+        
+        def delete(seq):
+            # Walk down from the end of the dataset, away from the upsert hot spots
+            start = n - (seq + 1) * write_batch
+            if start < 0:
+                return 0
+            touched.append((start, write_batch))
+            ops["delete"](np.arange(start, start + write_batch, dtype=np.int64))
+            return write_batch
+        
+        probes = {}
+        
+        def insert_probe(seq):
+            ids = new_ids(1)
+            probes[int(ids[0])] = vector = vectors_for(ids, seq + (2 << 32))[0]
+            ops["insert"](ids, vector[None, :])
+            return int(ids[0])
+        
+        def compact():
+            return ops["compact"]()
+        
+        summary, timeline, writes, freshness, compactions = run_mixed(
+            search_fn, concurrency, duration_s,
+            {"insert": (insert, insert_rate), "upsert": (upsert, upsert_rate), "delete": (delete, delete_rate)},
+            write_batch, compact=compact if compact_every_s else None, compact_every_s=compact_every_s,
+            insert_probe=insert_probe, visible=lambda pid: ops["nearest"](probes[pid]) == pid
+        )
+        
+        # Revert: drop everything inserted, restore the original rows that were touched
+        if self.use_real:
+            self.collection.delete(f"id >= {n}")
+        else:
+            ops["delete"](np.arange(n, next_id[0], dtype=np.int64))
+        for start, count in set(touched):
+            ids = np.arange(start, start + count, dtype=np.int64)
+            ops["upsert"](ids, np.asarray(base[start:start + count], dtype=np.float32))
+        if self.use_real:
+            self.collection.flush()
+        ops["compact"]()
+        
+        degradation = summary["p99_ms"] / baseline["p99_ms"] if baseline["p99_ms"] else None
+        print(f"  read-only   QPS={baseline['qps']:>9.1f}  p50={baseline['p50_ms']:.2f}  "
+              f"p99={baseline['p99_ms']:.2f}  p99.9={baseline['p999_ms']:.2f} ms")
+        print(f"  with writes QPS={summary['qps']:>9.1f}  p50={summary['p50_ms']:.2f}  "
+              f"p99={summary['p99_ms']:.2f}  p99.9={summary['p999_ms']:.2f} ms"
+              + (f"  (p99 x{degradation:.2f})" if degradation else ""))
+        for kind, w in writes.items():
+            if w["ops"] or w["errors"]:
+                print(f"  {kind:<7} {w['vectors_per_s']:>9,.0f} vectors/s  {w['ops']} calls  "
+                      f"p50={w['p50_ms'] or 0:.2f}  p99={w['p99_ms'] or 0:.2f} ms"
+                      + (f"  errors={w['errors']}" if w["errors"] else ""))
+        if freshness["probes"]:
+            print(f"  freshness  p50={freshness['p50_ms']:.1f}  p99={freshness['p99_ms']:.1f}  "
+                  f"max={freshness['max_ms']:.1f} ms over {freshness['probes']} probes"
+                  + (f"  ({freshness['timeouts']} never visible)" if freshness["timeouts"] else ""))
+        for run in compactions:
+            print(f"  compaction at {run['at_s']:.1f}s took {run['duration_ms']:.0f} ms")
+        
+        log = {
+            "timestamp": datetime.now().isoformat(),
+            "mode": "real" if self.use_real else "mock",
+            "workload": "mixed",
+            "index_type": index_type,
+            "index_params": index_params,
+            "search_params": search_params,
+            "label": label,
+            "concurrency": concurrency,
+            "num_queries": nq,
+            "dim": self.dim,
+            "insert_rate": insert_rate,
+            "upsert_rate": upsert_rate,
+            "delete_rate": delete_rate,
+            "write_batch": write_batch,
+            "compact_every_s": compact_every_s,
+            "baseline": {key: baseline[key] for key in ("qps", "p50_ms", "p90_ms", "p99_ms", "p999_ms")},
+            "p99_degradation": degradation,
+            "writes": writes,
+            "freshness": freshness,
+            "compactions": compactions,
+            "timeline": timeline
+        }
+        log.update(summary)
+        return [log]
+    
+    def save_log(self, log):
+        """Append one record to the log file right away so a crash keeps finished results"""
+        log.setdefault("run_id", self.run_id)
+        if "index_type" in log:
+            log.setdefault("metric", self.metric)
+        build = self.index_build
+        if (build and log.get("workload") != "index_build" and log.get("index_type") == build["index_type"]
+                and log.get("index_params") == build["index_params"]):
+            for field in BUILD_FIELDS:
+                log.setdefault(field, build[field])
+        if self.tag:
+            log.setdefault("tag", self.tag)
+        self.logs.append(log)
+        self.requests.flush()
+        if self.engine is not None:
+            self.engine.flush_hooks()
         os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
         with open(LOG_FILE, 'a') as f:
-            for log in self.logs:
-                f.write(json.dumps(log) + '\n')
-        print(f"\n📝 Logs saved to: {LOG_FILE}")
+            f.write(json.dumps(log) + '\n')
+            f.flush()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="DBPU Acceleration Lab workload generator")
+    parser.add_argument("--tag", default=None,
+                        help="label stored with every record of this run (e.g. baseline, build name)")
+    parser.add_argument("--spec", default=DEFAULT_SPEC,
+                        help="JSON test-matrix spec (see workloads/specs/)")
+    parser.add_argument("--workload",
+                        choices=["single", "closed-loop", "open-loop", "batch-sweep", "multi-process", "filtered", "mixed",
+                                 "replay", "cache"],
+                        default="single",
+                        help="single: one timed batch per index; closed-loop: concurrent clients; "
+                             "open-loop: fixed-rate arrivals swept to saturation; "
+                             "batch-sweep: latency/throughput over nq and top_k; "
+                             "multi-process: closed-loop clients spread over --processes processes; "
+                             "filtered: scalar-filtered search over a selectivity sweep; "
+                             "mixed: closed-loop search alongside insert/upsert/delete streams; "
+                             "replay: issue a recorded query trace (--trace) on its original schedule; "
+                             "cache: a skewed query stream uncached vs. through client-side caches")
+    parser.add_argument("--concurrency", default="1,4,16",
+                        help="comma-separated client counts for closed-loop runs (per process for multi-process)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="load-generator processes for multi-process runs")
+    parser.add_argument("--merge", choices=["sketch", "samples"], default="sketch",
+                        help="multi-process: merge per-process sketches (bounded) or raw samples (exact)")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="seconds per concurrency level (closed-loop) or per rate (open-loop)")
+    parser.add_argument("--requests", type=int, default=None,
+                        help="total requests per concurrency level instead of --duration")
+    parser.add_argument("--rates", default=None,
+                        help="comma-separated offered QPS for open-loop (default: double until saturated)")
+    parser.add_argument("--arrival", choices=["constant", "poisson"], default="constant",
+                        help="open-loop inter-arrival distribution")
+    parser.add_argument("--dataset", default="random",
+                        help="'random' (uniform), 'clustered' (Gaussian mixture; both seeded and cached "
+                             "under $DBPU_DATASET_DIR) or a path to .npy/.fvecs/.bvecs or a SIFT/GIST-style directory")
+    parser.add_argument("--num-vectors", type=int, default=None,
+                        help=f"vectors to ingest (generated default {NUM_VECTORS}; caps file datasets)")
+    parser.add_argument("--metric", choices=["L2", "IP", "COSINE"], default="L2",
+                        help="distance metric for every index and for ground truth")
+    parser.add_argument("--normalize", action="store_true",
+                        help="L2-normalize generated vectors (for IP / COSINE runs)")
+    parser.add_argument("--clusters", type=int, default=256,
+                        help="clustered: number of mixture components")
+    parser.add_argument("--intrinsic-dim", type=int, default=16,
+                        help="clustered: dimensionality each cluster spreads along")
+    parser.add_argument("--cluster-std", type=float, default=2.0,
+                        help="clustered: spread along the intrinsic dimensions (centers are ~N(0, 1))")
+    parser.add_argument("--query-zipf", type=float, default=1.1,
+                        help="clustered: Zipf exponent of query popularity over clusters (0 = uniform)")
+    parser.add_argument("--ingest-batch", type=int, default=INGEST_BATCH_SIZE,
+                        help="vectors per insert call")
+    parser.add_argument("--ingest-workers", type=int, default=INGEST_WORKERS,
+                        help="parallel insert workers")
+    parser.add_argument("--nq", type=int, default=10, help="query vectors per search request")
+    parser.add_argument("--target-pids", default=os.getenv(TARGET_PIDS_ENV),
+                        help="processes to sample besides the client, e.g. milvus=1234,etcd=99")
+    parser.add_argument("--sample-interval", type=float, default=SAMPLE_INTERVAL_S,
+                        help="resource sampling interval in seconds (0 disables the sampler)")
+    parser.add_argument("--nq-values", default=None,
+                        help="comma-separated nq for batch-sweep (default 1,2,4,...,4096)")
+    parser.add_argument("--topk-values", default=None,
+                        help="comma-separated top_k for batch-sweep (default 1,10,100,1000)")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="timed searches per batch-sweep or filtered point")
+    parser.add_argument("--filter-field", choices=["category", "timestamp", "tag"], default="category",
+                        help="scalar field the filtered workload filters on")
+    parser.add_argument("--selectivities", default=None,
+                        help="comma-separated fractions of rows passing the filter "
+                             "(default 0.001,0.01,0.05,0.1,0.25,0.5,0.9)")
+    parser.add_argument("--insert-rate", type=float, default=1000,
+                        help="mixed: inserted vectors/s")
+    parser.add_argument("--upsert-rate", type=float, default=0,
+                        help="mixed: upserted vectors/s")
+    parser.add_argument("--delete-rate", type=float, default=0,
+                        help="mixed: deleted vectors/s")
+    parser.add_argument("--write-batch", type=int, default=100,
+                        help="mixed: vectors per insert/upsert/delete call")
+    parser.add_argument("--compact-every", type=float, default=None,
+                        help="mixed: seconds between compactions (default: none)")
+    parser.add_argument("--trace", default=None,
+                        help="replay: trace file (create one with workloads/query_trace.py)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay: time scale (2 = twice the recorded rate)")
+    parser.add_argument("--senders", type=int, default=64,
+                        help="replay: concurrent sender threads")
+    parser.add_argument("--trace-params", choices=["trace", "spec"], default="trace",
+                        help="replay: use each request's recorded search params or the spec's")
+    parser.add_argument("--cache", default="exact,semantic",
+                        help="cache: comma-separated cache kinds to compare against no cache")
+    parser.add_argument("--cache-mb", type=float, default=16.0,
+                        help="cache: memory budget per cache")
+    parser.add_argument("--cache-threshold", type=float, default=0.99,
+                        help="cache: cosine similarity a semantic hit needs")
+    parser.add_argument("--cache-quant", type=float, default=1e-4,
+                        help="cache: quantization step of exact-cache keys")
+    parser.add_argument("--query-skew", type=float, default=1.1,
+                        help="cache: Zipf exponent of query popularity")
+    parser.add_argument("--near-dup", type=float, default=0.3,
+                        help="cache: fraction of requests perturbed into near-duplicates")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    if args.workload == "replay" and not args.trace:
+        sys.exit("--workload replay needs --trace FILE")
+    
+    runner = WorkloadRunner(tag=args.tag, metric=args.metric)
+    runner.start_sampler(parse_targets(args.target_pids), args.sample_interval)
     print("🚀 DBPU Acceleration Lab - Smart Workload Generator")
     print(f"   Mode: {'REAL' if MILVUS_AVAILABLE else 'MOCK'}")
+    print(f"   Run ID: {runner.run_id}" + (f" (tag: {args.tag})" if args.tag else ""))
     print()
     
-    runner = WorkloadRunner()
-    runner.setup_collection()
+    if args.dataset == "random":
+        dataset = random_dataset(args.num_vectors or NUM_VECTORS, DIM, seed=DATA_SEED, query_seed=QUERY_SEED,
+                                 normalize=args.normalize)
+    elif args.dataset == "clustered":
+        dataset = clustered_dataset(args.num_vectors or NUM_VECTORS, DIM, seed=DATA_SEED, query_seed=QUERY_SEED,
+                                    num_clusters=args.clusters, intrinsic_dim=args.intrinsic_dim,
+                                    cluster_std=args.cluster_std, query_zipf=args.query_zipf,
+                                    normalize=args.normalize)
+    else:
+        dataset = file_dataset(args.dataset, limit=args.num_vectors)
+    print(f"📦 Dataset: {dataset.name} ({len(dataset)} x {dataset.dim}), metric {args.metric}")
+    runner.record_run_info(dataset, args.spec)
+    runner.setup_collection(dataset, args.ingest_batch, args.ingest_workers)
     
-    # Test suite
-    test_cases = [
-        ("HNSW", {"M": 16, "efConstruction": 200}, {"ef": 64}, "HNSW_Normal"),
-        ("IVF_FLAT", {"nlist": 128}, {"nprobe": 10}, "IVF_Normal"),
-        ("FLAT", {}, {}, "Flat_Scan"),
-    ]
+    cases = load_spec(args.spec)
+    groups = group_by_index(cases)
+    print(f"📋 Spec: {args.spec} ({len(cases)} cases, {len(groups)} index builds)")
     
-    for index_type, index_params, search_params, label in test_cases:
-        log = runner.run_search_test(index_type, index_params, search_params, label)
-        runner.logs.append(log)
+    for index_type, index_params, group in groups:
+        for i, (_, _, search_params, label) in enumerate(group):
+            # Build + load once per (index_type, index_params); later variants reuse it
+            build = i == 0
+            if args.workload == "closed-loop":
+                concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+                duration_s = None if args.requests else args.duration
+                logs = runner.run_closed_loop_test(
+                    index_type, index_params, search_params, label,
+                    concurrency_levels=concurrency_levels, duration_s=duration_s,
+                    num_requests=args.requests, nq=args.nq, build=build
+                )
+            elif args.workload == "open-loop":
+                rates = [float(r) for r in args.rates.split(",")] if args.rates else None
+                logs = runner.run_open_loop_test(
+                    index_type, index_params, search_params, label,
+                    rates=rates, duration_s=args.duration, arrival=args.arrival,
+                    nq=args.nq, build=build
+                )
+            elif args.workload == "multi-process":
+                logs = runner.run_multiprocess_test(
+                    index_type, index_params, search_params, label, processes=args.processes,
+                    concurrency_levels=[int(c) for c in args.concurrency.split(",")],
+                    duration_s=None if args.requests else args.duration,
+                    num_requests=args.requests, nq=args.nq, merge=args.merge, build=build
+                )
+            elif args.workload == "filtered":
+                logs = runner.run_filtered_test(
+                    index_type, index_params, search_params, label, field=args.filter_field,
+                    selectivities=[float(x) for x in args.selectivities.split(",")] if args.selectivities else None,
+                    repeats=args.repeats, nq=args.nq, build=build
+                )
+            elif args.workload == "mixed":
+                logs = runner.run_mixed_test(
+                    index_type, index_params, search_params, label,
+                    concurrency=int(args.concurrency.split(",")[-1]), duration_s=args.duration,
+                    insert_rate=args.insert_rate, upsert_rate=args.upsert_rate, delete_rate=args.delete_rate,
+                    write_batch=args.write_batch, compact_every_s=args.compact_every, nq=args.nq, build=build
+                )
+            elif args.workload == "replay":
+                logs = runner.run_replay_test(
+                    index_type, index_params, search_params, label, args.trace, speed=args.speed,
+                    senders=args.senders, params_from=args.trace_params, limit=args.requests, build=build
+                )
+            elif args.workload == "cache":
+                logs = runner.run_cache_test(
+                    index_type, index_params, search_params, label, caches=args.cache.split(","),
+                    cache_mb=args.cache_mb, threshold=args.cache_threshold, quant_step=args.cache_quant,
+                    num_requests=args.requests or 5000, concurrency=int(args.concurrency.split(",")[-1]),
+                    nq=args.nq, zipf=args.query_skew, near_dup=args.near_dup,
+                    build=build
+                )
+            elif args.workload == "batch-sweep":
+                logs = runner.run_batch_sweep_test(
+                    index_type, index_params, search_params, label,
+                    nq_values=[int(n) for n in args.nq_values.split(",")] if args.nq_values else None,
+                    top_k_values=[int(k) for k in args.topk_values.split(",")] if args.topk_values else None,
+                    repeats=args.repeats, build=build
+                )
+            else:
+                logs = [runner.run_search_test(index_type, index_params, search_params, label, build)]
+            
+            for log in logs:
+                runner.save_log(log)
+    runner.stop_sampler()
     
-    runner.save_logs()
+    print(f"\n📝 Logs saved to: {LOG_FILE}")
     
     print("\n" + "="*60)
     print("✅ All tests finished!")
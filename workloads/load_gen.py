@@ -0,0 +1,247 @@
+"""
+DBPU Acceleration Lab - Load Generation Primitives
+Closed-loop client pools, open-loop schedulers and latency summaries
+used by WorkloadRunner
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from latency_sketch import LatencySketch
+
+PERCENTILES = [("p50_ms", 50), ("p90_ms", 90), ("p99_ms", 99), ("p999_ms", 99.9)]
+KNEE_P99_FACTOR = 2.0         # p99 over this multiple of the lowest-load p99 is past the knee...
+KNEE_THROUGHPUT_RATIO = 0.95  # ...and so is achieved QPS below this fraction of the scheduled rate
+
+
+def summarize_latencies(latencies_ms, elapsed_s, errors=0):
+    """
+    Reduce per-request latencies to QPS and tail percentiles.
+
+    Percentiles are exact for this run; the mergeable sketch is logged too
+    so several runs or load-generator nodes can be combined later.
+    """
+    latencies_ms = np.asarray(latencies_ms, dtype=np.float64)
+    sketch = LatencySketch()
+    sketch.add_many(latencies_ms)
+    summary = {
+        "num_requests": int(latencies_ms.size),
+        "errors": errors,
+        "elapsed_s": elapsed_s,
+        "qps": latencies_ms.size / elapsed_s if elapsed_s > 0 else 0.0,
+        "latency_sketch": sketch.to_dict(),
+    }
+    if latencies_ms.size == 0:
+        summary["latency_ms"] = 0.0
+        summary.update({key: 0.0 for key, _ in PERCENTILES})
+        summary["max_ms"] = 0.0
+        return summary
+
+    values = np.percentile(latencies_ms, [q for _, q in PERCENTILES])
+    summary["latency_ms"] = float(latencies_ms.mean())
+    summary.update({key: float(v) for (key, _), v in zip(PERCENTILES, values)})
+    summary["max_ms"] = float(latencies_ms.max())
+    return summary
+
+
+def summarize_sketch(sketch, elapsed_s, errors=0):
+    """Same fields as summarize_latencies, from a (merged) sketch instead of raw samples"""
+    summary = {
+        "num_requests": sketch.count,
+        "errors": errors,
+        "elapsed_s": elapsed_s,
+        "qps": sketch.count / elapsed_s if elapsed_s > 0 else 0.0,
+        "latency_sketch": sketch.to_dict(),
+        "latency_ms": sketch.mean,
+    }
+    summary.update({key: sketch.quantile(q / 100) for key, q in PERCENTILES})
+    summary["max_ms"] = sketch.max if sketch.count else 0.0
+    return summary
+
+
+def run_closed_loop(search_fn, concurrency, duration_s=None, num_requests=None):
+    """
+    Run `concurrency` clients that each issue back-to-back requests.
+
+    search_fn(seq) is called with a global request sequence number and must
+    block until the response arrives. The run stops after `duration_s`
+    seconds or `num_requests` total requests, whichever is given first.
+    Returns (latencies_ms, elapsed_s, errors).
+    """
+    if duration_s is None and num_requests is None:
+        raise ValueError("closed-loop run needs duration_s or num_requests")
+
+    sequence = itertools.count()
+    per_client = [[] for _ in range(concurrency)]
+    error_count = [0] * concurrency
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [None]
+
+    def client(client_id):
+        latencies = per_client[client_id]
+        start_barrier.wait()
+        while True:
+            if deadline[0] is not None and time.perf_counter() >= deadline[0]:
+                break
+            seq = next(sequence)
+            if num_requests is not None and seq >= num_requests:
+                break
+            t0 = time.perf_counter()
+            try:
+                search_fn(seq)
+            except Exception:
+                error_count[client_id] += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(client, i) for i in range(concurrency)]
+        start = time.perf_counter()
+        if duration_s is not None:
+            deadline[0] = start + duration_s
+        start_barrier.wait()
+        for future in futures:
+            future.result()
+        elapsed_s = time.perf_counter() - start
+
+    latencies_ms = np.concatenate([np.asarray(l, dtype=np.float64) for l in per_client])
+    return latencies_ms, elapsed_s, sum(error_count)
+
+
+def arrival_offsets(rate_qps, duration_s, arrival="constant", seed=None):
+    """Intended send times (seconds from start) for an open-loop run"""
+    if arrival == "constant":
+        return np.arange(0.0, duration_s, 1.0 / rate_qps)
+    if arrival == "poisson":
+        rng = np.random.default_rng(seed)
+        # Draw a little more than needed, then trim to the window
+        n = int(rate_qps * duration_s * 1.2) + 16
+        offsets = np.cumsum(rng.exponential(1.0 / rate_qps, size=n))
+        while offsets[-1] < duration_s:
+            more = np.cumsum(rng.exponential(1.0 / rate_qps, size=n)) + offsets[-1]
+            offsets = np.concatenate([offsets, more])
+        return offsets[offsets < duration_s]
+    raise ValueError(f"unknown arrival process: {arrival}")
+
+
+def run_open_loop(search_fn, rate_qps, duration_s, arrival="constant",
+                  max_workers=256, seed=None):
+    """
+    Issue requests on a fixed schedule regardless of response times.
+
+    Latency is measured from each request's intended send time, not from
+    when a worker actually picked it up, so a backlog behind slow responses
+    shows up in the tail (coordinated-omission correction). Service time
+    (actual start to completion) is returned alongside for comparison.
+    Returns (latencies_ms, service_ms, elapsed_s, errors, scheduled).
+    """
+    offsets = arrival_offsets(rate_qps, duration_s, arrival, seed)
+    latencies_ms, service_ms, elapsed_s, errors = run_schedule(search_fn, offsets, max_workers)
+    return latencies_ms, service_ms, max(elapsed_s, duration_s), errors, offsets.size
+
+
+def run_schedule(search_fn, offsets, max_workers=256):
+    """
+    Call search_fn(i) at start + offsets[i] seconds from a pool of senders.
+
+    Shared by run_open_loop and trace replay; latencies are taken from the
+    intended send time (see run_open_loop). Returns (latencies_ms,
+    service_ms, elapsed_s, errors), where elapsed_s runs to the last
+    completion.
+    """
+    offsets = np.asarray(offsets, dtype=np.float64)
+    latencies = np.full(offsets.size, np.nan)
+    service = np.full(offsets.size, np.nan)
+    errors = [0]
+    errors_lock = threading.Lock()
+    last_done = [0.0]
+
+    def issue(i, intended):
+        t0 = time.perf_counter()
+        try:
+            search_fn(i)
+        except Exception:
+            with errors_lock:
+                errors[0] += 1
+            return
+        done = time.perf_counter()
+        latencies[i] = (done - intended) * 1000
+        service[i] = (done - t0) * 1000
+        if done > last_done[0]:
+            last_done[0] = done
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        start = time.perf_counter()
+        for i, offset in enumerate(offsets):
+            intended = start + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(issue, i, intended)
+
+    elapsed_s = max(last_done[0] - start, 0.0)
+    ok = ~np.isnan(latencies)
+    return latencies[ok], service[ok], elapsed_s, errors[0]
+
+
+def _past_knee(point, base_p99, p99_factor, throughput_ratio):
+    saturated = point["qps"] < throughput_ratio * point["scheduled_qps"]
+    return saturated or point["p99_ms"] > p99_factor * base_p99
+
+
+def find_knee(points, p99_factor=KNEE_P99_FACTOR, throughput_ratio=KNEE_THROUGHPUT_RATIO):
+    """
+    Index of the last sustainable point on a latency-vs-throughput curve.
+
+    A point is past the knee once achieved QPS falls below
+    `throughput_ratio` of the scheduled arrival rate, or its p99 exceeds `p99_factor`
+    times the p99 at the lowest offered load. Returns None when no point
+    is past the knee (the sweep stopped before saturation, so its highest
+    rate is only a lower bound) or when the first point already is.
+    """
+    if not points:
+        return None
+    base_p99 = points[0]["p99_ms"]
+    for i, point in enumerate(points):
+        if _past_knee(point, base_p99, p99_factor, throughput_ratio):
+            return i - 1 if i > 0 else None
+    return None
+
+
+def sweep_offered_load(search_fn, rates=None, duration_s=10.0, arrival="constant",
+                       start_rate=10.0, max_steps=12, max_workers=256):
+    """
+    Run open-loop steps at increasing offered rates and mark the knee.
+
+    With explicit `rates` every rate is run. Otherwise the rate starts at
+    `start_rate` and doubles until the system saturates (achieved QPS falls
+    below 90% of the scheduled rate) or `max_steps` is reached.
+    """
+    points = []
+    auto = rates is None
+    rates = list(rates) if rates else [start_rate * 2 ** i for i in range(max_steps)]
+
+    for rate in rates:
+        latencies_ms, service_ms, elapsed_s, errors, scheduled = run_open_loop(
+            search_fn, rate, duration_s, arrival=arrival, max_workers=max_workers
+        )
+        point = summarize_latencies(latencies_ms, elapsed_s, errors)
+        point["offered_qps"] = rate
+        point["scheduled_qps"] = scheduled / duration_s
+        point["arrival"] = arrival
+        point["service_p99_ms"] = float(np.percentile(service_ms, 99)) if service_ms.size else 0.0
+        points.append(point)
+        if auto and point["qps"] < 0.9 * point["scheduled_qps"]:
+            break
+
+    knee = find_knee(points)
+    # knee_reached=False: every rate was sustained, so there is no knee to report
+    reached = bool(points) and any(
+        _past_knee(p, points[0]["p99_ms"], KNEE_P99_FACTOR, KNEE_THROUGHPUT_RATIO) for p in points)
+    for i, point in enumerate(points):
+        point["knee"] = i == knee
+        point["knee_reached"] = reached
+    return points
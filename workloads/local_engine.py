@@ -0,0 +1,549 @@
+"""
+DBPU Acceleration Lab - In-Process Search Engine
+NumPy FLAT / IVF_FLAT / graph (HNSW-style) indexes used in MOCK mode, so
+latency, recall and the scan_codes split come from real computation
+"""
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from ground_truth import exact_topk
+from filters import compile_expr
+from request_log import JsonlBuffer
+
+SCAN_BLOCK = 65536
+# Like knowhere: when fewer rows than this pass the filter, graph search
+# falls back to brute force over the passing rows
+GRAPH_BRUTE_FORCE_BELOW = 0.07
+MASK_CACHE_SIZE = 32
+# Graph build: candidates per node handed to the neighbour-selection heuristic, in units of M
+GRAPH_CANDIDATES_PER_LINK = 3
+SELECT_BLOCK = 1024
+HOOK_FLUSH_EVERY = 10000  # hook records held in memory before a background write
+
+
+def _scores(queries, block, block_sqnorms, metric):
+    """Smaller-is-better distances between every query and every block row"""
+    dots = queries @ block.T
+    if metric == "L2":
+        return block_sqnorms[None, :] - 2.0 * dots
+    return -dots  # IP / COSINE (COSINE data is normalized at build time)
+
+
+def _to_distances(queries, scores, metric):
+    """Smaller-is-better scores -> Milvus distances (squared L2, or similarity for IP / COSINE)"""
+    if metric == "L2":
+        return scores + np.einsum("ij,ij->i", queries, queries)[:, None]
+    return -scores
+
+
+def _topk_rows(scores, k):
+    """Per-row indices of the k smallest scores, sorted"""
+    k = min(k, scores.shape[1])
+    part = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    rows = np.arange(scores.shape[0])[:, None]
+    order = np.argsort(scores[rows, part], axis=1)
+    return part[rows, order]
+
+
+def kmeans(data, k, iters=10, sample=None, seed=0):
+    """Lloyd's k-means on a sample of `data`; returns (k, dim) centroids"""
+    rng = np.random.default_rng(seed)
+    sample = sample or min(len(data), k * 64)
+    train = data[rng.choice(len(data), size=sample, replace=False)] if sample < len(data) else data
+    centroids = train[rng.choice(len(train), size=k, replace=False)].copy()
+    train_sq = np.einsum("ij,ij->i", train, train)
+
+    for _ in range(iters):
+        c_sq = np.einsum("ij,ij->i", centroids, centroids)
+        assign = np.argmin(c_sq[None, :] - 2.0 * (train @ centroids.T) + train_sq[:, None], axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, train)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        # Re-seed empty clusters from random training points
+        empty = np.flatnonzero(~nonempty)
+        if empty.size:
+            centroids[empty] = train[rng.choice(len(train), size=empty.size, replace=False)]
+    return centroids.astype(np.float32)
+
+
+def assign_blocks(data, centroids, block=SCAN_BLOCK):
+    """Nearest-centroid assignment for every row, computed block by block"""
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), block):
+        chunk = data[start:start + block]
+        out[start:start + block] = np.argmin(c_sq[None, :] - 2.0 * (chunk @ centroids.T), axis=1)
+    return out
+
+
+class FlatIndex:
+    """Exhaustive scan; block fetches and distance computation count as scan time, top-k selection does not"""
+
+    def __init__(self, data, metric):
+        self.data = data
+        self.metric = metric
+
+    def search(self, queries, k, params, allowed=None):
+        timing = {}
+        if allowed is None:
+            blocks = ((s, self.data[s:s + SCAN_BLOCK]) for s in range(0, len(self.data), SCAN_BLOCK))
+            ids, dists = exact_topk(queries, blocks, k, self.metric, timing)
+        else:
+            # Pre-filtered scan: only rows passing the bitset are gathered and compared
+            rows = np.flatnonzero(allowed)
+            blocks = ((s, self.data[rows[s:s + SCAN_BLOCK]]) for s in range(0, len(rows), SCAN_BLOCK))
+            ids, dists = exact_topk(queries, blocks, k, self.metric, timing)
+            ids = rows[ids]
+            if ids.shape[1] < k:  # fewer than k rows pass the filter
+                pad = k - ids.shape[1]
+                ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+                dists = np.pad(dists, ((0, 0), (0, pad)), constant_values=np.inf)
+        return ids, dists, timing["scan_s"]
+
+
+class IVFIndex:
+    """k-means coarse quantizer plus contiguous inverted lists"""
+
+    def __init__(self, data, metric, nlist=128):
+        self.metric = metric
+        self.nlist = min(nlist, len(data))
+        self.centroids = kmeans(data, self.nlist)
+        assign = assign_blocks(data, self.centroids)
+        order = np.argsort(assign, kind="stable")
+        # Store list members contiguously so a probe is a single slice
+        self.ids = order.astype(np.int64)
+        self.vectors = data[order]
+        self.sqnorms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.nlist))])
+
+    def search(self, queries, k, params, allowed=None):
+        nprobe = min(params.get("nprobe", 8), self.nlist)
+        probes = _topk_rows(_scores(queries, self.centroids,
+                                    np.einsum("ij,ij->i", self.centroids, self.centroids),
+                                    self.metric), nprobe)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        dists = np.full((len(queries), k), np.inf, dtype=np.float32)
+        scan_s = 0.0
+
+        for qi, query in enumerate(queries):
+            slices = [slice(self.offsets[c], self.offsets[c + 1]) for c in probes[qi]]
+            t0 = time.perf_counter()
+            cand_ids = np.concatenate([self.ids[s] for s in slices])
+            cand = np.concatenate([self.vectors[s] for s in slices])
+            cand_sq = np.concatenate([self.sqnorms[s] for s in slices])
+            if allowed is not None:
+                keep = allowed[cand_ids]
+                cand_ids, cand, cand_sq = cand_ids[keep], cand[keep], cand_sq[keep]
+            scores = _scores(query[None, :], cand, cand_sq, self.metric)
+            scan_s += time.perf_counter() - t0
+            if scores.shape[1] == 0:
+                continue
+            best = _topk_rows(scores, k)[0]
+            ids[qi, :len(best)] = cand_ids[best]
+            dists[qi, :len(best)] = scores[0, best]
+        return ids, _to_distances(queries, dists, self.metric), scan_s
+
+
+def select_neighbors(data, sqnorms, nodes, pool, M, metric):
+    """
+    HNSW's neighbour-selection heuristic, vectorized over a block of nodes.
+
+    `pool` holds each node's candidates sorted nearest first. A candidate is
+    kept only if it is closer to the node than to every neighbour kept so
+    far, so links also reach into adjacent clusters instead of all M going
+    to one tight cluster (which leaves clustered data as unreachable
+    islands). Free slots are filled with the nearest pruned candidates.
+    """
+    vecs = data[pool]
+    between = np.einsum("bcd,bed->bce", vecs, vecs)
+    to_node = np.einsum("bcd,bd->bc", vecs, data[nodes])
+    if metric == "L2":
+        between = sqnorms[pool][:, :, None] + sqnorms[pool][:, None, :] - 2.0 * between
+        to_node = sqnorms[pool] + sqnorms[nodes][:, None] - 2.0 * to_node
+    else:
+        between, to_node = -between, -to_node
+    kept = np.zeros(pool.shape, dtype=bool)
+    count = np.zeros(len(pool), dtype=np.int64)
+    for j in range(pool.shape[1]):
+        blocked = (kept & (between[:, j, :] <= to_node[:, j, None])).any(axis=1)
+        take = ~blocked & (count < M)
+        kept[:, j] = take
+        count += take
+    order = np.argsort(~kept, axis=1, kind="stable")[:, :M]
+    return np.take_along_axis(pool, order, axis=1)
+
+
+class GraphIndex:
+    """
+    Single-layer proximity graph searched with an HNSW-style beam (ef).
+
+    Each node links to M neighbours picked by HNSW's selection heuristic
+    from its 3*M nearest candidates, found among the points of its own and
+    nearby k-means partitions (efConstruction widens how many partitions
+    are considered), plus up to M reverse links so the graph is close to
+    undirected. Entry points are the nodes nearest to each
+    partition centroid.
+    """
+
+    def __init__(self, data, metric, M=16, efConstruction=200):
+        self.data = data
+        self.metric = metric
+        self.sqnorms = np.einsum("ij,ij->i", data, data)
+        n = len(data)
+        nparts = max(1, int(np.sqrt(n)))
+        build_probes = min(nparts, max(2, efConstruction // 10))
+
+        self.centroids = kmeans(data, nparts)
+        assign = assign_blocks(data, self.centroids)
+        members = [np.flatnonzero(assign == c) for c in range(nparts)]
+        c_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        near_parts = _topk_rows(_scores(self.centroids, self.centroids, c_sq, "L2"), build_probes)
+
+        knn = np.zeros((n, M), dtype=np.int64)
+        for c in range(nparts):
+            nodes = members[c]
+            if nodes.size == 0:
+                continue
+            cand = np.concatenate([members[p] for p in near_parts[c]])
+            if cand.size <= M:
+                knn[nodes] = np.resize(cand, M)
+                continue
+            pool_size = min(GRAPH_CANDIDATES_PER_LINK * M, cand.size - 1)
+            for b in range(0, nodes.size, SELECT_BLOCK):
+                block = nodes[b:b + SELECT_BLOCK]
+                scores = _scores(data[block], data[cand], self.sqnorms[cand], metric)
+                scores[block[:, None] == cand[None, :]] = np.inf  # no self-loops
+                pool = cand[_topk_rows(scores, pool_size)]
+                knn[block] = select_neighbors(data, self.sqnorms, block, pool, M, metric)
+
+        # Reverse links: for every edge u->v give v a link back to u (at most M per node)
+        src = np.repeat(np.arange(n), M)
+        dst = knn.ravel()
+        order = np.argsort(dst, kind="stable")
+        src, dst = src[order], dst[order]
+        rank = np.arange(dst.size) - np.searchsorted(dst, dst)
+        keep = rank < M
+        reverse = np.full((n, M), -1, dtype=np.int64)
+        reverse[dst[keep], rank[keep]] = src[keep]
+        self.neighbors = np.concatenate([knn, reverse], axis=1)
+
+        nonempty = [c for c in range(nparts) if members[c].size]
+        self.entry_points = np.array([
+            members[c][np.argmin(_scores(self.centroids[c][None, :], data[members[c]],
+                                         self.sqnorms[members[c]], "L2")[0])]
+            for c in nonempty
+        ], dtype=np.int64)
+        self.entry_centroids = self.centroids[nonempty]
+
+    def search(self, queries, k, params, allowed=None):
+        if allowed is not None and allowed.mean() < GRAPH_BRUTE_FORCE_BELOW:
+            return FlatIndex(self.data, self.metric).search(queries, k, params, allowed)
+        ef = max(params.get("ef", 64), k)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        dists = np.full((len(queries), k), np.inf, dtype=np.float32)
+        c_sq = np.einsum("ij,ij->i", self.entry_centroids, self.entry_centroids)
+        entries = _topk_rows(_scores(queries, self.entry_centroids, c_sq, self.metric),
+                             min(4, len(self.entry_points)))
+        scan_s = 0.0
+
+        for qi, query in enumerate(queries):
+            q = query[None, :]
+            start = self.entry_points[entries[qi]]
+            t0 = time.perf_counter()
+            start_d = _scores(q, self.data[start], self.sqnorms[start], self.metric)[0]
+            scan_s += time.perf_counter() - t0
+
+            visited = set(start.tolist())
+            candidates = list(zip(start_d.tolist(), start.tolist()))
+            heapq.heapify(candidates)
+            # max-heap of the ef best; filtered-out nodes are traversed but never returned
+            results = [(-d, i) for d, i in candidates if allowed is None or allowed[i]]
+            heapq.heapify(results)
+
+            while candidates:
+                d, node = heapq.heappop(candidates)
+                if len(results) >= ef and d > -results[0][0]:
+                    break
+                nbrs = [n for n in dict.fromkeys(self.neighbors[node].tolist()) if n >= 0 and n not in visited]
+                if not nbrs:
+                    continue
+                visited.update(nbrs)
+                nbrs = np.array(nbrs)
+                t0 = time.perf_counter()
+                nd = _scores(q, self.data[nbrs], self.sqnorms[nbrs], self.metric)[0]
+                scan_s += time.perf_counter() - t0
+                for dist, n in zip(nd.tolist(), nbrs.tolist()):
+                    if len(results) < ef or dist < -results[0][0]:
+                        heapq.heappush(candidates, (dist, n))
+                        if allowed is not None and not allowed[n]:
+                            continue
+                        heapq.heappush(results, (-dist, n))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+
+            best = sorted((-nd, n) for nd, n in results)[:k]
+            ids[qi, :len(best)] = [n for _, n in best]
+            dists[qi, :len(best)] = [d for d, _ in best]
+        return ids, _to_distances(queries, dists, self.metric), scan_s
+
+
+INDEX_TYPES = {
+    "FLAT": FlatIndex,
+    "IVF_FLAT": IVFIndex,
+    "HNSW": GraphIndex,
+}
+
+
+def index_nbytes(index):
+    """Bytes held by an index's arrays, raw vectors included (Milvus keeps them in the index too)"""
+    return sum(v.nbytes for v in vars(index).values() if isinstance(v, np.ndarray))
+
+
+class LocalEngine:
+    """
+    Vector store plus one active index, mimicking the Milvus calls the lab uses.
+
+    Rows present when the index was built form the sealed part; rows
+    written afterwards sit in a growing part that every search brute-forces,
+    and deletes are tombstones applied as a bitset, as in Milvus segments.
+    compact() drops tombstoned rows and rebuilds the index over everything.
+    Primary ids map to rows, so an upsert can move an id to a new row.
+
+    Every search appends a hook record (same schema as the C++ profiling
+    hooks) to `hook_log`, with scan_codes_time_us taken from the time spent
+    computing distances. Records are buffered and written in batches off
+    the search path; flush_hooks() writes whatever is still pending.
+    """
+
+    def __init__(self, dim, capacity, hook_log=None, run_id=None):
+        self.dim = dim
+        self.capacity = capacity
+        self.data = np.empty((capacity, dim), dtype=np.float32)
+        self.row_ids = np.empty(capacity, dtype=np.int64)     # row -> primary id
+        self.id_rows = np.full(capacity, -1, dtype=np.int64)  # primary id -> row, -1 if absent
+        self.deleted = np.zeros(capacity, dtype=bool)
+        self.num_deleted = 0
+        self.scalars = {}  # field -> column array, filled alongside the vectors
+        self._masks = {}
+        self.size = 0
+        self.indexed = 0   # rows covered by the index; the rest are growing
+        self.version = 0   # bumped by every write, so cached filter masks go stale
+        self.index = None
+        self.index_type = None
+        self.index_params = {}
+        self.metric = "L2"
+        self.hook_log = hook_log
+        self.run_id = run_id
+        self._hooks = JsonlBuffer(hook_log, HOOK_FLUSH_EVERY) if hook_log else None
+        self._write_lock = threading.Lock()
+
+    def add(self, start, batch, scalars=None):
+        """Store a batch (and optional scalar columns) at row offset `start`; safe from parallel workers"""
+        end = start + len(batch)
+        self.data[start:end] = batch
+        self.row_ids[start:end] = np.arange(start, end)
+        self.id_rows[start:end] = np.arange(start, end)
+        self._set_scalars(start, end, scalars)
+        # Workers finish out of order; max() must not race with another worker's larger end
+        with self._write_lock:
+            self.size = max(self.size, end)
+
+    def _set_scalars(self, start, end, scalars):
+        for field, values in (scalars or {}).items():
+            if field not in self.scalars:
+                self.scalars[field] = np.empty(self.capacity, dtype=np.asarray(values).dtype)
+            self.scalars[field][start:end] = values
+
+    def _grow(self, rows, max_id):
+        """Reallocate (doubling) so `rows` rows and ids up to `max_id` fit; caller holds the write lock"""
+        if rows > self.capacity:
+            capacity = self.capacity
+            while capacity < rows:
+                capacity *= 2
+            extend = lambda a: np.concatenate([a, np.empty((capacity - len(a),) + a.shape[1:], a.dtype)])
+            self.data = extend(self.data)
+            self.row_ids = extend(self.row_ids)
+            self.scalars = {f: extend(col) for f, col in self.scalars.items()}
+            self.deleted = np.concatenate([self.deleted, np.zeros(capacity - self.capacity, dtype=bool)])
+            self.capacity = capacity
+        if max_id >= len(self.id_rows):
+            size = max(max_id + 1, 2 * len(self.id_rows))
+            self.id_rows = np.concatenate([self.id_rows, np.full(size - len(self.id_rows), -1, dtype=np.int64)])
+
+    def insert(self, ids, vectors, scalars=None):
+        """Append rows for new primary ids; they are searchable (growing) right away"""
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._write_lock:
+            start, end = self.size, self.size + len(ids)
+            self._grow(end, int(ids.max()))
+            self.data[start:end] = vectors
+            self.row_ids[start:end] = ids
+            self._set_scalars(start, end, scalars)
+            self.id_rows[ids] = np.arange(start, end)
+            self.size = end
+            self.version += 1
+
+    def delete(self, ids):
+        """Tombstone the rows holding `ids`; returns how many of them existed"""
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._write_lock:
+            rows = self.id_rows[ids[ids < len(self.id_rows)]]
+            rows = rows[rows >= 0]
+            self.deleted[rows] = True
+            self.id_rows[self.row_ids[rows]] = -1
+            self.num_deleted += len(rows)
+            self.version += 1
+            return len(rows)
+
+    def upsert(self, ids, vectors, scalars=None):
+        """Delete then insert, as Milvus does: the ids move to new growing rows"""
+        self.delete(ids)
+        self.insert(ids, vectors, scalars)
+
+    def compact(self):
+        """
+        Drop tombstoned rows and rebuild the index over all live rows.
+
+        The rebuild runs outside the write lock, so searches and writes go
+        on meanwhile; rows written during it stay in the growing part.
+        Fresh arrays are swapped in rather than rewritten under in-flight
+        searches. Returns the number of rows removed.
+        """
+        with self._write_lock:
+            before = self.size
+            live = np.flatnonzero(~self.deleted[:before])
+        index = None
+        if self.index is not None:
+            index = self._new_index(self.index_type, self.index_params, self.metric, self.data[live])
+
+        with self._write_lock:
+            order = np.concatenate([live, np.arange(before, self.size)])
+            size = len(order)
+            fresh = lambda a: np.concatenate([a[order], np.empty((self.capacity - size,) + a.shape[1:], a.dtype)])
+            self.data = fresh(self.data)
+            self.row_ids = fresh(self.row_ids)
+            self.scalars = {f: fresh(col) for f, col in self.scalars.items()}
+            self.deleted = np.concatenate([self.deleted[order], np.zeros(self.capacity - size, dtype=bool)])
+            alive = np.flatnonzero(~self.deleted[:size])
+            self.id_rows = np.full_like(self.id_rows, -1)
+            self.id_rows[self.row_ids[alive]] = alive
+            self.num_deleted = size - len(alive)
+            self.size = size
+            if index is not None:
+                self.index, self.indexed = index, len(live)
+            self.version += 1
+            return before - len(live)
+
+    def filter_mask(self, expr):
+        """Bitset of rows passing `expr` (cached per expression and data version)"""
+        key = (expr, self.size, self.version)
+        if key not in self._masks:
+            if len(self._masks) >= MASK_CACHE_SIZE:
+                self._masks.pop(next(iter(self._masks)))
+            columns = {f: col[:self.size] for f, col in self.scalars.items()}
+            self._masks[key] = compile_expr(expr)(columns)
+        return self._masks[key]
+
+    @staticmethod
+    def _new_index(index_type, index_params, metric, data):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"local engine does not support index type {index_type}")
+        if metric == "COSINE":
+            data = data / np.linalg.norm(data, axis=1, keepdims=True)
+        return INDEX_TYPES[index_type](data, metric, **index_params)
+
+    def build_index(self, index_type, index_params, metric="L2"):
+        """Index every current row; returns build wall time, rows and index size"""
+        size = self.size
+        t0 = time.perf_counter()
+        self.index = self._new_index(index_type, index_params, metric, self.data[:size])
+        build_s = time.perf_counter() - t0
+        self.index_type = index_type
+        self.index_params = index_params
+        self.metric = metric
+        self.indexed = size
+        return {"index_build_s": build_s, "index_rows": size, "index_bytes": index_nbytes(self.index)}
+
+    def search(self, queries, k, search_params, expr=None, request_id=None):
+        """
+        Returns (ids, distances, total_us, scan_us); `expr` filters rows like
+        Milvus, `request_id` is copied into the hook record for joining
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.metric == "COSINE":
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        t0 = time.perf_counter()
+        with self._write_lock:
+            # Snapshot: writes after this point are not visible to this search
+            index, indexed, size = self.index, self.indexed, self.size
+            data, row_ids, num_deleted = self.data, self.row_ids, self.num_deleted
+            allowed = self.filter_mask(expr) if expr else None
+            if num_deleted:
+                live = ~self.deleted[:size]
+                allowed = live if allowed is None else allowed & live
+        ids, dists, scan_s = index.search(queries, k, search_params,
+                                          None if allowed is None else allowed[:indexed])
+        if size > indexed:
+            # Growing rows have no index yet: brute force, then merge with the indexed results
+            growing = FlatIndex(data[indexed:size], self.metric)
+            g_ids, g_dists, g_scan_s = growing.search(queries, k, search_params,
+                                                      None if allowed is None else allowed[indexed:size])
+            ids, dists = self._merge(ids, dists, np.where(g_ids >= 0, g_ids + indexed, -1), g_dists, k)
+            scan_s += g_scan_s
+        ids = np.where(ids >= 0, row_ids[np.maximum(ids, 0)], -1)
+        total_us = (time.perf_counter() - t0) * 1e6
+        scan_us = min(scan_s * 1e6, total_us)
+        if self.hook_log:
+            selectivity = float(allowed.mean()) if expr else None
+            self._write_hook(total_us, scan_us, len(queries), k, search_params, expr, selectivity,
+                             size - indexed, num_deleted, request_id)
+        return ids, dists, total_us, scan_us
+
+    def _merge(self, ids_a, dists_a, ids_b, dists_b, k):
+        """Top-k of two result sets in Milvus distance order (ascending L2, descending IP/COSINE)"""
+        ids = np.concatenate([ids_a, ids_b], axis=1)
+        dists = np.concatenate([dists_a, dists_b], axis=1)
+        key = np.where(ids >= 0, dists if self.metric == "L2" else -dists, np.inf)
+        order = np.argsort(key, axis=1, kind="stable")[:, :k]
+        rows = np.arange(len(ids))[:, None]
+        return ids[rows, order], dists[rows, order]
+
+    def _write_hook(self, total_us, scan_us, nq, k, search_params, expr=None, selectivity=None,
+                    growing_rows=0, deleted_rows=0, request_id=None):
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "operation": "search",
+            "source": "local_engine",
+            "run_id": self.run_id,
+            "index_type": self.index_type,
+            "index_params": self.index_params,
+            "search_params": search_params,
+            "num_vectors": self.size,
+            "total_time_us": int(total_us),
+            "scan_codes_time_us": int(scan_us),
+            "other_time_us": int(total_us - scan_us),
+            "scan_codes_percentage": round(scan_us / total_us * 100, 2) if total_us else 0.0,
+            "nq": nq,
+            "dim": self.dim,
+            "top_k": k
+        }
+        if expr:
+            record["expr"] = expr
+            record["selectivity"] = round(selectivity, 6)
+        if request_id:
+            record["request_id"] = request_id
+        if growing_rows or deleted_rows:
+            record["growing_rows"] = int(growing_rows)
+            record["deleted_rows"] = int(deleted_rows)
+        self._hooks.append(record)
+
+    def flush_hooks(self):
+        """Write buffered hook records and wait until they are on disk"""
+        if self._hooks is not None:
+            self._hooks.flush()
@@ -0,0 +1,149 @@
+"""
+DBPU Acceleration Lab - Mixed Read/Write Load
+Rate-limited insert / upsert / delete streams, periodic compaction and a
+freshness probe run alongside closed-loop search clients
+"""
+import itertools
+import threading
+import time
+
+import numpy as np
+
+from load_gen import run_closed_loop, summarize_latencies
+
+WRITE_KINDS = ["insert", "upsert", "delete"]
+TIMELINE_BUCKET_S = 1.0
+FRESHNESS_INTERVAL_S = 0.5   # gap between probes
+FRESHNESS_POLL_S = 0.005     # gap between visibility checks of one probe
+FRESHNESS_TIMEOUT_S = 10.0
+
+
+def _write_stream(op, rate, batch, stop, out):
+    """Call op(seq) every batch / rate seconds (vectors/s) until `stop`; record per-call latency"""
+    interval = batch / rate
+    next_at = time.perf_counter()
+    for seq in itertools.count():
+        now = time.perf_counter()
+        if next_at > now and stop.wait(next_at - now):
+            break
+        if stop.is_set():
+            break
+        t0 = time.perf_counter()
+        try:
+            out["vectors"] += op(seq)
+            out["latencies_ms"].append((time.perf_counter() - t0) * 1000)
+        except Exception:
+            out["errors"] += 1
+        # Fixed schedule: a slow call is followed by catch-up calls, not a lower rate
+        next_at += interval
+
+
+def _compactor(compact, every_s, stop, out):
+    while not stop.wait(every_s):
+        t0 = time.perf_counter()
+        try:
+            removed = compact()
+        except Exception:
+            out["errors"] += 1
+            continue
+        out["runs"].append({"at_s": t0 - out["start"], "duration_ms": (time.perf_counter() - t0) * 1000,
+                            "removed": removed})
+
+
+def _freshness_probe(insert_probe, visible, stop, out):
+    """Insert one marker vector, then poll until a search returns it"""
+    for seq in itertools.count():
+        if stop.wait(FRESHNESS_INTERVAL_S):
+            break
+        try:
+            probe = insert_probe(seq)
+            acked = time.perf_counter()
+            while not visible(probe):
+                if time.perf_counter() - acked > FRESHNESS_TIMEOUT_S:
+                    out["timeouts"] += 1
+                    break
+                time.sleep(FRESHNESS_POLL_S)
+            else:
+                out["freshness_ms"].append((time.perf_counter() - acked) * 1000)
+        except Exception:
+            out["errors"] += 1
+
+
+def latency_timeline(events, start, bucket_s=TIMELINE_BUCKET_S):
+    """Per-bucket request count and p99 from (finish_time, latency_ms) events"""
+    if not events:
+        return []
+    events = np.asarray(events, dtype=np.float64)
+    buckets = ((events[:, 0] - start) // bucket_s).astype(np.int64)
+    timeline = []
+    for b in np.unique(buckets):
+        lat = events[buckets == b, 1]
+        timeline.append({"t_s": float(b * bucket_s), "requests": int(lat.size),
+                         "p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99))})
+    return timeline
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50_ms": None, "p99_ms": None, "max_ms": None}
+    values = np.asarray(values)
+    return {"p50_ms": float(np.percentile(values, 50)), "p99_ms": float(np.percentile(values, 99)),
+            "max_ms": float(values.max())}
+
+
+def run_mixed(search_fn, concurrency, duration_s, writers, write_batch, compact=None, compact_every_s=None,
+              insert_probe=None, visible=None):
+    """
+    Closed-loop search with concurrent write traffic for `duration_s`.
+
+    writers maps a kind ("insert", "upsert", "delete") to (op, vectors_per_s);
+    op(seq) performs one batch and returns the number of vectors written.
+    compact() is called every compact_every_s seconds if given. When
+    insert_probe(seq) -> id and visible(id) -> bool are given, a probe
+    measures freshness: time from an insert's acknowledgment until a search
+    returns the new vector. Returns (search summary, latency timeline,
+    per-stream write stats, freshness stats, compaction runs).
+    """
+    events = []
+
+    def timed_search(seq):
+        t0 = time.perf_counter()
+        search_fn(seq)
+        t1 = time.perf_counter()
+        events.append((t1, (t1 - t0) * 1000))
+
+    stop = threading.Event()
+    streams = {kind: {"vectors": 0, "errors": 0, "latencies_ms": []} for kind in writers}
+    compactions = {"runs": [], "errors": 0, "start": time.perf_counter()}
+    freshness = {"freshness_ms": [], "timeouts": 0, "errors": 0}
+    threads = [threading.Thread(target=_write_stream, args=(op, rate, write_batch, stop, streams[kind]),
+                                name=f"writer-{kind}", daemon=True)
+               for kind, (op, rate) in writers.items() if rate > 0]
+    if compact is not None and compact_every_s:
+        threads.append(threading.Thread(target=_compactor, args=(compact, compact_every_s, stop, compactions),
+                                        name="compactor", daemon=True))
+    if insert_probe is not None:
+        threads.append(threading.Thread(target=_freshness_probe, args=(insert_probe, visible, stop, freshness),
+                                        name="freshness-probe", daemon=True))
+
+    start = time.perf_counter()
+    compactions["start"] = start
+    for t in threads:
+        t.start()
+    try:
+        latencies_ms, elapsed_s, errors = run_closed_loop(timed_search, concurrency, duration_s=duration_s)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(FRESHNESS_TIMEOUT_S + 5)
+
+    summary = summarize_latencies(latencies_ms, elapsed_s, errors)
+    write_stats = {}
+    for kind, s in streams.items():
+        write_stats[kind] = {"ops": len(s["latencies_ms"]), "vectors": s["vectors"], "errors": s["errors"],
+                             "vectors_per_s": s["vectors"] / elapsed_s if elapsed_s > 0 else 0.0}
+        write_stats[kind].update(_percentiles(s["latencies_ms"]))
+    fresh = {"probes": len(freshness["freshness_ms"]), "timeouts": freshness["timeouts"],
+             "errors": freshness["errors"]}
+    fresh.update(_percentiles(freshness["freshness_ms"]))
+    return summary, latency_timeline(events, start), write_stats, fresh, compactions["runs"]
@@ -0,0 +1,108 @@
+"""
+DBPU Acceleration Lab - Multi-Process Load Coordinator
+Forks N load-generator processes (each with its own connection and query
+stream), releases them together and merges their results into one report
+"""
+import multiprocessing as mp
+import queue
+import time
+
+import numpy as np
+
+from latency_sketch import LatencySketch, merge_all
+from load_gen import run_closed_loop, summarize_latencies, summarize_sketch
+
+SETUP_TIMEOUT_S = 120
+RESULT_TIMEOUT_S = 60
+
+
+def _worker(worker_id, make_search_fn, barrier, results, concurrency, duration_s, num_requests, merge, on_exit):
+    """Child process: connect, wait for the shared start, run a closed loop, report back"""
+    try:
+        search_fn = make_search_fn(worker_id)
+        barrier.wait(SETUP_TIMEOUT_S)
+        start = time.time()
+        latencies_ms, elapsed_s, errors = run_closed_loop(
+            search_fn, concurrency, duration_s=duration_s, num_requests=num_requests
+        )
+        if on_exit is not None:
+            on_exit()
+        result = {"worker": worker_id, "start": start, "end": start + elapsed_s, "errors": errors}
+        if merge == "samples":
+            result["latencies_ms"] = latencies_ms
+        else:
+            sketch = LatencySketch()
+            sketch.add_many(latencies_ms)
+            result["sketch"] = sketch.to_dict()
+    except Exception as e:
+        barrier.abort()
+        result = {"worker": worker_id, "error": f"{type(e).__name__}: {e}"}
+    results.put(result)
+
+
+def run_multiprocess(make_search_fn, processes, concurrency, duration_s=None, num_requests=None,
+                     merge="sketch", on_exit=None):
+    """
+    Run `processes` x `concurrency` closed-loop clients and merge the results.
+
+    make_search_fn(worker_id) runs inside each child after the fork and must
+    open that child's own connection, returning a search_fn(seq) as used by
+    run_closed_loop. All children block on a shared barrier once connected,
+    so none starts sending before the slowest one is ready. num_requests is
+    split evenly across processes. merge="sketch" ships one bounded-size
+    sketch per process; "samples" ships the raw latencies for exact
+    percentiles. on_exit() runs in each child after its loop, e.g. to write
+    logs it buffered, since children exit without running atexit handlers.
+    Throughput uses the wall-clock span from the first start to the last
+    finish. Returns (summary, per_worker).
+    """
+    if merge not in ("sketch", "samples"):
+        raise ValueError(f"unknown merge mode: {merge}")
+    ctx = mp.get_context("fork")
+    barrier = ctx.Barrier(processes)
+    results = ctx.Queue()
+    per_process = None if num_requests is None else -(-num_requests // processes)
+
+    workers = [
+        ctx.Process(target=_worker, name=f"loadgen-{i}",
+                    args=(i, make_search_fn, barrier, results, concurrency, duration_s, per_process, merge,
+                          on_exit))
+        for i in range(processes)
+    ]
+    for w in workers:
+        w.start()
+
+    # Drain before join: a child cannot exit while its queued result is unread
+    collected = []
+    timeout = SETUP_TIMEOUT_S + (duration_s or 0) + RESULT_TIMEOUT_S
+    try:
+        for _ in workers:
+            collected.append(results.get(timeout=timeout))
+    except queue.Empty:
+        pass
+    for w in workers:
+        w.join(5)
+        if w.is_alive():
+            w.terminate()
+
+    failed = [r for r in collected if "error" in r]
+    if failed or len(collected) < processes:
+        reasons = "; ".join(f"worker {r['worker']}: {r['error']}" for r in failed) or "no result"
+        raise RuntimeError(f"{processes - len(collected) + len(failed)} load-generator process(es) failed ({reasons})")
+
+    elapsed_s = max(r["end"] for r in collected) - min(r["start"] for r in collected)
+    errors = sum(r["errors"] for r in collected)
+    if merge == "samples":
+        summary = summarize_latencies(np.concatenate([r["latencies_ms"] for r in collected]), elapsed_s, errors)
+    else:
+        sketch = merge_all(LatencySketch.from_dict(r["sketch"]) for r in collected)
+        summary = summarize_sketch(sketch, elapsed_s, errors)
+
+    per_worker = []
+    for r in sorted(collected, key=lambda r: r["worker"]):
+        count = len(r["latencies_ms"]) if merge == "samples" else r["sketch"]["count"]
+        span = r["end"] - r["start"]
+        per_worker.append({"worker": r["worker"], "num_requests": count, "errors": r["errors"],
+                           "qps": count / span if span > 0 else 0.0,
+                           "start_skew_ms": (r["start"] - min(x["start"] for x in collected)) * 1000})
+    return summary, per_worker
@@ -0,0 +1,233 @@
+"""
+DBPU Acceleration Lab - Client-Side Query Cache
+Exact-match LRU (quantized vector + params) and similarity-threshold
+"semantic" caches in front of a search backend, with bounded memory
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ENTRY_OVERHEAD_BYTES = 96   # dict/slot bookkeeping per entry, roughly what CPython spends
+DEFAULT_QUANT_STEP = 1e-4
+DEFAULT_THRESHOLD = 0.99
+
+
+def _result_bytes(ids):
+    return ids.nbytes
+
+
+def _group_key(k, search_params, expr):
+    return json.dumps([k, search_params, expr], sort_keys=True)
+
+
+class ExactCache:
+    """
+    LRU keyed on a 16-byte digest of the query vector rounded to
+    `quant_step`, plus (top_k, search params, filter). Only repeats that
+    agree to within the step hit, so results are those the backend returned
+    for an (almost) identical query. Evicts least recently used entries
+    past `max_bytes`.
+    """
+
+    kind = "exact"
+
+    def __init__(self, max_bytes, quant_step=DEFAULT_QUANT_STEP):
+        self.max_bytes = max_bytes
+        self.quant_step = quant_step
+        self.nbytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _keys(self, queries, group):
+        quantized = np.round(np.asarray(queries, dtype=np.float64) / self.quant_step).astype(np.int64)
+        return [(group, hashlib.blake2b(row.tobytes(), digest_size=16).digest()) for row in quantized]
+
+    def lookup(self, queries, group):
+        """Per-row cached ids (None on a miss), plus the keys store() needs"""
+        keys = self._keys(queries, group)
+        found = []
+        with self._lock:
+            for key in keys:
+                ids = self._entries.get(key)
+                if ids is not None:
+                    self._entries.move_to_end(key)
+                found.append(ids)
+        return found, keys
+
+    def store(self, keys, rows, results):
+        """Cache `results` for rows `rows` of the request `keys` came from"""
+        with self._lock:
+            for key, ids in zip((keys[i] for i in rows), results):
+                if key in self._entries:
+                    continue
+                self._entries[key] = ids
+                self.nbytes += len(key[1]) + _result_bytes(ids) + ENTRY_OVERHEAD_BYTES
+            while self.nbytes > self.max_bytes and self._entries:
+                key, ids = self._entries.popitem(last=False)
+                self.nbytes -= len(key[1]) + _result_bytes(ids) + ENTRY_OVERHEAD_BYTES
+                self.evictions += 1
+
+
+class SemanticCache:
+    """
+    Returns a cached result when a previous query (same top_k, params and
+    filter) has cosine similarity >= `threshold` to the new one.
+
+    Cached vectors live in one preallocated, L2-normalized matrix, so a
+    lookup is a single matrix product against the entries of its group.
+    Hits may belong to a slightly different query, which is the recall
+    this cache trades for latency. The least recently used slot is reused
+    once the entries exceed `max_bytes`.
+    """
+
+    kind = "semantic"
+
+    def __init__(self, max_bytes, threshold=DEFAULT_THRESHOLD, initial_slots=1024):
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.nbytes = 0
+        self.evictions = 0
+        self._initial_slots = initial_slots
+        self._vectors = None
+        self._groups = np.full(initial_slots, -1, dtype=np.int64)  # -1 = free slot
+        self._last_used = np.zeros(initial_slots, dtype=np.int64)
+        self._results = [None] * initial_slots
+        self._group_ids = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int((self._groups >= 0).sum())
+
+    def _slot_bytes(self, ids):
+        return self._vectors.shape[1] * 4 + _result_bytes(ids) + ENTRY_OVERHEAD_BYTES
+
+    def lookup(self, queries, group):
+        queries = np.asarray(queries, dtype=np.float32)
+        unit = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        found = [None] * len(queries)
+        with self._lock:
+            gid = self._group_ids.get(group)
+            if gid is None or self._vectors is None:
+                return found, (unit, group)
+            slots = np.flatnonzero(self._groups == gid)
+            if slots.size:
+                sims = unit @ self._vectors[slots].T
+                best = np.argmax(sims, axis=1)
+                self._clock += 1
+                for i, b in enumerate(best):
+                    if sims[i, b] >= self.threshold:
+                        found[i] = self._results[slots[b]]
+                        self._last_used[slots[b]] = self._clock
+        return found, (unit, group)
+
+    def store(self, keys, rows, results):
+        unit, group = keys
+        unit = unit[rows]
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self._initial_slots, unit.shape[1]), dtype=np.float32)
+            gid = self._group_ids.setdefault(group, len(self._group_ids))
+            for vector, ids in zip(unit, results):
+                free = np.flatnonzero(self._groups < 0)
+                if free.size == 0:
+                    self._grow()
+                    free = np.flatnonzero(self._groups < 0)
+                slot = free[0]
+                self._clock += 1
+                self._vectors[slot] = vector
+                self._groups[slot] = gid
+                self._last_used[slot] = self._clock
+                self._results[slot] = ids
+                self.nbytes += self._slot_bytes(ids)
+            while self.nbytes > self.max_bytes:
+                used = np.flatnonzero(self._groups >= 0)
+                victim = used[np.argmin(self._last_used[used])]
+                self.nbytes -= self._slot_bytes(self._results[victim])
+                self._groups[victim] = -1
+                self._results[victim] = None
+                self.evictions += 1
+
+    def _grow(self):
+        n = len(self._groups)
+        self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+        self._groups = np.concatenate([self._groups, np.full(n, -1, dtype=np.int64)])
+        self._last_used = np.concatenate([self._last_used, np.zeros(n, dtype=np.int64)])
+        self._results.extend([None] * n)
+
+    @property
+    def allocated_bytes(self):
+        """Slot matrix plus cached results, including free slots"""
+        return 0 if self._vectors is None else self._vectors.nbytes + self.nbytes - len(self) * self._vectors.shape[1] * 4
+
+
+class CachedSearch:
+    """
+    search(queries, k, params, expr) -> per-row ids, answered from `cache`
+    where possible. Misses of one request go to `backend` as a single
+    batch and are then cached. Tracks hits, lookup overhead and backend
+    time, so the latency a hit saves can be estimated from the mean
+    backend cost per query.
+    """
+
+    def __init__(self, cache, backend):
+        self.cache = cache
+        self.backend = backend
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_s = 0.0
+        self.backend_s = 0.0
+        self.backend_queries = 0
+        self.peak_bytes = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, queries, k, search_params, expr=None):
+        t0 = time.perf_counter()
+        found, keys = self.cache.lookup(queries, _group_key(k, search_params, expr))
+        lookup_s = time.perf_counter() - t0
+        missing = [i for i, ids in enumerate(found) if ids is None]
+        backend_s = 0.0
+        if missing:
+            t1 = time.perf_counter()
+            results = self.backend(np.asarray(queries)[missing], k, search_params, expr)
+            backend_s = time.perf_counter() - t1
+            results = [np.asarray(ids, dtype=np.int64) for ids in results]
+            for i, ids in zip(missing, results):
+                found[i] = ids
+            self.cache.store(keys, missing, results)
+        with self._lock:
+            self.lookups += len(found)
+            self.hits += len(found) - len(missing)
+            self.lookup_s += lookup_s
+            self.backend_s += backend_s
+            self.backend_queries += len(missing)
+            self.peak_bytes = max(self.peak_bytes, self.cache.nbytes)
+        return found
+
+    def stats(self):
+        per_query_ms = self.backend_s / self.backend_queries * 1000 if self.backend_queries else 0.0
+        lookup_ms = self.lookup_s / self.lookups * 1000 if self.lookups else 0.0
+        return {
+            "cache": self.cache.kind,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "entries": len(self.cache),
+            "evictions": self.cache.evictions,
+            "memory_bytes": self.cache.nbytes,
+            "peak_memory_bytes": self.peak_bytes,
+            "allocated_bytes": getattr(self.cache, "allocated_bytes", self.cache.nbytes),
+            "max_bytes": self.cache.max_bytes,
+            "backend_ms_per_query": per_query_ms,
+            "lookup_ms_per_query": lookup_ms,
+            # Each hit skips a backend query; every lookup pays the probe
+            "estimated_saved_ms": self.hits * per_query_ms - self.lookups * lookup_ms,
+        }
@@ -0,0 +1,233 @@
+"""
+DBPU Acceleration Lab - Query Traces
+Compact binary, memory-mapped recording of a query stream (vectors,
+search params, top_k, filters, relative send times) for faithful replay
+
+Layout (little-endian):
+    header   64 B   magic, version, dim, record/vector counts, section offsets
+    vectors  float32 (num_vectors, dim), 64-byte aligned, written as they arrive
+    records  RECORD_DTYPE x num_records
+    table    UTF-8 JSON: distinct search params, distinct filter exprs, metadata
+
+Vectors are never stored as JSON; params and exprs are deduplicated and
+referenced by index, so a record costs 32 bytes plus its vectors.
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+# load_gen pulls in the shared latency sketch from analyzer/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "analyzer"))
+
+from load_gen import arrival_offsets
+
+MAGIC = b"DBPUTRC\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQQ")   # magic, version, dim, records, vectors, vec/rec/table offsets
+HEADER_SIZE = 64
+ALIGN = 64
+RECORD_DTYPE = np.dtype([
+    ("t_us", "<u8"),        # send time relative to the first request
+    ("vec_offset", "<u8"),  # first row of this request's vectors
+    ("nq", "<u4"),
+    ("top_k", "<u4"),
+    ("params", "<u4"),      # index into table["params"]
+    ("expr", "<i4"),        # index into table["exprs"], -1 = unfiltered
+])
+
+
+def _align(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+class TraceWriter:
+    """
+    Stream requests into a trace file.
+
+    Vectors go straight to disk; only the 32-byte records are buffered
+    until close(). The file appears under its final name only once
+    complete. Use as a context manager.
+    """
+
+    def __init__(self, path, dim, meta=None):
+        self.path = path
+        self.dim = dim
+        self.meta = meta or {}
+        self._tmp = path + ".tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(self._tmp, 'wb')
+        self._f.write(b"\0" * HEADER_SIZE)
+        self._records = []
+        self._params = {}
+        self._exprs = {}
+        self._num_vectors = 0
+        self._t0 = None
+
+    def append(self, t_s, vectors, search_params, top_k, expr=None):
+        """Add one request sent at `t_s` seconds (any clock; stored relative to the first request)"""
+        vectors = np.ascontiguousarray(vectors, dtype="<f4").reshape(-1, self.dim)
+        if self._t0 is None:
+            self._t0 = t_s
+        params_key = json.dumps(search_params, sort_keys=True)
+        params_idx = self._params.setdefault(params_key, len(self._params))
+        expr_idx = self._exprs.setdefault(expr, len(self._exprs)) if expr else -1
+        self._records.append((int(round((t_s - self._t0) * 1e6)), self._num_vectors, len(vectors),
+                              top_k, params_idx, expr_idx))
+        self._f.write(vectors.tobytes())
+        self._num_vectors += len(vectors)
+
+    def close(self):
+        vec_offset = HEADER_SIZE
+        rec_offset = _align(vec_offset + self._num_vectors * self.dim * 4)
+        records = np.array(self._records, dtype=RECORD_DTYPE)
+        table_offset = rec_offset + records.nbytes
+        table = json.dumps({"params": [json.loads(p) for p in self._params],
+                            "exprs": list(self._exprs), "meta": self.meta}).encode()
+
+        self._f.write(b"\0" * (rec_offset - self._f.tell()))
+        self._f.write(records.tobytes())
+        self._f.write(table)
+        self._f.seek(0)
+        self._f.write(HEADER.pack(MAGIC, VERSION, self.dim, len(records), self._num_vectors,
+                                  vec_offset, rec_offset, table_offset))
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            os.remove(self._tmp)
+
+
+class Trace:
+    """Read-only, memory-mapped view of a trace file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, dim, num_records, num_vectors, vec_offset, rec_offset, table_offset = \
+                HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a query trace")
+            if version != VERSION:
+                raise ValueError(f"{path}: unsupported trace version {version}")
+            f.seek(table_offset)
+            table = json.loads(f.read().decode())
+        self.dim = dim
+        self.params = table["params"]
+        self.exprs = table["exprs"]
+        self.meta = table["meta"]
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=rec_offset, shape=(num_records,)) \
+            if num_records else np.empty(0, dtype=RECORD_DTYPE)
+        self.vectors = np.memmap(path, dtype="<f4", mode='r', offset=vec_offset, shape=(num_vectors, dim)) \
+            if num_vectors else np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def offsets_s(self):
+        """Send times in seconds from the first request"""
+        return self.records["t_us"] / 1e6
+
+    @property
+    def duration_s(self):
+        return float(self.records["t_us"][-1]) / 1e6 if len(self) else 0.0
+
+    def request(self, i):
+        """(vectors, search_params, top_k, expr) of request i; vectors are a zero-copy view"""
+        r = self.records[i]
+        start = int(r["vec_offset"])
+        expr = self.exprs[r["expr"]] if r["expr"] >= 0 else None
+        return self.vectors[start:start + int(r["nq"])], self.params[r["params"]], int(r["top_k"]), expr
+
+    def summary(self):
+        nq = self.records["nq"]
+        return {
+            "trace": os.path.basename(self.path),
+            "requests": len(self),
+            "duration_s": self.duration_s,
+            "mean_qps": len(self) / self.duration_s if self.duration_s else None,
+            "dim": self.dim,
+            "nq_mean": float(nq.mean()) if len(self) else 0.0,
+            "top_k": sorted(set(self.records["top_k"].tolist())),
+            "filtered_fraction": float((self.records["expr"] >= 0).mean()) if len(self) else 0.0,
+            "distinct_params": len(self.params),
+            "meta": self.meta,
+        }
+
+
+def synthesize(path, queries, duration_s, rate_qps, arrival="poisson", nq=1, top_k=(10,),
+               search_params=({"nprobe": 16, "ef": 64},), exprs=(), filtered_fraction=0.0, seed=0):
+    """
+    Write a synthetic production-shaped trace: Poisson (or constant) arrivals,
+    queries drawn from `queries`, top_k and params mixed uniformly, and a
+    `filtered_fraction` of requests carrying one of `exprs`.
+    """
+    rng = np.random.default_rng(seed)
+    offsets = arrival_offsets(rate_qps, duration_s, arrival, seed)
+    meta = {"source": "synthetic", "rate_qps": rate_qps, "arrival": arrival, "seed": seed}
+    with TraceWriter(path, queries.shape[1], meta) as writer:
+        for t in offsets:
+            rows = rng.integers(0, len(queries), size=nq)
+            expr = exprs[rng.integers(len(exprs))] if exprs and rng.random() < filtered_fraction else None
+            writer.append(float(t), queries[rows], search_params[rng.integers(len(search_params))],
+                          int(top_k[rng.integers(len(top_k))]), expr)
+    return Trace(path)
+
+
+def main():
+    from dataset_cache import random_dataset, file_dataset
+    from filters import selectivity_expr
+
+    parser = argparse.ArgumentParser(description="Create or inspect DBPU query traces")
+    sub = parser.add_subparsers(dest="command", required=True)
+    syn = sub.add_parser("synthesize", help="write a synthetic trace from a dataset's query set")
+    syn.add_argument("out", help="trace file to write")
+    syn.add_argument("--dataset", default="random",
+                     help="'random' (same seeds as lab_gen.py) or a dataset path")
+    syn.add_argument("--num-vectors", type=int, default=10000)
+    syn.add_argument("--dim", type=int, default=128)
+    syn.add_argument("--rate", type=float, default=100.0, help="mean requests per second")
+    syn.add_argument("--duration", type=float, default=60.0, help="trace length in seconds")
+    syn.add_argument("--arrival", choices=["constant", "poisson"], default="poisson")
+    syn.add_argument("--nq", type=int, default=1, help="query vectors per request")
+    syn.add_argument("--topk-values", default="10", help="comma-separated top_k mix")
+    syn.add_argument("--filter-field", choices=["category", "timestamp", "tag"], default=None,
+                     help="give --filtered-fraction of requests a filter on this field")
+    syn.add_argument("--filtered-fraction", type=float, default=0.2)
+    syn.add_argument("--seed", type=int, default=0)
+    info = sub.add_parser("info", help="print a trace summary")
+    info.add_argument("trace")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(Trace(args.trace).summary(), indent=2))
+        return
+
+    if args.dataset == "random":
+        dataset = random_dataset(args.num_vectors, args.dim, seed=42, query_seed=7)
+    else:
+        dataset = file_dataset(args.dataset, limit=args.num_vectors)
+    exprs = [selectivity_expr(args.filter_field, s, len(dataset)) for s in (0.01, 0.1, 0.5)] \
+        if args.filter_field else []
+    trace = synthesize(args.out, np.asarray(dataset.queries, dtype=np.float32), args.duration, args.rate,
+                       arrival=args.arrival, nq=args.nq,
+                       top_k=[int(k) for k in args.topk_values.split(",")],
+                       exprs=exprs, filtered_fraction=args.filtered_fraction if exprs else 0.0,
+                       seed=args.seed)
+    size_mb = os.path.getsize(args.out) / 1e6
+    print(f"✅ {args.out}: {len(trace)} requests over {trace.duration_s:.1f}s, {size_mb:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
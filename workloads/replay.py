@@ -0,0 +1,47 @@
+"""
+DBPU Acceleration Lab - Trace Replay
+Issues a recorded query trace at its original pace (or scaled) from a pool
+of concurrent senders, so index configs and builds see the same stream
+"""
+import numpy as np
+
+from load_gen import run_schedule, summarize_latencies
+
+DEFAULT_SENDERS = 64
+RECALL_SAMPLE = 100
+
+
+def replay_trace(trace, search, speed=1.0, senders=DEFAULT_SENDERS, limit=None, keep_results=RECALL_SAMPLE):
+    """
+    Replay `trace` against search(vectors, search_params, top_k, expr) -> ids.
+
+    Request i is sent at offset_i / speed (speed 2.0 replays twice as fast)
+    by one of `senders` threads; latency is measured from that intended time,
+    so a server falling behind the recorded pace shows up in the tail rather
+    than silently stretching the replay. The ids of the first `keep_results`
+    requests are returned for recall scoring. Returns (summary, results).
+    """
+    if speed <= 0:
+        raise ValueError("replay speed must be positive")
+    n = len(trace) if limit is None else min(limit, len(trace))
+    offsets = np.asarray(trace.offsets_s[:n]) / speed
+    results = {}
+
+    def search_fn(i):
+        vectors, params, k, expr = trace.request(i)
+        ids = search(vectors, params, k, expr)
+        if i < keep_results:
+            results[i] = ids
+
+    latencies_ms, service_ms, elapsed_s, errors = run_schedule(search_fn, offsets, max_workers=senders)
+    summary = summarize_latencies(latencies_ms, elapsed_s, errors)
+    span_s = float(offsets[-1]) if n > 1 else 0.0
+    summary.update({
+        "speed": speed,
+        "senders": senders,
+        "scheduled": n,
+        "scheduled_qps": (n - 1) / span_s if span_s > 0 else None,
+        "service_p99_ms": float(np.percentile(service_ms, 99)) if service_ms.size else 0.0,
+        "vectors_per_s": float(trace.records["nq"][:n].sum()) / elapsed_s if elapsed_s > 0 else 0.0,
+    })
+    return summary, results
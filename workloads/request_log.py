@@ -0,0 +1,129 @@
+"""
+DBPU Acceleration Lab - Per-Request Log
+Correlation ids plus client-side timings for individual searches, joined
+with server hook records by analyzer/latency_breakdown.py, and the
+buffered JSONL writer both logs use to stay off the request path
+"""
+import itertools
+import json
+import os
+import queue
+import threading
+import weakref
+from datetime import datetime, timezone
+
+REQUEST_LOG_FILE = os.getenv("REQUEST_LOG_FILE", "/tmp/dbpu-requests.jsonl")
+FLUSH_EVERY = 50000
+_buffers = weakref.WeakSet()  # live buffers, reset in forked children
+
+
+class JsonlBuffer:
+    """
+    Records appended from timed code and written as JSONL off the request path.
+
+    append() only adds an item to a list: every `flush_every` items the
+    list is handed to a background writer, which does the encoding and
+    file I/O, so no timed call waits on a write. flush() hands over the
+    rest and waits until everything is on disk. Subclasses turn buffered
+    items into dicts in encode(). A forked child starts with an empty
+    buffer and its own writer; the parent's pending items stay the
+    parent's to write.
+    """
+
+    def __init__(self, log_file, flush_every=FLUSH_EVERY):
+        self.log_file = log_file
+        self.flush_every = flush_every
+        self._reset()
+        _buffers.add(self)
+
+    def _reset(self):
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._writer = None
+
+    def append(self, item):
+        with self._lock:
+            self._buffer.append(item)
+            if len(self._buffer) < self.flush_every:
+                return
+            batch, self._buffer = self._buffer, []
+        self._hand_off(batch)
+
+    def flush(self):
+        """Hand over buffered items and block until all of them are written"""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._hand_off(batch)
+        self._pending.join()
+
+    def encode(self, item):
+        return item
+
+    def _hand_off(self, batch):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="jsonl-writer", daemon=True)
+                self._writer.start()
+        self._pending.put(batch)
+
+    def _write_loop(self):
+        while True:
+            batch = self._pending.get()
+            try:
+                self._write(batch)
+            finally:
+                self._pending.task_done()
+
+    def _write(self, batch):
+        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+        with open(self.log_file, 'a') as f:
+            for item in batch:
+                f.write(json.dumps(self.encode(item)) + '\n')
+
+
+def _after_fork_in_child():
+    for buffer in list(_buffers):
+        buffer._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class RequestLog(JsonlBuffer):
+    """
+    Per-request client timings, buffered by JsonlBuffer.
+
+    Ids are "<run_id>-<sequence>", unique across the run and cheap to make
+    on the request path. Wall-clock times are kept as floats until they
+    are written, then stored as UTC ISO timestamps like the hook records.
+    """
+
+    def __init__(self, run_id, log_file=REQUEST_LOG_FILE):
+        super().__init__(log_file)
+        self.run_id = run_id
+        self._seq = itertools.count()
+
+    def new_id(self):
+        return f"{self.run_id}-{next(self._seq):08d}"
+
+    def record(self, request_id, sent, received, serialize_s, nq, top_k, context):
+        """One finished request; `sent`/`received` are time.time() values around the call"""
+        self.append((request_id, sent, received, serialize_s, nq, top_k, context))
+
+    def encode(self, item):
+        request_id, sent, received, serialize_s, nq, top_k, context = item
+        record = {
+            "timestamp": datetime.fromtimestamp(received, timezone.utc).isoformat(),
+            "sent_at": datetime.fromtimestamp(sent, timezone.utc).isoformat(),
+            "run_id": self.run_id,
+            "request_id": request_id,
+            "latency_ms": (received - sent) * 1000,
+            "serialize_ms": serialize_s * 1000,
+            "nq": nq,
+            "top_k": top_k,
+        }
+        record.update(context)
+        return record
@@ -0,0 +1,228 @@
+"""
+DBPU Acceleration Lab - Resource Sampler
+Background thread reading /proc at a fixed interval: host CPU, iowait,
+memory and swap, plus CPU (total and hottest thread), RSS, context
+switches and disk/network bytes for the client process and any target
+processes (e.g. a local Milvus)
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+SAMPLE_INTERVAL_S = float(os.getenv("DBPU_SAMPLE_INTERVAL", "1.0"))
+TARGET_PIDS_ENV = "DBPU_TARGET_PIDS"
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def parse_targets(spec):
+    """{"name": pid} from "milvus=1234,etcd=99" or bare "1234,99" (named pid-1234)"""
+    targets = {}
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, pid = item.rpartition("=")
+        targets[name or f"pid-{pid}"] = int(pid)
+    return targets
+
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _fields(text, sep=":"):
+    """First integer of each "key: value ..." line"""
+    out = {}
+    for line in (text or "").splitlines():
+        key, _, value = line.partition(sep)
+        parts = value.split()
+        if parts and parts[0].isdigit():
+            out[key.strip()] = int(parts[0])
+    return out
+
+
+def _net_bytes(pid):
+    """(rx, tx) bytes of all non-loopback interfaces in the process's network namespace"""
+    text = _read(f"/proc/{pid}/net/dev")
+    if text is None:
+        return None
+    rx = tx = 0
+    for line in text.splitlines()[2:]:
+        name, _, values = line.partition(":")
+        if name.strip() == "lo":
+            continue
+        values = values.split()
+        rx += int(values[0])
+        tx += int(values[8])
+    return rx, tx
+
+
+def _cpu_s(stat):
+    """user + system CPU seconds from a /proc stat line"""
+    # Fields after the parenthesized command name, which may itself contain spaces
+    fields = stat[stat.rindex(")") + 2:].split()
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+
+def _threads(pid):
+    """
+    (voluntary, involuntary, {tid: cpu_s}): switches summed over all
+    threads, since /proc/<pid>/status only has the main one, and each
+    thread's CPU time so a single pinned thread shows up
+    """
+    voluntary = involuntary = 0
+    thread_cpu = {}
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        tasks = []
+    for tid in tasks:
+        status = _fields(_read(f"/proc/{pid}/task/{tid}/status"))
+        voluntary += status.get("voluntary_ctxt_switches", 0)
+        involuntary += status.get("nonvoluntary_ctxt_switches", 0)
+        stat = _read(f"/proc/{pid}/task/{tid}/stat")
+        if stat:
+            thread_cpu[tid] = _cpu_s(stat)
+    return voluntary, involuntary, thread_cpu
+
+
+def read_process(pid):
+    """Cumulative counters of one process, or None once it is gone"""
+    stat = _read(f"/proc/{pid}/stat")
+    if stat is None:
+        return None
+    fields = stat[stat.rindex(")") + 2:].split()
+    voluntary, involuntary, thread_cpu = _threads(pid)
+    io = _fields(_read(f"/proc/{pid}/io"))  # needs the same user or CAP_SYS_PTRACE
+    return {
+        "cpu_s": _cpu_s(stat),
+        "thread_cpu_s": thread_cpu,
+        "rss_bytes": int(fields[21]) * PAGE_SIZE,
+        "threads": int(fields[17]),
+        "voluntary_ctx": voluntary,
+        "nonvoluntary_ctx": involuntary,
+        "read_bytes": io.get("read_bytes"),
+        "write_bytes": io.get("write_bytes"),
+        "net": _net_bytes(pid),
+    }
+
+
+def read_host():
+    """Cumulative host CPU jiffies, memory and swap counters"""
+    cpu = [int(v) for v in (_read("/proc/stat") or "cpu 0").splitlines()[0].split()[1:]]
+    meminfo = _fields(_read("/proc/meminfo"))
+    vmstat = _fields(_read("/proc/vmstat"), sep=" ")
+    idle = sum(cpu[3:5])  # idle + iowait
+    return {
+        "cpu_total": sum(cpu[:8]),
+        "cpu_busy": sum(cpu[:8]) - idle,
+        "cpu_iowait": cpu[4] if len(cpu) > 4 else 0,
+        "mem_total_kb": meminfo.get("MemTotal"),
+        "mem_available_kb": meminfo.get("MemAvailable"),
+        "swap_in": vmstat.get("pswpin", 0),
+        "swap_out": vmstat.get("pswpout", 0),
+    }
+
+
+def _rate(now, before, key, dt):
+    if now.get(key) is None or before.get(key) is None:
+        return None
+    return (now[key] - before[key]) / dt
+
+
+def process_delta(now, before, dt):
+    """Per-interval utilization and rates between two read_process() snapshots"""
+    sample = {
+        "cpu_pct": (now["cpu_s"] - before["cpu_s"]) / dt * 100,  # 100 = one core busy
+        # Busiest thread alive at both ends of the interval, 100 = its core fully used
+        "max_thread_cpu_pct": max((cpu_s - before["thread_cpu_s"][tid] for tid, cpu_s in now["thread_cpu_s"].items()
+                                   if tid in before["thread_cpu_s"]), default=0.0) / dt * 100,
+        "rss_mb": now["rss_bytes"] / 2**20,
+        "threads": now["threads"],
+        "ctx_switches_per_s": _rate(now, before, "voluntary_ctx", dt) + _rate(now, before, "nonvoluntary_ctx", dt),
+        "nonvoluntary_ctx_per_s": _rate(now, before, "nonvoluntary_ctx", dt),
+        "disk_read_bytes_per_s": _rate(now, before, "read_bytes", dt),
+        "disk_write_bytes_per_s": _rate(now, before, "write_bytes", dt),
+    }
+    if now["net"] is not None and before["net"] is not None:
+        sample["net_rx_bytes_per_s"] = (now["net"][0] - before["net"][0]) / dt
+        sample["net_tx_bytes_per_s"] = (now["net"][1] - before["net"][1]) / dt
+    return sample
+
+
+def host_delta(now, before, dt):
+    total = now["cpu_total"] - before["cpu_total"]
+    sample = {
+        "host_cpu_pct": (now["cpu_busy"] - before["cpu_busy"]) / total * 100 if total else 0.0,
+        "host_iowait_pct": (now["cpu_iowait"] - before["cpu_iowait"]) / total * 100 if total else 0.0,
+        "host_swap_in_per_s": (now["swap_in"] - before["swap_in"]) / dt,
+        "host_swap_out_per_s": (now["swap_out"] - before["swap_out"]) / dt,
+    }
+    if now["mem_total_kb"] and now["mem_available_kb"] is not None:
+        sample["host_mem_available_pct"] = now["mem_available_kb"] / now["mem_total_kb"] * 100
+    return sample
+
+
+class ResourceSampler:
+    """
+    Samples the client process and `targets` ({name: pid}) every
+    `interval_s` and hands one record per interval to emit(record).
+
+    Each record covers the interval ending at its timestamp, with rates
+    computed from the difference of cumulative /proc counters, so the
+    thread does a handful of small file reads per tick and nothing in
+    between. Processes that exit are dropped from later records.
+    """
+
+    def __init__(self, emit, targets=None, interval_s=SAMPLE_INTERVAL_S):
+        self.emit = emit
+        self.interval_s = interval_s
+        self.targets = dict({"client": os.getpid()}, **(targets or {}))
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(self.interval_s + 5)
+            self._thread = None
+
+    def _snapshot(self):
+        return (time.perf_counter(), read_host(),
+                {name: read_process(pid) for name, pid in self.targets.items()})
+
+    def _run(self):
+        before = self._snapshot()
+        while not self._stop.wait(self.interval_s):
+            now = self._snapshot()
+            dt = now[0] - before[0]
+            processes = {}
+            for name, pid in self.targets.items():
+                if now[2].get(name) is not None and before[2].get(name) is not None:
+                    processes[name] = dict(process_delta(now[2][name], before[2][name], dt), pid=pid)
+            record = {
+                "timestamp": datetime.now().isoformat(),
+                "workload": "resource_sample",
+                "interval_s": dt,
+                "cpu_count": os.cpu_count(),
+                "processes": processes,
+            }
+            record.update(host_delta(now[1], before[1], dt))
+            try:
+                self.emit(record)
+                self.samples += 1
+            except Exception:
+                pass
+            before = now
@@ -0,0 +1,75 @@
+"""
+DBPU Acceleration Lab - Run Metadata
+Environment snapshot logged once per run so results can be compared
+across machines, builds and library versions
+"""
+import os
+import platform
+import socket
+import subprocess
+import sys
+
+import numpy as np
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+# Builds under test identify themselves through the environment (e.g. set by CI)
+BUILD_ENV_VARS = ["DBPU_BUILD_ID", "DBPU_PLUGIN_VERSION", "DBPU_RUNTIME_VERSION", "MILVUS_IMAGE"]
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "-C", REPO_DIR, "rev-parse", "--short", "HEAD"],
+                             capture_output=True, text=True, timeout=5)
+        commit = out.stdout.strip() or None
+        dirty = subprocess.run(["git", "-C", REPO_DIR, "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, timeout=5).stdout.strip()
+        return f"{commit}-dirty" if commit and dirty else commit
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo", 'r') as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or None
+
+
+def _mem_total_gb():
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return round(int(line.split()[1]) / 1024 / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def collect_environment(server_version=None):
+    """Host, library and build identifiers for the current process"""
+    try:
+        import pymilvus
+        pymilvus_version = pymilvus.__version__
+    except ImportError:
+        pymilvus_version = None
+
+    env = {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pymilvus": pymilvus_version,
+        "milvus_server": server_version,
+        "cpu_model": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "mem_total_gb": _mem_total_gb(),
+        "git_commit": _git_commit(),
+        "argv": sys.argv[1:],
+    }
+    env.update({name.lower(): os.environ[name] for name in BUILD_ENV_VARS if name in os.environ})
+    return env
@@ -0,0 +1,57 @@
+"""
+DBPU Acceleration Lab - Test Matrix Scheduler
+Loads declarative sweep specs and groups cases so each index is built once
+"""
+import itertools
+import json
+
+
+def expand_case(case):
+    """
+    Expand one spec entry into concrete test cases.
+
+    An entry has either a single `search_params` dict or a `search_grid`
+    mapping each param to a list of values; the grid is expanded as a
+    cartesian product and each variant's label gets a `_<param><value>` suffix.
+    """
+    index_type = case["index_type"]
+    index_params = case.get("index_params", {})
+    label = case.get("label", index_type)
+
+    grid = case.get("search_grid")
+    if not grid:
+        return [(index_type, index_params, case.get("search_params", {}), label)]
+
+    keys = sorted(grid)
+    expanded = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        search_params = dict(case.get("search_params", {}))
+        search_params.update(zip(keys, values))
+        suffix = "_".join(f"{k}{v}" for k, v in zip(keys, values))
+        expanded.append((index_type, index_params, search_params, f"{label}_{suffix}"))
+    return expanded
+
+
+def load_spec(path):
+    """Read a JSON sweep spec and return its expanded test cases in file order"""
+    with open(path, 'r') as f:
+        spec = json.load(f)
+    cases = []
+    for entry in spec["cases"]:
+        cases.extend(expand_case(entry))
+    return cases
+
+
+def group_by_index(cases):
+    """
+    Group cases by (index_type, index_params), preserving first-seen order.
+
+    Returns a list of (index_type, index_params, [cases]) so the runner can
+    build and load each index once and run every search-param variant on it.
+    """
+    groups = {}
+    for case in cases:
+        index_type, index_params = case[0], case[1]
+        key = (index_type, json.dumps(index_params, sort_keys=True))
+        groups.setdefault(key, (index_type, index_params, []))[2].append(case)
+    return list(groups.values())